@@ -0,0 +1,91 @@
+"""
+Amazon product scraper core
+
+Shared by the Flask app (app/app.py) and the command line (script.py).
+A scrape runs in four stages:
+
+    fetch      -> download the product page      (fetch.py)
+    parse      -> build the tree, pull raw fields (parse.py)
+    normalize  -> shape the canonical record      (normalize.py)
+    persist    -> write records out               (persist.py)
+
+pipeline.py chains them into get_amazon_product_details() / process_asins(),
+and cli.py (python -m amazon_scraper) runs them as a batch job.
+"""
+from .breaker import CircuitBreaker, CircuitOpenError
+from .cache import PageCache
+from .deadline import Deadline, DeadlineExceeded
+from .fetch import (
+    DEFAULT_BASE_URL, DEFAULT_HEADERS, DEFAULT_TIMEOUT, FetchedPage, build_session, fetch_page, fetch_product_page,
+    prewarm_session
+)
+from .embedded import JsonBlob, VariationFamily, extract_embedded_fields, extract_variation_family, find_json_blobs
+from .hedge import Cancellation, FetchCancelled, Hedger
+from .jobs import Job, JobStore
+from .listing import LISTING_FIELDS, ListingPage, listing_covers, listing_url, parse_listing
+from .normalize import NORMALIZED_FIELDS, RECORD_FIELDS, build_product_record, normalize_attributes, normalize_records
+from .parse import PRODUCT_FIELDS, extract_product_fields, parse_html, select_fields
+from .persist import save_product_details, write_jsonl
+from .pipeline import ScrapeResult, Scraper, get_amazon_product_details, process_asins
+from .profiler import SamplingProfiler
+from .proxies import NoHealthyProxyError, ProxyPool
+from .ratelimit import RateLimiter
+from .scheduler import PRIORITY_CLASSES, FetchScheduler
+from .record import ProductRecord, compact_records
+from .trace import ScrapeTrace, summarize_traces
+
+__all__ = [
+    'Cancellation',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'DEFAULT_BASE_URL',
+    'DEFAULT_HEADERS',
+    'DEFAULT_TIMEOUT',
+    'Deadline',
+    'DeadlineExceeded',
+    'FetchCancelled',
+    'FetchScheduler',
+    'FetchedPage',
+    'Hedger',
+    'Job',
+    'JobStore',
+    'JsonBlob',
+    'LISTING_FIELDS',
+    'ListingPage',
+    'NORMALIZED_FIELDS',
+    'NoHealthyProxyError',
+    'PRIORITY_CLASSES',
+    'PRODUCT_FIELDS',
+    'PageCache',
+    'ProductRecord',
+    'ProxyPool',
+    'RECORD_FIELDS',
+    'RateLimiter',
+    'SamplingProfiler',
+    'ScrapeResult',
+    'ScrapeTrace',
+    'Scraper',
+    'VariationFamily',
+    'build_product_record',
+    'build_session',
+    'compact_records',
+    'extract_embedded_fields',
+    'extract_product_fields',
+    'extract_variation_family',
+    'fetch_page',
+    'fetch_product_page',
+    'find_json_blobs',
+    'get_amazon_product_details',
+    'listing_covers',
+    'listing_url',
+    'normalize_attributes',
+    'normalize_records',
+    'parse_html',
+    'parse_listing',
+    'prewarm_session',
+    'process_asins',
+    'save_product_details',
+    'select_fields',
+    'summarize_traces',
+    'write_jsonl',
+]
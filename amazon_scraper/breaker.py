@@ -0,0 +1,214 @@
+"""
+Circuit breaker for a marketplace
+
+When a marketplace starts timing out or blocking, every remaining ASIN
+would otherwise spend a full timeout finding that out. A CircuitBreaker
+watches the outcome of recent fetches and, once too many of them fail,
+opens: fetches are refused straight away with CircuitOpenError (status
+'circuit_open'), or parked for up to max_wait seconds in case it recovers.
+After the cooldown the breaker half-opens and lets a few probe fetches
+through; enough successful probes close it again, a failed one reopens it
+for twice as long.
+
+Failures are what says the marketplace is unwell: timeouts, connection
+errors, 5xx and block responses (403/429/503 or a robot-check page). A 404
+or any other 4xx answer means it is serving fine. Egress proxies have their
+own cooldowns in ProxyPool; this breaker covers the marketplace behind them.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import requests
+
+from .deadline import Deadline
+from .metrics import CIRCUIT_REJECTED_TOTAL, CIRCUIT_STATE, CIRCUIT_TRANSITIONS_TOTAL
+from .proxies import BLOCK_STATUSES, NoHealthyProxyError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The marketplace's circuit is open, so the fetch was not sent"""
+
+
+def is_failure(error: requests.exceptions.RequestException) -> Optional[bool]:
+    """
+    :param error: Exception raised by a fetch
+    :return: True when it counts against the marketplace, False when the
+        marketplace answered normally, None when it says nothing either way
+    """
+    if isinstance(error, (CircuitOpenError, NoHealthyProxyError)):
+        return None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return response.status_code >= 500 or response.status_code in BLOCK_STATUSES
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a window of recent fetch outcomes"""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        probes: int = 1,
+        close_after: int = 2,
+        max_wait: float = 0.0
+    ):
+        """
+        :param name: Marketplace host, for logs and metrics
+        :param window: Recent outcomes the failure rate is taken over
+        :param min_calls: Outcomes needed in the window before it can open
+        :param failure_rate: Share of failures in the window that opens it
+        :param cooldown: Seconds it stays open before probing; doubles each
+            time a probe fails, up to max_cooldown
+        :param max_cooldown: Longest cooldown in seconds
+        :param probes: Probe fetches let through at once while half-open
+        :param close_after: Successful probes needed to close it
+        :param max_wait: Seconds a fetch may wait for the breaker to close
+            before it is refused; 0 refuses at once
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probes = probes
+        self.close_after = close_after
+        self.max_wait = max_wait
+        self.state = CLOSED
+        self.rejected = 0
+        self.opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._open_for = cooldown
+        self._open_until = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._condition = threading.Condition()
+        CIRCUIT_STATE.labels(marketplace=name, state=CLOSED).inc()
+
+    def _transition(self, state: str) -> None:
+        CIRCUIT_STATE.labels(marketplace=self.name, state=self.state).dec()
+        CIRCUIT_STATE.labels(marketplace=self.name, state=state).inc()
+        CIRCUIT_TRANSITIONS_TOTAL.labels(marketplace=self.name, state=state).inc()
+        self.state = state
+        self._condition.notify_all()
+
+    def _trip(self) -> None:
+        if self.state == HALF_OPEN:
+            self._open_for = min(self.max_cooldown, self._open_for * 2)
+        self._open_until = time.monotonic() + self._open_for
+        self._probe_successes = 0
+        self.opened += 1
+        logger.warning(f"Circuit for {self.name} opened for {self._open_for:.0f}s")
+        self._transition(OPEN)
+
+    def _close(self) -> None:
+        self._outcomes.clear()
+        self._open_for = self.cooldown
+        logger.warning(f"Circuit for {self.name} closed")
+        self._transition(CLOSED)
+
+    def _record(self, failed: bool) -> None:
+        self._outcomes.append(failed)
+        failures = sum(self._outcomes)
+        if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+            self._trip()
+
+    def allow(self, deadline: Optional[Deadline] = None) -> bool:
+        """
+        Wait until a fetch may be sent
+
+        :param deadline: Stop waiting at this deadline
+        :return: Whether the fetch is a probe; pass it back to report()
+        :raises CircuitOpenError: When the circuit stays open past max_wait
+            (or the deadline)
+        """
+        give_up = time.monotonic() + self.max_wait
+        if deadline is not None and deadline.expires_at is not None:
+            give_up = min(give_up, deadline.expires_at)
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self.state == OPEN and now >= self._open_until:
+                    self._transition(HALF_OPEN)
+                if self.state == CLOSED:
+                    return False
+                if self.state == HALF_OPEN and self._probes_in_flight < self.probes:
+                    self._probes_in_flight += 1
+                    return True
+                if now >= give_up:
+                    self.rejected += 1
+                    CIRCUIT_REJECTED_TOTAL.labels(marketplace=self.name).inc()
+                    raise CircuitOpenError(f"Circuit for {self.name} is {self.state.replace('_', '-')}")
+                # Half-open with every probe out: wait for a probe to report
+                wake = give_up if self.state == HALF_OPEN else min(give_up, self._open_until)
+                self._condition.wait(wake - now)
+
+    def report(self, probe: bool, failed: Optional[bool]) -> None:
+        """
+        Record how a fetch let through by allow() went
+
+        :param probe: What allow() returned
+        :param failed: Whether it failed (see is_failure()); None when the
+            outcome says nothing about the marketplace
+        """
+        with self._condition:
+            if probe:
+                self._probes_in_flight -= 1
+                self._condition.notify_all()
+            if failed is None:
+                return
+            if self.state == CLOSED:
+                self._record(failed)
+            elif self.state == HALF_OPEN and probe:
+                if failed:
+                    self._trip()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.close_after:
+                        self._close()
+            # Fetches sent before the circuit opened say nothing new
+
+    def report_block(self) -> None:
+        """
+        Count a block found after the fetch was reported a success (a 200
+        robot-check page)
+        """
+        with self._condition:
+            if self.state == CLOSED:
+                # Replace the success recorded for this fetch
+                for index in range(len(self._outcomes) - 1, -1, -1):
+                    if not self._outcomes[index]:
+                        del self._outcomes[index]
+                        break
+                self._record(True)
+            elif self.state == HALF_OPEN:
+                self._trip()
+
+    def stats(self) -> Dict:
+        """
+        :return: State, recent failure count, cooldown left and totals
+        """
+        with self._condition:
+            return {
+                'marketplace': self.name,
+                'state': self.state,
+                'recent_failures': sum(self._outcomes),
+                'recent_calls': len(self._outcomes),
+                'open_s': round(max(0.0, self._open_until - time.monotonic()), 1) if self.state == OPEN else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,83 @@
+"""
+On-disk cache of fetched product pages
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class PageCache:
+    """
+    Stores raw product page HTML under a directory, one file per URL
+
+    Entries older than ``ttl`` seconds are treated as missing. Writes go
+    through a temporary file so concurrent readers never see partial pages.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = 24 * 60 * 60):
+        """
+        :param directory: Cache root directory (created on demand)
+        :param ttl: Maximum entry age in seconds, or None to never expire
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def path_for(self, url: str) -> str:
+        """
+        Map a page URL to its cache file path
+
+        :param url: Product or results page URL
+        :return: Absolute path of the cache file
+        """
+        parsed = urlparse(url)
+        host = parsed.netloc.replace(':', '_')
+        name = parsed.path.strip('/').replace('/', '_') or 'index'
+        if parsed.query:
+            # Results pages differ only in their query
+            name += '_' + hashlib.sha1(parsed.query.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, host, f"{name}.html")
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Return the cached page for a URL if present and fresh
+
+        :param url: Product page URL
+        :return: Page bytes, or None on a miss
+        """
+        path = self.path_for(url)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, content: bytes) -> None:
+        """
+        Store a page for a URL
+
+        :param url: Product page URL
+        :param content: Raw page bytes
+        """
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Per thread, as a run can fetch the same URL twice at once
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def discard(self, url: str) -> None:
+        """
+        Drop the cached page for a URL, e.g. when it turned out to be a block page
+
+        :param url: Product page URL
+        """
+        try:
+            os.remove(self.path_for(url))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,85 @@
+"""
+Deadlines carried down the scrape path
+
+A Deadline is a point in (monotonic) time by which work must finish. A job
+gets one for all of its ASINs, each ASIN narrows it to its own budget with
+within(), and every blocking step below derives its timeout from what is
+left: rate-limit and scheduler waits, connect and read timeouts, the body
+download, and the checks between parse and extract. Work that runs out of
+time raises DeadlineExceeded, which the pipeline reports as the
+'deadline_exceeded' status.
+"""
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The deadline passed before the work could finish"""
+
+
+class Deadline:
+    """Absolute deadline on the monotonic clock; an unbounded one never expires"""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at: Optional[float] = None):
+        """
+        :param expires_at: time.monotonic() value of the deadline; None for no deadline
+        """
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> 'Deadline':
+        """
+        :param seconds: Time allowed from now; None for no deadline
+        :return: Deadline that many seconds from now
+        """
+        return cls(None if seconds is None else time.monotonic() + seconds)
+
+    def within(self, seconds: Optional[float]) -> 'Deadline':
+        """
+        :param seconds: Budget for a piece of work; None to keep this deadline
+        :return: The earlier of this deadline and the budget from now
+        """
+        if seconds is None:
+            return self
+        budget = time.monotonic() + seconds
+        return Deadline(budget if self.expires_at is None else min(self.expires_at, budget))
+
+    def remaining(self) -> Optional[float]:
+        """
+        :return: Seconds left (0 when passed), None when unbounded
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, stage: str) -> None:
+        """
+        :param stage: Step about to start, for the error message
+        :raises DeadlineExceeded: When the deadline has passed
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    def timeout(self, limit: Optional[float], stage: str) -> Optional[float]:
+        """
+        Cap a timeout to the time left
+
+        :param limit: Timeout the step would use on its own; None for none
+        :param stage: Step about to start, for the error message
+        :return: The smaller of limit and the time left
+        :raises DeadlineExceeded: When the deadline has passed
+        """
+        self.check(stage)
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        return remaining if limit is None else min(limit, remaining)
+
+    def __repr__(self) -> str:
+        remaining = self.remaining()
+        return 'Deadline(unbounded)' if remaining is None else f'Deadline({remaining:.3f}s left)'
@@ -0,0 +1,310 @@
+"""
+Embedded JSON fast path
+
+Product pages carry structured JSON next to their markup:
+
+    twister         the P.register('twister-js-init-dpx-data', ...) script:
+                    the variation family (parent ASIN, dimensions, children)
+    buying options  <div class="twister-plus-buying-options-price-data">:
+                    buy box offers with the parts of their display price
+    a-state         <script type="a-state" data-a-state='{"key": ...}'> payloads
+    ld+json         <script type="application/ld+json"> schema.org data
+
+find_json_blobs() locates them with byte searches on the raw page, without
+building a tree, and decodes each with json.loads. extract_embedded_fields()
+reads record fields out of them: the price from the first buy box offer (in
+the "₹1,299." form the .a-price spans give) and the title from a schema.org
+Product. Whatever the blobs do not carry is left to the DOM extractor.
+extract_variation_family() reads the variation family from the twister data.
+"""
+import html
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .parse import PRODUCT_FIELDS, declared_charset
+
+logger = logging.getLogger(__name__)
+
+# Blob kinds find_json_blobs() knows
+JSON_KINDS = ('twister', 'buying_options', 'a-state', 'ld+json')
+
+# Fields extract_embedded_fields() can find, and the blob kinds they are read from
+EMBEDDED_FIELDS = {
+    'title': ('ld+json',),
+    'price': ('buying_options', 'a-state'),
+}
+
+_TWISTER_MARKER = b"'twister-js-init-dpx-data'"
+_TWISTER_DATA = re.compile(rb'dataToReturn\s*=\s*')
+_BUYING_OPTIONS_MARKER = b'twister-plus-buying-options-price-data'
+_LD_JSON_MARKER = b'application/ld+json'
+_A_STATE_MARKER = b'data-a-state='
+_A_STATE_KEY = re.compile(r'data-a-state=(?:"([^"]*)"|\'([^\']*)\')')
+_SCRIPT_END = b'</script'
+_DIV_END = b'</div'
+
+
+@dataclass
+class VariationFamily:
+    """A parent listing and its children, from a product page's twister data"""
+    parent_asin: str
+    # ASIN of the page the data was read from
+    current_asin: str
+    # Dimension names, e.g. ['color_name', 'size_name']
+    dimensions: List[str] = field(default_factory=list)
+    # Child ASIN -> {dimension: display value}, in the page's order
+    children: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+
+class JsonBlob(NamedTuple):
+    """A decoded JSON blob from a product page"""
+    # 'twister', 'buying_options', 'a-state' or 'ld+json'
+    kind: str
+    # The a-state payload's key, '' for the other kinds
+    key: str
+    value: Any
+
+
+def _element_body(content: bytes, marker_at: int, end_tag: bytes) -> Optional[Tuple[int, int]]:
+    """
+    :return: (start, end) of the text inside the element whose opening tag
+        contains marker_at, or None when the page ends first
+    """
+    start = content.find(b'>', marker_at)
+    if start < 0:
+        return None
+    end = content.find(end_tag, start)
+    return None if end < 0 else (start + 1, end)
+
+
+def _iter_twister(content: bytes, charset: str) -> Iterator[JsonBlob]:
+    at = content.find(_TWISTER_MARKER)
+    while at >= 0:
+        end = content.find(_SCRIPT_END, at)
+        match = _TWISTER_DATA.search(content, at, end if end >= 0 else len(content))
+        if match is not None:
+            text = content[match.end():end if end >= 0 else len(content)].decode(charset, 'replace')
+            try:
+                yield JsonBlob('twister', '', json.JSONDecoder().raw_decode(text)[0])
+            except ValueError:
+                logger.debug("Undecodable twister data")
+        at = content.find(_TWISTER_MARKER, at + len(_TWISTER_MARKER))
+
+
+def _iter_buying_options(content: bytes, charset: str) -> Iterator[JsonBlob]:
+    at = content.find(_BUYING_OPTIONS_MARKER)
+    while at >= 0:
+        body = _element_body(content, at, _DIV_END)
+        if body is None:
+            return
+        # Element text, so entity-escaped
+        text = html.unescape(content[body[0]:body[1]].decode(charset, 'replace')).strip()
+        if text:
+            try:
+                yield JsonBlob('buying_options', '', json.loads(text))
+            except ValueError:
+                logger.debug("Undecodable buying options data")
+        at = content.find(_BUYING_OPTIONS_MARKER, body[1])
+
+
+def _iter_a_state(content: bytes, charset: str) -> Iterator[JsonBlob]:
+    at = content.find(_A_STATE_MARKER)
+    while at >= 0:
+        tag_start = content.rfind(b'<', 0, at)
+        if content[tag_start:tag_start + 7].lower() != b'<script':
+            at = content.find(_A_STATE_MARKER, at + len(_A_STATE_MARKER))
+            continue
+        body = _element_body(content, at, _SCRIPT_END)
+        if body is None:
+            return
+        match = _A_STATE_KEY.search(content[at:body[0]].decode(charset, 'replace'))
+        try:
+            state = json.loads(html.unescape(match.group(1) or match.group(2))) if match else {}
+            key = state.get('key', '') if isinstance(state, dict) else ''
+            yield JsonBlob('a-state', key, json.loads(content[body[0]:body[1]].decode(charset, 'replace')))
+        except ValueError:
+            logger.debug("Undecodable a-state payload")
+        at = content.find(_A_STATE_MARKER, body[1])
+
+
+def _iter_ld_json(content: bytes, charset: str) -> Iterator[JsonBlob]:
+    at = content.find(_LD_JSON_MARKER)
+    while at >= 0:
+        tag_start = content.rfind(b'<', 0, at)
+        if content[tag_start:tag_start + 7].lower() != b'<script':
+            at = content.find(_LD_JSON_MARKER, at + len(_LD_JSON_MARKER))
+            continue
+        body = _element_body(content, at, _SCRIPT_END)
+        if body is None:
+            return
+        try:
+            yield JsonBlob('ld+json', '', json.loads(content[body[0]:body[1]].decode(charset, 'replace')))
+        except ValueError:
+            logger.debug("Undecodable ld+json data")
+        at = content.find(_LD_JSON_MARKER, body[1])
+
+
+_FINDERS = {
+    'twister': _iter_twister,
+    'buying_options': _iter_buying_options,
+    'a-state': _iter_a_state,
+    'ld+json': _iter_ld_json,
+}
+
+
+def find_json_blobs(
+    content: bytes,
+    content_type: Optional[str] = None,
+    kinds: Iterable[str] = JSON_KINDS
+) -> List[JsonBlob]:
+    """
+    Locate and decode the JSON blobs embedded in a product page
+
+    :param content: Raw page bytes (a truncated page works too)
+    :param content_type: HTTP Content-Type header, for the charset
+    :param kinds: Blob kinds to look for, from JSON_KINDS
+    :return: Blobs that decoded, grouped by kind in JSON_KINDS order and in
+        page order within a kind; blobs that are malformed or cut off are
+        skipped
+    """
+    charset = declared_charset(content, content_type) or 'utf-8'
+    blobs = []
+    for kind in JSON_KINDS:
+        if kind in kinds:
+            blobs.extend(_FINDERS[kind](content, charset))
+    return blobs
+
+
+def _offers(value: Any) -> Iterator[Dict]:
+    """
+    :return: Buy box offers in a blob: dicts carrying the parts of a display
+        price, either listed directly or in lists keyed by buy box group
+    """
+    if isinstance(value, dict):
+        if 'integerValue' in value and 'currencySymbol' in value:
+            yield value
+            return
+        value = [item for group in value.values() if isinstance(group, list) for item in group]
+    if isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict) and 'integerValue' in item and 'currencySymbol' in item:
+                yield item
+
+
+def _offer_price(blobs: List[JsonBlob]) -> Optional[str]:
+    for blob in blobs:
+        if blob.kind not in ('buying_options', 'a-state'):
+            continue
+        offers = list(_offers(blob.value))
+        # The new-condition offer is the one the buy box shows first
+        offer = next((offer for offer in offers if offer.get('buyingOptionType') == 'NEW'), None)
+        offer = offer or next(iter(offers), None)
+        if offer is not None and offer['integerValue']:
+            return f"{offer['currencySymbol']}{offer['integerValue']}{offer.get('decimalSeparator', '')}"
+    return None
+
+
+def _ld_products(value: Any) -> Iterator[Dict]:
+    if isinstance(value, list):
+        for item in value:
+            yield from _ld_products(item)
+    elif isinstance(value, dict):
+        kind = value.get('@type')
+        if kind == 'Product' or (isinstance(kind, list) and 'Product' in kind):
+            yield value
+        yield from _ld_products(value.get('@graph'))
+
+
+def _product_title(blobs: List[JsonBlob]) -> Optional[str]:
+    for blob in blobs:
+        if blob.kind == 'ld+json':
+            for product in _ld_products(blob.value):
+                name = product.get('name')
+                if isinstance(name, str) and name.strip():
+                    # Some pages entity-escape strings inside the script
+                    return html.unescape(name).strip()
+    return None
+
+
+def extract_embedded_fields(
+    content: bytes,
+    content_type: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    blobs: Optional[List[JsonBlob]] = None
+) -> Dict:
+    """
+    Read record fields from a page's embedded JSON
+
+    :param content: Raw page bytes
+    :param content_type: HTTP Content-Type header, for the charset
+    :param fields: Projection from select_fields(); None for all fields
+    :param blobs: Blobs already found by find_json_blobs(), to skip the scan
+    :return: Raw field values in extract_product_fields() form, only for
+        requested fields the JSON carries
+    """
+    wanted = [field for field in fields or PRODUCT_FIELDS if field in EMBEDDED_FIELDS]
+    if not wanted:
+        return {}
+    if blobs is None:
+        blobs = find_json_blobs(content, content_type, {kind for field in wanted for kind in EMBEDDED_FIELDS[field]})
+    found = {}
+    for field in wanted:
+        value = _offer_price(blobs) if field == 'price' else _product_title(blobs)
+        if value is not None:
+            found[field] = value
+    return found
+
+
+def _child_dimensions(data: Dict, dimensions: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    :return: Child ASIN -> {dimension: display value}, from the display data
+        or else from the per-child value indexes
+    """
+    display = data.get('dimensionValuesDisplayData')
+    if isinstance(display, dict) and display:
+        return {asin: dict(zip(dimensions, values)) for asin, values in display.items() if isinstance(values, list)}
+    values = data.get('variationValues') or {}
+    children = {}
+    for asin, indexes in (data.get('asinVariationValues') or {}).items():
+        children[asin] = {}
+        for dimension in dimensions:
+            try:
+                children[asin][dimension] = values[dimension][int(indexes[dimension])]
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+    return children
+
+
+def extract_variation_family(
+    content: bytes,
+    content_type: Optional[str] = None,
+    blobs: Optional[List[JsonBlob]] = None
+) -> Optional[VariationFamily]:
+    """
+    Read a page's variation family from its twister data
+
+    :param content: Raw page bytes
+    :param content_type: HTTP Content-Type header, for the charset
+    :param blobs: Blobs already found by find_json_blobs(), to skip the scan
+    :return: The family, or None when the page has no (decodable) twister
+        data or lists no other children
+    """
+    if blobs is None:
+        blobs = find_json_blobs(content, content_type, ('twister',))
+    for blob in blobs:
+        data = blob.value
+        if blob.kind != 'twister' or not isinstance(data, dict) or not data.get('parentAsin'):
+            continue
+        dimensions = [dimension for dimension in data.get('dimensions') or () if isinstance(dimension, str)]
+        children = _child_dimensions(data, dimensions)
+        if len(children) > 1:
+            return VariationFamily(
+                parent_asin=data['parentAsin'],
+                current_asin=data.get('currentAsin', ''),
+                dimensions=dimensions,
+                children=children,
+            )
+    return None
@@ -0,0 +1,291 @@
+"""
+Fetch stage: download Amazon product (and listing) pages
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .deadline import Deadline, DeadlineExceeded
+from .hedge import Cancellation, FetchCancelled
+from .metrics import BYTES_RECEIVED_TOTAL, DECODED_BYTES_TOTAL, STAGE_SECONDS, WIRE_BYTES_TOTAL
+from .http2 import HTTP2Adapter, connections_for
+from .parse import RegionScanner
+from .proxies import ProxyPool, ProxyPoolAdapter
+from .transport import SUPPORTED_ENCODINGS, InstrumentedAdapter, abortable, accept_encoding, reset_connection_timings
+
+logger = logging.getLogger(__name__)
+
+# Marketplace root; overridable so scrapes can be pointed at a stand-in server
+DEFAULT_BASE_URL = 'https://www.amazon.in'
+
+# (connect, read) timeouts in seconds; read applies to each socket read
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# Bytes read per step of the body download, between deadline checks
+_DOWNLOAD_CHUNK = 64 * 1024
+
+# Headers to mimic a browser request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    # Only what can be decoded here: brotli/zstd when their packages are installed
+    'Accept-Encoding': accept_encoding(),
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+@dataclass
+class FetchedPage:
+    """Raw product page as returned by the marketplace"""
+    # '' for pages other than a product's, such as search results
+    asin: str
+    url: str
+    status_code: int
+    content: bytes
+    # Response headers, looked up case-insensitively
+    headers: Dict[str, str] = field(default_factory=CaseInsensitiveDict)
+    # Seconds spent per fetch step (dns, connect, tls, ttfb, download)
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Egress proxy the page came through, when fetched via a proxy pool
+    proxy: Optional[str] = None
+    # Body bytes as transferred, before content decoding (0 for cache hits)
+    wire_bytes: int = 0
+    # Content-Encoding the body was sent with
+    content_encoding: str = 'identity'
+    # Whether the download stopped once the requested fields were in, so
+    # content is only the start of the page (never cached)
+    truncated: bool = False
+
+
+def build_session(pool_size: int = 10, proxy_pool: Optional[ProxyPool] = None, http2: bool = False) -> requests.Session:
+    """
+    Create a session whose connection pool fits the given concurrency
+
+    :param pool_size: Maximum connections kept open per host (per proxy
+        when routing through a proxy pool); with http2, the number of
+        requests multiplexed at once
+    :param proxy_pool: Egress proxies to balance requests across
+    :param http2: Multiplex requests over a few HTTP/2 connections
+        (needs httpx and h2)
+    :return: Configured session
+    """
+    session = requests.Session()
+    if http2:
+        if proxy_pool is not None:
+            raise ValueError("The HTTP/2 transport cannot be combined with a proxy pool")
+        adapter = HTTP2Adapter(connections=connections_for(pool_size))
+    elif proxy_pool is not None:
+        adapter = ProxyPoolAdapter(proxy_pool, pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = InstrumentedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def prewarm_session(session: requests.Session, connections: int, base_url: str = DEFAULT_BASE_URL,
+                    timeout: float = DEFAULT_TIMEOUT[0]) -> int:
+    """
+    Open keep-alive connections to the marketplace before the first fetch
+
+    Sessions routed through a proxy pool or over HTTP/2 are left as they are.
+
+    :param session: Session from build_session()
+    :param connections: Connections to open, typically one per worker
+    :param base_url: Marketplace root URL
+    :param timeout: Connect timeout in seconds
+    :return: Connections open and idle in the pool
+    """
+    prewarm = getattr(session.get_adapter(base_url), 'prewarm', None)
+    if prewarm is None or connections < 1:
+        return 0
+    # Match the verify and proxy settings send() will apply, environment included
+    settings = session.merge_environment_settings(base_url, {}, None, None, None)
+    start = time.perf_counter()
+    opened = prewarm(base_url, connections, timeout, verify=settings['verify'], proxies=settings['proxies'])
+    logger.info(f"Pre-warmed {opened}/{connections} connections to {urlsplit(base_url).hostname} "
+                f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return opened
+
+
+def product_url(asin: str, base_url: str = DEFAULT_BASE_URL) -> str:
+    """
+    Build the product detail page URL for an ASIN
+
+    :param asin: Amazon Standard Identification Number
+    :param base_url: Marketplace root URL
+    :return: Product page URL
+    """
+    return f"{base_url}/dp/{asin}"
+
+
+def _unread_bytes(response: requests.Response) -> float:
+    """
+    :return: Body bytes still to come on the wire; infinite when the
+        response has no Content-Length
+    """
+    try:
+        return int(response.headers['Content-Length']) - response.raw.tell()
+    except (KeyError, ValueError):
+        return float('inf')
+
+
+def fetch_product_page(
+    asin: str,
+    base_url: str = DEFAULT_BASE_URL,
+    session: Optional[requests.Session] = None,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    deadline: Optional[Deadline] = None,
+    cancel: Optional[threading.Event] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> FetchedPage:
+    """
+    Download the product page for an ASIN
+
+    :param asin: Amazon Standard Identification Number
+    :param base_url: Marketplace root URL
+    :param session: Optional session to reuse connections across fetches
+    :param timeout: (connect, read) timeouts in seconds
+    :param deadline: See fetch_page()
+    :param cancel: See fetch_page()
+    :param fields: See fetch_page()
+    :return: Fetched page
+    :raises requests.exceptions.RequestException: On network or HTTP errors
+    :raises DeadlineExceeded: When the deadline passes first
+    :raises FetchCancelled: When cancel is set before the body is complete
+    """
+    return fetch_page(product_url(asin, base_url), session=session, timeout=timeout, deadline=deadline,
+                      cancel=cancel, fields=fields, asin=asin)
+
+
+@contextmanager
+def _aborted_by(cancel: Optional[threading.Event]) -> Iterator[None]:
+    """Abort the current thread's request as soon as a Cancellation is set"""
+    if not isinstance(cancel, Cancellation):
+        yield
+        return
+    with abortable() as watch:
+        cancel.add_callback(watch.abort)
+        try:
+            yield
+        finally:
+            cancel.remove_callback(watch.abort)
+
+
+def fetch_page(
+    url: str,
+    session: Optional[requests.Session] = None,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    deadline: Optional[Deadline] = None,
+    cancel: Optional[threading.Event] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    asin: str = ''
+) -> FetchedPage:
+    """
+    Download a marketplace page
+
+    :param url: Page URL
+    :param session: Optional session to reuse connections across fetches
+    :param timeout: (connect, read) timeouts in seconds
+    :param deadline: When the fetch must be done by; caps both timeouts and
+        is checked between chunks of the body
+    :param cancel: Once set, the fetch is abandoned at the next body chunk
+        (used by hedged fetches to stop the slower twin); a Cancellation
+        also aborts the request at once, even before the headers are in
+    :param fields: Projection from select_fields(); the download stops once
+        the regions these fields are read from are in, unless little of the
+        body is left (stopping early closes the connection instead of
+        returning it to the pool)
+    :param asin: The product's ASIN when the page is a product page
+    :return: Fetched page
+    :raises requests.exceptions.RequestException: On network or HTTP errors
+    :raises DeadlineExceeded: When the deadline passes first
+    :raises FetchCancelled: When cancel is set before the body is complete
+    """
+    if asin:
+        logger.info(f"Fetching product details for ASIN: {asin}")
+    else:
+        logger.info(f"Fetching {url}")
+
+    if cancel is not None and cancel.is_set():
+        raise FetchCancelled(f"Fetch of {asin or url} cancelled")
+    deadline = deadline or Deadline()
+    connect_timeout, read_timeout = timeout
+    timeout = (deadline.timeout(connect_timeout, 'fetch'), deadline.timeout(read_timeout, 'fetch'))
+    connection = reset_connection_timings()
+    start = time.perf_counter()
+    with _aborted_by(cancel):
+        try:
+            response = (session or requests).get(url, headers=DEFAULT_HEADERS, stream=True, timeout=timeout)
+            headers_received = time.perf_counter()
+            # Time to first byte excludes DNS/connect/TLS, which are recorded separately
+            ttfb = headers_received - start - connection.total
+            STAGE_SECONDS.labels(stage='ttfb').observe(ttfb)
+
+            with response:
+                response.raise_for_status()
+                encoding = response.headers.get('Content-Encoding', 'identity').strip().lower() or 'identity'
+                if encoding != 'identity' and encoding not in SUPPORTED_ENCODINGS:
+                    raise requests.exceptions.ContentDecodingError(
+                        f"Cannot decode Content-Encoding {encoding!r}; install its optional package", response=response
+                    )
+                # urllib3 decodes chunk by chunk as the body streams in
+                chunks = []
+                scanner = None if fields is None else RegionScanner(fields)
+                truncated = False
+                for chunk in response.iter_content(_DOWNLOAD_CHUNK):
+                    deadline.check('the download finished')
+                    if cancel is not None and cancel.is_set():
+                        # Leaving the with block closes the half-read connection
+                        raise FetchCancelled(f"Fetch of {asin or url} cancelled")
+                    chunks.append(chunk)
+                    if scanner is not None and scanner.feed(chunk):
+                        if _unread_bytes(response) > _DOWNLOAD_CHUNK:
+                            # Leaving the with block closes the half-read connection
+                            truncated = True
+                            break
+                        # Reading the short rest keeps the connection reusable
+                        scanner = None
+                content = b''.join(chunks)
+                wire_bytes = response.raw.tell()
+        except requests.exceptions.RequestException as e:
+            if cancel is not None and cancel.is_set():
+                # The request was aborted for the twin that answered first
+                raise FetchCancelled(f"Fetch of {asin or url} cancelled") from e
+            # A timeout shortened by the deadline is the deadline's doing
+            if deadline.expired() and not isinstance(e, requests.exceptions.HTTPError):
+                raise DeadlineExceeded("Deadline exceeded during fetch") from e
+            raise
+    download = time.perf_counter() - headers_received
+    STAGE_SECONDS.labels(stage='download').observe(download)
+    BYTES_RECEIVED_TOTAL.inc(len(content))
+    host = urlsplit(url).hostname or ''
+    WIRE_BYTES_TOTAL.labels(host=host, encoding=encoding).inc(wire_bytes)
+    DECODED_BYTES_TOTAL.labels(host=host, encoding=encoding).inc(len(content))
+
+    return FetchedPage(
+        asin=asin,
+        url=url,
+        status_code=response.status_code,
+        content=content,
+        headers=CaseInsensitiveDict(response.headers),
+        proxy=getattr(response, 'proxy_url', None),
+        wire_bytes=wire_bytes,
+        content_encoding=encoding,
+        truncated=truncated,
+        timings={
+            'dns': connection.dns,
+            'connect': connection.connect,
+            'tls': connection.tls,
+            'ttfb': ttfb,
+            'download': download,
+        }
+    )
@@ -0,0 +1,313 @@
+"""
+Hedged fetches for tail latency
+
+A fetch still running after the recent p95 fetch latency gets a second,
+identical request on another pooled connection (or another egress proxy).
+Whichever answers first is used and the other is cancelled: its request is
+aborted, even while it is still waiting for the response headers, and its
+connection is closed instead of reused. Hedges are paid for from a budget
+that grows by ``budget`` per fetch, so at most that fraction of extra
+requests is ever sent, however slow the marketplace gets.
+
+The original request runs on the caller's thread. Hedges run on a pool of
+at most ``max_hedges`` threads, started by one timer thread per Hedger, and
+a hedge can reserve a slot of its own first (Scraper takes a FetchScheduler
+slot), so it is never sent on capacity nobody accounted for.
+
+HEDGES_TOTAL counts each hedge by outcome: 'won' (the hedge answered
+first), 'lost' (the original did), 'failed' (both failed) and 'denied'
+(the budget was spent, or no hedge thread or reserved slot was free, so no
+hedge was sent).
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from .deadline import Deadline
+from .metrics import HEDGES_TOTAL
+
+T = TypeVar('T')
+
+# Reserves room for a hedge; returns the function releasing it, or None when there is no room
+Reserve = Callable[[], Optional[Callable[[], None]]]
+
+
+class FetchCancelled(Exception):
+    """The fetch was abandoned because a hedged twin answered first"""
+
+
+class Cancellation(threading.Event):
+    """
+    Event telling a fetch to stop, which also runs callbacks when set, so a
+    fetch blocked on the network can be aborted at once (see fetch_page())
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Run a callback when the event is set; at once when it already is"""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def set(self) -> None:
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class _Race:
+    """A hedged fetch: the original on the caller's thread, and the hedge once the timer sends it"""
+
+    def __init__(self, hedge_attempt: Callable[[threading.Event], T], reserve: Optional[Reserve]):
+        self.hedge_attempt = hedge_attempt
+        self.reserve = reserve
+        self.primary_cancel = Cancellation()
+        self.hedge_cancel = Cancellation()
+        self.hedge: 'Optional[Future[T]]' = None
+        # Set once the original is done: no hedge is sent after that
+        self.settled = False
+        # 'primary' or 'hedge', whichever answered first
+        self.winner: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def settle(self) -> 'Optional[Future[T]]':
+        """:return: The hedge, when one was sent"""
+        with self.lock:
+            self.settled = True
+            return self.hedge
+
+    def claim(self, side: str) -> bool:
+        """:return: Whether this side answered first"""
+        with self.lock:
+            if self.winner is None:
+                self.winner = side
+                return True
+            return False
+
+
+class Hedger:
+    """
+    Runs fetches with a hedge after the running latency percentile,
+    within a budget of extra requests. Shared by all workers of a scraper
+    (or process) so the latency estimate and budget are global.
+    """
+
+    def __init__(self, budget: float = 0.05, percentile: float = 95.0, window: int = 500,
+                 min_samples: int = 50, min_delay: float = 0.05, max_credit: float = 10.0, max_hedges: int = 8):
+        """
+        :param budget: Extra requests allowed per fetch (0.05: at most 5% more)
+        :param percentile: Latency percentile after which a fetch is hedged
+        :param window: Recent fetch latencies the percentile is taken over
+        :param min_samples: Latencies needed before any fetch is hedged
+        :param min_delay: Never hedge sooner than this many seconds
+        :param max_credit: Hedges that unused budget can save up for a burst
+        :param max_hedges: Hedges in flight at once, each on a pooled thread;
+            a fetch due a hedge while all are busy is not hedged
+        """
+        if not 0 < budget <= 1:
+            raise ValueError("budget must be in (0, 1]")
+        self.budget = budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_credit = max_credit
+        self.max_hedges = max(1, max_hedges)
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._since_update = 0
+        self._credit = 0.0
+        self._fetches = 0
+        self._running = 0
+        self._outcomes: Counter = Counter()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_hedges, thread_name_prefix='hedge')
+        # (due, order, race) heap of fetches to hedge once due
+        self._timers: List[Tuple[float, int, _Race]] = []
+        self._timer_order = itertools.count()
+        self._timer_condition = threading.Condition()
+        self._timer_thread: Optional[threading.Thread] = None
+
+    def delay(self) -> Optional[float]:
+        """
+        :return: Seconds after which a fetch is hedged; None until enough
+            latencies have been seen
+        """
+        return self._delay
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record how long a successful fetch took
+
+        :param seconds: Fetch latency
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+            self._since_update += 1
+            # Re-sorting the window on every fetch is wasted work; the
+            # percentile moves slowly
+            if len(self._latencies) >= self.min_samples and (
+                    self._delay is None or self._since_update >= max(1, len(self._latencies) // 20)):
+                ordered = sorted(self._latencies)
+                index = min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+                self._delay = max(self.min_delay, ordered[index])
+                self._since_update = 0
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._fetches += 1
+            self._credit = min(self.max_credit, self._credit + self.budget)
+
+    def _record(self, outcome: str) -> None:
+        HEDGES_TOTAL.labels(outcome=outcome).inc()
+        with self._lock:
+            self._outcomes[outcome] += 1
+
+    def _spend(self) -> bool:
+        """:return: Whether the budget and a hedge thread are free for one more hedge, taking both"""
+        with self._lock:
+            if self._credit < 1 or self._running >= self.max_hedges:
+                return False
+            self._credit -= 1
+            self._running += 1
+            return True
+
+    def _refund(self) -> None:
+        with self._lock:
+            self._credit = min(self.max_credit, self._credit + 1)
+            self._running -= 1
+
+    def _arm(self, race: _Race, delay: float) -> None:
+        """Have the timer thread send the race's hedge after delay"""
+        with self._timer_condition:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_order), race))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._run_timers, name='hedge-timer', daemon=True)
+                self._timer_thread.start()
+            self._timer_condition.notify()
+
+    def _run_timers(self) -> None:
+        while True:
+            with self._timer_condition:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    self._timer_condition.wait(
+                        max(0.0, self._timers[0][0] - time.monotonic()) if self._timers else None)
+                race = heapq.heappop(self._timers)[2]
+            self._send_hedge(race)
+
+    def _send_hedge(self, race: _Race) -> None:
+        """Send a race's hedge unless the original is done, the budget is spent or there is no room"""
+        with race.lock:
+            if race.settled:
+                return
+            if not self._spend():
+                self._record('denied')
+                return
+            release = race.reserve() if race.reserve is not None else _release_nothing
+            if release is None:
+                self._refund()
+                self._record('denied')
+                return
+            race.hedge = self._pool.submit(self._run_hedge, race, release)
+
+    def _run_hedge(self, race: _Race, release: Callable[[], None]) -> T:
+        start = time.perf_counter()
+        try:
+            result = race.hedge_attempt(race.hedge_cancel)
+        finally:
+            release()
+            with self._lock:
+                self._running -= 1
+        self.observe(time.perf_counter() - start)
+        if race.claim('hedge'):
+            self._record('won')
+            race.primary_cancel.set()
+        return result
+
+    def run(self, attempt: Callable[[threading.Event], T], deadline: Optional[Deadline] = None,
+            hedge_attempt: Optional[Callable[[threading.Event], T]] = None, reserve: Optional[Reserve] = None) -> T:
+        """
+        Run a fetch on the calling thread, hedging it if it is still running
+        after delay()
+
+        :param attempt: Performs the fetch; should raise FetchCancelled once
+            the event it is given is set. The event is a Cancellation, so
+            the fetch can abort its request as soon as it is set
+        :param deadline: When the fetch must finish; no hedge is sent when
+            it would start too late to help
+        :param hedge_attempt: Performs the hedge request instead of attempt
+            (e.g. to wait for the rate limiter first)
+        :param reserve: Called before a hedge is sent, to reserve room for
+            it (e.g. a fetch slot); returns the function releasing that room
+            once the hedge is done, or None to deny the hedge
+        :return: Result of whichever attempt succeeded first
+        :raises Exception: The original attempt's error when no attempt succeeds
+        """
+        self._earn()
+        delay = self._delay
+        remaining = None if deadline is None else deadline.remaining()
+        if delay is None or (remaining is not None and remaining <= delay):
+            start = time.perf_counter()
+            result = attempt(threading.Event())
+            self.observe(time.perf_counter() - start)
+            return result
+
+        race = _Race(hedge_attempt or attempt, reserve)
+        self._arm(race, delay)
+        start = time.perf_counter()
+        try:
+            result = attempt(race.primary_cancel)
+        except BaseException as error:
+            hedge = race.settle()
+            if hedge is None:
+                raise
+            # Cancelled because the hedge won, or failed: either way the hedge decides
+            try:
+                return hedge.result()
+            except BaseException:
+                self._record('failed')
+                raise error
+        self.observe(time.perf_counter() - start)
+        hedge = race.settle()
+        if hedge is not None and race.claim('primary'):
+            race.hedge_cancel.set()
+            self._record('lost')
+        return result
+
+    def stats(self) -> Dict:
+        """
+        :return: Current hedge delay, fetches seen and hedge outcomes
+        """
+        with self._lock:
+            fetches = self._fetches
+            counts = {outcome: self._outcomes[outcome] for outcome in ('won', 'lost', 'failed', 'denied')}
+        sent = counts['won'] + counts['lost'] + counts['failed']
+        return {
+            'delay_ms': None if self._delay is None else round(self._delay * 1000, 1),
+            'fetches': fetches,
+            'hedges': sent,
+            'hedge_rate': round(sent / fetches, 4) if fetches else 0.0,
+            'win_rate': round(counts['won'] / sent, 4) if sent else 0.0,
+            **counts,
+        }
+
+
+def _release_nothing() -> None:
+    pass
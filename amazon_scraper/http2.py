@@ -0,0 +1,227 @@
+"""
+Optional HTTP/2 transport for product page fetches
+
+HTTP2Adapter is a requests transport adapter backed by httpx, so it plugs
+in under the same fetch interface as the pooled HTTP/1.1 path:
+build_session(http2=True) mounts it and fetch_product_page() streams,
+decodes and times responses exactly as before. Instead of one TCP+TLS
+connection per concurrent fetch, product page requests are multiplexed as
+streams over a few long-lived HTTP/2 connections. Each connection carries
+at most max_streams requests at once; a request goes to the least busy
+connection and waits when every connection is full.
+
+Connections speak only HTTP/2: ALPN h2 over TLS, and prior knowledge (h2c)
+on plain http:// URLs such as the local stand-in server. Requires the
+optional httpx and h2 packages (pip install "httpx[http2]").
+"""
+import importlib.util
+import math
+import threading
+import time
+from typing import Callable, Dict, List
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .transport import record_connection_step
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+# Streams one connection carries at once; servers advertise their own
+# limit (commonly 100-128) and the lower of the two applies
+DEFAULT_MAX_STREAMS = 32
+
+# Connection-specific headers HTTP/2 forbids (RFC 9113, section 8.2.2)
+_HOP_BY_HOP = frozenset({'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade', 'te'})
+
+# httpcore trace events for connection setup, by our stage name
+_TRACE_STEPS = {'connection.connect_tcp': 'connect', 'connection.start_tls': 'tls'}
+
+
+def http2_available() -> bool:
+    """
+    :return: Whether httpx and h2 are installed
+    """
+    return httpx is not None and importlib.util.find_spec('h2') is not None
+
+
+def connections_for(concurrency: int, max_streams: int = DEFAULT_MAX_STREAMS) -> int:
+    """
+    :param concurrency: Fetches expected in flight at once
+    :param max_streams: Streams per connection
+    :return: Connections needed to carry that many fetches
+    """
+    return max(1, math.ceil(concurrency / max_streams))
+
+
+class _Lane:
+    """One HTTP/2 connection (an httpx client limited to a single connection) and its open streams"""
+
+    __slots__ = ('client', 'active')
+
+    def __init__(self, client):
+        self.client = client
+        self.active = 0
+
+
+class _StreamBody:
+    """
+    Minimal urllib3-style body for requests.Response: stream() yields
+    decoded chunks, read() returns the rest, tell() reports bytes
+    transferred before decoding
+    """
+
+    def __init__(self, response, release: Callable[[], None], request: requests.PreparedRequest):
+        self._response = response
+        self._release = release
+        self._request = request
+
+    def stream(self, amt: int = 2 ** 16, decode_content: bool = True):
+        try:
+            yield from self._response.iter_bytes(amt)
+        except httpx.HTTPError as e:
+            raise _request_error(e, self._request) from e
+        finally:
+            self.close()
+
+    def read(self, amt=None, decode_content: bool = True) -> bytes:
+        """Read the rest of the body (requests does when draining a redirect)"""
+        if self._release is None:
+            return b''
+        try:
+            return self._response.read()
+        except httpx.HTTPError as e:
+            raise _request_error(e, self._request) from e
+        finally:
+            self.close()
+
+    def tell(self) -> int:
+        return self._response.num_bytes_downloaded
+
+    def close(self) -> None:
+        if self._release is not None:
+            self._response.close()
+            self._release()
+            self._release = None
+
+    def release_conn(self) -> None:
+        self.close()
+
+
+def _request_error(error: Exception, request: requests.PreparedRequest) -> requests.exceptions.RequestException:
+    """Map an httpx error to the requests exception the pipeline classifies"""
+    if isinstance(error, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return requests.exceptions.ConnectTimeout(error, request=request)
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(error, request=request)
+    if isinstance(error, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(error, request=request)
+    return requests.exceptions.ConnectionError(error, request=request)
+
+
+def _httpx_timeout(timeout) -> 'httpx.Timeout':
+    """Convert a requests timeout (seconds, (connect, read) or None) to httpx.Timeout"""
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+    return httpx.Timeout(timeout)
+
+
+def _connection_trace() -> Callable[[str, Dict], None]:
+    """
+    :return: httpcore trace callback recording connect and TLS time for
+        the calling thread, like the HTTP/1.1 connection classes do
+    """
+    started: Dict[str, float] = {}
+
+    def trace(event_name: str, info: Dict) -> None:
+        step, _, phase = event_name.rpartition('.')
+        stage = _TRACE_STEPS.get(step)
+        if stage is None:
+            return
+        if phase == 'started':
+            started[stage] = time.perf_counter()
+        elif phase in ('complete', 'failed') and stage in started:
+            record_connection_step(stage, time.perf_counter() - started.pop(stage))
+
+    return trace
+
+
+class HTTP2Adapter(BaseAdapter):
+    """requests transport adapter multiplexing requests over a few HTTP/2 connections"""
+
+    def __init__(self, connections: int = 1, max_streams: int = DEFAULT_MAX_STREAMS, verify: bool = True):
+        """
+        :param connections: HTTP/2 connections to spread requests over
+        :param max_streams: Requests in flight per connection
+        :param verify: Verify TLS certificates; fixed per adapter, as httpx
+            clients cannot change it per request
+        :raises RuntimeError: When httpx or h2 is not installed
+        """
+        if not http2_available():
+            raise RuntimeError('The HTTP/2 transport needs httpx and h2: pip install "httpx[http2]"')
+        super().__init__()
+        self.max_streams = max(1, max_streams)
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        self._lanes: List[_Lane] = [
+            _Lane(httpx.Client(http1=False, http2=True, limits=limits, verify=verify, follow_redirects=False))
+            for _ in range(max(1, connections))
+        ]
+        self._condition = threading.Condition()
+
+    def _acquire(self) -> _Lane:
+        with self._condition:
+            while True:
+                lane = min(self._lanes, key=lambda candidate: candidate.active)
+                if lane.active < self.max_streams:
+                    lane.active += 1
+                    return lane
+                self._condition.wait()
+
+    def _releaser(self, lane: _Lane) -> Callable[[], None]:
+        def release() -> None:
+            with self._condition:
+                lane.active -= 1
+                self._condition.notify()
+        return release
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout=None, verify=True, cert=None,
+             proxies=None) -> requests.Response:
+        if proxies and any(proxies.values()):
+            raise requests.exceptions.InvalidProxyURL('The HTTP/2 transport does not route through proxies')
+        headers = [(name, value) for name, value in request.headers.items() if name.lower() not in _HOP_BY_HOP]
+        lane = self._acquire()
+        release = self._releaser(lane)
+        try:
+            upstream_request = lane.client.build_request(
+                request.method, request.url, headers=headers, content=request.body,
+                timeout=_httpx_timeout(timeout), extensions={'trace': _connection_trace()}
+            )
+            upstream = lane.client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            release()
+            raise _request_error(e, request) from e
+        except BaseException:
+            release()
+            raise
+
+        response = requests.Response()
+        response.status_code = upstream.status_code
+        response.headers = CaseInsensitiveDict(upstream.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = upstream.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.raw = _StreamBody(upstream, release, request)
+        response.http_version = upstream.http_version
+        return response
+
+    def close(self) -> None:
+        for lane in self._lanes:
+            lane.client.close()
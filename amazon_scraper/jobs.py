@@ -0,0 +1,116 @@
+"""
+Registry of recent scrape jobs
+
+Frontends register a job per scrape request so that data produced while it
+ran (trace summaries, profiles) can be fetched afterwards by job id. Only
+the most recent jobs are kept.
+
+With a directory, every job is written there as one JSON file, so all the
+processes serving an app (e.g. several gunicorn workers) see each other's
+jobs; without one, jobs only live in this process's memory.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """A finished or running scrape job and what it produced"""
+    id: str
+    created: float
+    asin_count: int = 0
+    trace_summary: Optional[Dict] = None
+    # JSON-serializable data by name, e.g. 'profile' (folded stacks text)
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+
+
+class JobStore:
+    """Thread- and process-safe, size-bounded mapping of job id to Job"""
+
+    def __init__(self, max_jobs: int = 100, directory: Optional[str] = None):
+        """
+        :param max_jobs: Oldest jobs are dropped beyond this many
+        :param directory: Directory shared by every process of the app to
+            keep jobs in (created on demand); None keeps them in memory
+        """
+        self.max_jobs = max_jobs
+        self.directory = directory
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, asin_count: int = 0) -> Job:
+        """
+        :param asin_count: Number of ASINs in the job
+        :return: New job; fill it in, then save() it
+        """
+        return Job(id=uuid.uuid4().hex[:12], created=time.time(), asin_count=asin_count)
+
+    def save(self, job: Job) -> None:
+        """
+        Store a job, or store it again after changing it
+
+        :param job: Job from create()
+        """
+        if self.directory is None:
+            with self._lock:
+                self._jobs[job.id] = job
+                while len(self._jobs) > self.max_jobs:
+                    self._jobs.popitem(last=False)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Written whole and renamed into place, so readers never see part of a job
+        path = self._path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(job), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        :param job_id: Id of a job from create()
+        :return: The job, or None when unknown or already dropped
+        """
+        if self.directory is None:
+            with self._lock:
+                return self._jobs.get(job_id)
+        # Ids are hex; anything else cannot name a job file
+        if not (job_id.isascii() and job_id.isalnum()):
+            return None
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return Job(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Unreadable job file for job {job_id}: {e}")
+            return None
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _prune(self) -> None:
+        """Drop the oldest job files beyond max_jobs"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_jobs)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process pruned it first
+                continue
@@ -0,0 +1,209 @@
+"""
+Listing pages: harvest title and price for a page of products per request
+
+A search or browse results page (/s?k=... or /s?rh=n:...) shows 20-50
+products, each card with its ASIN, title, price and star rating. For sweeps
+that only want those fields, reading the cards costs one request per page
+of products instead of one /dp/ request per product.
+
+parse_listing() reads a results page: one card per product (sponsored
+cards included), the link to the next page and whether it was a robot
+check. Scraper.iter_listing_results() follows each listing's pages and
+yields one result per ASIN, with a record in the get_amazon_product_details()
+schema (asin plus the title and/or price). The stars and rating count,
+which a product page only has among its attributes, fill in 'normalized'
+when the scraper normalizes. Listing mode is only offered when every
+requested field is one of LISTING_FIELDS.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+from .deadline import Deadline
+from .fetch import DEFAULT_BASE_URL
+from .parse import DEFAULT_PARSER, MISSING_TITLE, decode_html, is_robot_check
+
+if TYPE_CHECKING:
+    from .pipeline import ScrapeResult, Scraper
+
+logger = logging.getLogger(__name__)
+
+# Record fields a results card carries
+LISTING_FIELDS = ('title', 'price')
+
+_CARD_TYPE = 's-search-result'
+_NEXT_CLASS = 's-pagination-next'
+
+
+class ListingPage(NamedTuple):
+    """What a search or browse results page holds"""
+    # Raw fields per card, in page order: asin, title, price, reviews (the
+    # star and rating count text, '' when unrated) and sponsored
+    cards: List[Dict]
+    # Absolute URL of the next results page; None on the last page
+    next_url: Optional[str]
+    robot_check: bool
+
+
+def listing_covers(fields: Optional[Sequence[str]]) -> bool:
+    """
+    :param fields: Projection from select_fields(); None for all fields
+    :return: Whether listing pages carry every requested field
+    """
+    return fields is not None and all(field in LISTING_FIELDS for field in fields)
+
+
+def listing_url(listing: str, page: int = 1, base_url: str = DEFAULT_BASE_URL) -> str:
+    """
+    Build the URL of one page of a listing
+
+    :param listing: Search keywords ('digital safe'), or the path or URL of
+        a search/browse results page ('/s?rh=n:1380072031'); a URL's host
+        is replaced by base_url
+    :param page: 1-based results page
+    :param base_url: Marketplace root URL
+    :return: Results page URL
+    """
+    if listing.startswith('/') or '://' in listing:
+        parts = urlsplit(listing)
+        path, query = parts.path or '/s', [(key, value) for key, value in parse_qsl(parts.query) if key != 'page']
+    else:
+        path, query = '/s', [('k', listing)]
+    if page > 1:
+        query.append(('page', str(page)))
+    return f"{base_url}{path}?{urlencode(query)}"
+
+
+def _keep(name: str, attrs: Dict) -> bool:
+    if attrs.get('data-component-type') == _CARD_TYPE:
+        return True
+    if name == 'form':
+        # For the robot check form
+        return True
+    value = attrs.get('class') or ''
+    return _NEXT_CLASS in (value.split() if isinstance(value, str) else value)
+
+
+_LISTING_STRAINER = SoupStrainer(_keep)
+
+
+def _card_price(card: Tag) -> Optional[str]:
+    """:return: The card's price in the form extract_product_fields() gives, None when it shows none"""
+    for price in card.find_all('span', class_='a-price'):
+        # The struck-through M.R.P. is not the price
+        if price.get('data-a-strike') == 'true':
+            continue
+        whole = price.find('span', class_='a-price-whole')
+        if whole is not None:
+            symbol = price.find('span', class_='a-price-symbol')
+            return f"{symbol.get_text(strip=True) if symbol else '₹'}{whole.get_text(strip=True)}"
+    return None
+
+
+def _card_fields(card: Tag) -> Dict:
+    heading = card.find('h2')
+    title = heading.get_text(strip=True) if heading is not None else ''
+    stars = card.find('span', class_='a-icon-alt')
+    count = card.find('span', attrs={'aria-label': lambda label: bool(label) and 'rating' in label})
+    reviews = ''
+    if stars is not None:
+        # "4.3 out of 5 stars2,907 ratings", as the Customer Reviews attribute reads
+        reviews = stars.get_text(strip=True) + (count['aria-label'] if count is not None else '')
+    classes = card.get('class') or []
+    return {
+        'asin': card['data-asin'],
+        'title': title or MISSING_TITLE,
+        'price': _card_price(card) or '₹Price not found',
+        'reviews': reviews,
+        'sponsored': 'AdHolder' in classes,
+    }
+
+
+def parse_listing(content: bytes, content_type: Optional[str] = None, url: str = '') -> ListingPage:
+    """
+    Read the product cards and the next-page link off a results page
+
+    Only the cards, the pagination link and forms (for the robot check)
+    are built into the tree.
+
+    :param content: Raw page bytes
+    :param content_type: HTTP Content-Type header, for the charset
+    :param url: The page's URL, to resolve the next-page link against
+    :return: The page's cards (those without an ASIN, such as banners,
+        skipped), next page and whether it was a robot check
+    """
+    text = decode_html(content, content_type)
+    soup = BeautifulSoup(content if text is None else text, DEFAULT_PARSER, parse_only=_LISTING_STRAINER)
+    cards = [_card_fields(card) for card in soup.find_all(attrs={'data-component-type': _CARD_TYPE})
+             if card.get('data-asin')]
+    link = soup.find('a', class_=_NEXT_CLASS)
+    next_url = urljoin(url, link['href']) if link is not None and link.get('href') else None
+    return ListingPage(cards, next_url, is_robot_check(soup))
+
+
+class ListingRun:
+    """One iter_listing_results() call: listings paged through concurrently"""
+
+    def __init__(self, scraper: 'Scraper', deadline: Deadline, max_pages: Optional[int] = None):
+        """
+        :param scraper: Scraper to fetch with; its listing_stats are updated
+        :param deadline: Job deadline
+        :param max_pages: Results pages read per listing at most; None
+            follows the next-page links to the end
+        """
+        self.scraper = scraper
+        self.deadline = deadline
+        self.max_pages = max_pages
+        self._seen: Set[str] = set()
+
+    def _results(self, results: List['ScrapeResult']) -> Iterator['ScrapeResult']:
+        """Yield a page's results, each ASIN once per run"""
+        stats = self.scraper.listing_stats
+        for result in results:
+            if result.ok:
+                if result.asin in self._seen:
+                    stats['duplicates'] += 1
+                    continue
+                self._seen.add(result.asin)
+                stats['products'] += 1
+            yield result
+
+    def iter_results(self, listings: Iterable[str]) -> Iterator['ScrapeResult']:
+        """
+        :param listings: Search keywords or results page URLs (see listing_url())
+        :return: Iterator of per-ASIN results in completion order, plus an
+            error result (asin '') per results page that failed
+        """
+        scraper = self.scraper
+        stats = scraper.listing_stats
+        inputs = iter(listings)
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=scraper.concurrency) as pool:
+            pending = {}
+            while True:
+                # A listing's pages come one after another; listings run side by side
+                while not exhausted and len(pending) < scraper.concurrency:
+                    listing = next(inputs, None)
+                    if listing is None:
+                        exhausted = True
+                        break
+                    stats['listings'] += 1
+                    url = listing_url(listing, base_url=scraper.base_url)
+                    pending[pool.submit(scraper.scrape_listing_page, url, self.deadline)] = (url, 1)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, number = pending.pop(future)
+                    results, next_url, sent = future.result()
+                    stats['pages'] += 1
+                    stats['requests'] += sent
+                    yield from self._results(results)
+                    if next_url is not None and (self.max_pages is None or number < self.max_pages):
+                        pending[pool.submit(scraper.scrape_listing_page, next_url, self.deadline)] = (next_url,
+                                                                                                      number + 1)
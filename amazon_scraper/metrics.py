@@ -0,0 +1,385 @@
+"""
+In-process metrics with Prometheus text exposition
+
+Counters, gauges and histograms are recorded into per-thread shards: the
+hot path only touches a list owned by the current thread, so recording
+takes no lock and never contends between scraper workers. Shards are summed
+when the metrics are rendered. Shards of finished threads are folded into
+a retired total whenever a thread registers a new shard (and on render), so
+short-lived worker pools do not accumulate shards even if /metrics is never
+read.
+
+The pipeline's metrics are module-level objects in the default REGISTRY;
+app/app.py serves REGISTRY.render() at /metrics. Each process keeps its
+own registry, so under a multi-process WSGI server every worker reports
+its own numbers.
+"""
+import bisect
+import math
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond parse steps up to very slow fetches
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class _ShardedValues:
+    """
+    A fixed-size vector of floats, sharded per thread
+
+    add() is lock-free: each thread only ever writes its own shard. Locks
+    are taken when a thread creates its first shard and when summing; both
+    fold the shards of dead threads away, so at most one shard per live
+    thread (plus those that died since the last fold) is kept.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0.0] * size
+
+    def _shard(self) -> List[float]:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [0.0] * self._size
+            with self._lock:
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self) -> None:
+        """Fold the shards of finished threads into the retired total; the lock must be held"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # A finished thread never writes its shard again
+                for i, value in enumerate(shard):
+                    self._retired[i] += value
+        self._shards = live
+
+    def add(self, index: int, amount: float) -> None:
+        self._shard()[index] += amount
+
+    def add_many(self, updates: Sequence[Tuple[int, float]]) -> None:
+        shard = self._shard()
+        for index, amount in updates:
+            shard[index] += amount
+
+    def sum(self) -> List[float]:
+        with self._lock:
+            self._retire_dead()
+            totals = list(self._retired)
+            for _, shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        """
+        :return: The child metric for one combination of label values
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self._children[()]
+
+    def _label_string(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        inner = ','.join(
+            '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for name, value in pairs
+        )
+        return '{' + inner + '}'
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('_values',)
+
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._values.add(0, amount)
+
+    def value(self) -> float:
+        return self._values.sum()[0]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. results by status"""
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled().inc(amount)
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{self._label_string(key)} {_format(child.value())}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        self._values.add(0, -amount)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, e.g. requests in flight
+
+    Only relative updates (inc/dec) are supported, which is what keeps the
+    per-thread sharding exact.
+    """
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1) -> None:
+        self._unlabelled().dec(amount)
+
+    def track(self):
+        """
+        Context manager incrementing the gauge for the duration of a block
+        """
+        return self._unlabelled().track()
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_values')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One slot per bucket (incl. +Inf), then sum and count
+        self._values = _ShardedValues(len(bounds) + 3)
+
+    def observe(self, value: float) -> None:
+        bucket = bisect.bisect_left(self._bounds, value)
+        size = len(self._bounds)
+        self._values.add_many(((bucket, 1), (size + 1, value), (size + 2, 1)))
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        totals = self._values.sum()
+        size = len(self._bounds)
+        return totals[:size + 1], totals[size + 1], totals[size + 2]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (seconds, bytes) over fixed buckets"""
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0.0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == math.inf else _format(bound)
+            lines.append(f"{self.name}_bucket{self._label_string(key, ('le', le))} {_format(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_string(key)} {_format(total)}")
+        lines.append(f"{self.name}_count{self._label_string(key)} {_format(count)}")
+        return lines
+
+
+def _format(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        :return: All metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Content type for the /metrics response
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'scraper_stage_seconds',
+    'Time spent per pipeline stage (dns, connect, tls, ttfb, download, parse, extract)',
+    labelnames=('stage',)
+))
+FIELD_SOURCE_TOTAL = REGISTRY.register(Counter(
+    'scraper_field_source_total',
+    'Record fields by where they were read from (json: embedded JSON blobs, dom: the parsed HTML, '
+    'listing: a search results card)',
+    labelnames=('field', 'source')
+))
+LISTING_PAGES_TOTAL = REGISTRY.register(Counter(
+    'scraper_listing_pages_total',
+    'Search/browse results pages harvested, by result status',
+    labelnames=('status',)
+))
+VARIATION_RECORDS_TOTAL = REGISTRY.register(Counter(
+    'scraper_variation_records_total',
+    'Variation family records by how they were scraped (seed, probe: read in full; projected: only the '
+    'fields that differ fetched; shared: built from the seed without a request)',
+    labelnames=('source',)
+))
+RESULTS_TOTAL = REGISTRY.register(Counter(
+    'scraper_results_total',
+    'Scraped ASINs by result status',
+    labelnames=('status',)
+))
+CACHE_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'scraper_cache_requests_total',
+    'Page cache lookups by result',
+    labelnames=('result',)
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    'scraper_circuit_state',
+    'Marketplace circuit breakers in each state (closed, open, half_open)',
+    labelnames=('marketplace', 'state')
+))
+CIRCUIT_TRANSITIONS_TOTAL = REGISTRY.register(Counter(
+    'scraper_circuit_transitions_total',
+    'Marketplace circuit breaker state changes, by the state entered',
+    labelnames=('marketplace', 'state')
+))
+CIRCUIT_REJECTED_TOTAL = REGISTRY.register(Counter(
+    'scraper_circuit_rejected_total',
+    'Fetches refused without being sent because the marketplace circuit was open',
+    labelnames=('marketplace',)
+))
+HEDGES_TOTAL = REGISTRY.register(Counter(
+    'scraper_hedges_total',
+    'Hedged fetch requests by outcome (won, lost, failed, denied by the budget or for want of a thread or slot)',
+    labelnames=('outcome',)
+))
+DNS_CACHE_TOTAL = REGISTRY.register(Counter(
+    'scraper_dns_cache_total',
+    'Host name lookups by DNS cache result (hit, miss)',
+    labelnames=('result',)
+))
+BYTES_RECEIVED_TOTAL = REGISTRY.register(Counter(
+    'scraper_bytes_received_total',
+    'Product page bytes downloaded, after content decoding'
+))
+WIRE_BYTES_TOTAL = REGISTRY.register(Counter(
+    'scraper_wire_bytes_total',
+    'Product page body bytes as transferred, before content decoding, by host and content encoding',
+    labelnames=('host', 'encoding')
+))
+DECODED_BYTES_TOTAL = REGISTRY.register(Counter(
+    'scraper_decoded_bytes_total',
+    'Product page body bytes after content decoding, by host and content encoding',
+    labelnames=('host', 'encoding')
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'scraper_requests_in_flight',
+    'ASINs currently being scraped'
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'scraper_queue_depth',
+    'ASINs submitted to a worker pool and waiting for a free worker'
+))
+SCHEDULE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'scraper_schedule_wait_seconds',
+    'Time fetches waited for a FetchScheduler slot, by priority class',
+    labelnames=('priority',)
+))
+SCHEDULER_WAITING = REGISTRY.register(Gauge(
+    'scraper_scheduler_waiting',
+    'Fetches waiting for a FetchScheduler slot, by priority class',
+    labelnames=('priority',)
+))
+SCHEDULER_ACTIVE = REGISTRY.register(Gauge(
+    'scraper_scheduler_active',
+    'Fetches holding a FetchScheduler slot, by priority class',
+    labelnames=('priority',)
+))
+PROXY_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'scraper_proxy_requests_total',
+    'Requests sent through each egress proxy, by outcome (ok, blocked, error, aborted)',
+    labelnames=('proxy', 'outcome')
+))
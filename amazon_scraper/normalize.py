@@ -0,0 +1,209 @@
+"""
+Normalize stage: shape extracted fields into the canonical product record
+
+Every frontend (Flask app, CLI, JSON files) emits records with exactly these
+keys, in this order:
+
+    asin, title, price, attributes, bullet_points
+
+Records can additionally carry a 'normalized' dict of typed values parsed
+from the attributes (see normalize_attributes()). A scrape restricted to
+some fields (a projection, see parse.select_fields()) emits asin plus just
+those fields, in the same order.
+"""
+import functools
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+RECORD_FIELDS = ('asin', 'title', 'price', 'attributes', 'bullet_points')
+
+
+def build_product_record(asin: str, fields: Dict, projection: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Build the canonical product record from extracted fields
+
+    :param asin: Amazon Standard Identification Number
+    :param fields: Raw fields from extract_product_fields()
+    :param projection: Fields the caller asked for; None for all of them
+    :return: Product record keyed by RECORD_FIELDS, or by asin and the
+        projection's fields
+    """
+    record = {
+        'asin': asin,
+        'title': fields.get('title'),
+        'price': fields.get('price'),
+        'attributes': fields.get('attributes', {}),
+        'bullet_points': fields.get('bullet_points', [])
+    }
+    if projection is None:
+        return record
+    return {key: value for key, value in record.items() if key == 'asin' or key in projection}
+
+
+# ---------------------------------------------------------------------------
+# Attribute normalization
+#
+# Raw #prodDetails values are free text, e.g.
+#   "Customer Reviews":  "4.34.3 out of 5 stars2,907 ratings4.3 out of 5 stars"
+#   "Best Sellers Rank": "#719 in Home Improvement (See Top 100 in Home Improvement)#3 inHotel Safes"
+#   "Item Weight":       "9000 Grams"
+# The rules below turn them into typed fields. All patterns are compiled once
+# at import; which attribute key feeds which field is resolved once per
+# distinct key layout and repeated values are parsed once, so batches of
+# records from the same category mostly hit the caches.
+# ---------------------------------------------------------------------------
+
+NORMALIZED_FIELDS = ('rating', 'rating_count', 'best_sellers_rank', 'weight_g', 'dimensions_cm')
+
+_RATING_RE = re.compile(r'(\d(?:\.\d)?) out of 5 stars')
+_RATING_COUNT_RE = re.compile(r'([\d,]+)\s*(?:global\s+)?ratings?', re.IGNORECASE)
+_BSR_ENTRY_RE = re.compile(r'#\s*([\d,]+)\s*in\s*([^#]+)')
+_PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+_WEIGHT_RE = re.compile(
+    r'([\d.,]+)\s*(kilograms?|kgs?|grams?|gms?|g|milligrams?|mg|pounds?|lbs?|ounces?|oz)\b',
+    re.IGNORECASE
+)
+_DIMENSIONS_RE = re.compile(
+    r'([\d.,]+)\s*(?:[dwhl](?![a-z]))?\s*x\s*([\d.,]+)\s*(?:[dwhl](?![a-z]))?\s*'
+    r'(?:x\s*([\d.,]+)\s*(?:[dwhl](?![a-z]))?\s*)?'
+    r'(centimet(?:er|re)s?|cm|millimet(?:er|re)s?|mm|met(?:er|re)s?|m|inch(?:es)?|in|feet|foot|ft)\b',
+    re.IGNORECASE
+)
+
+_GRAMS_PER_UNIT = {
+    'kilogram': 1000.0, 'kg': 1000.0,
+    'gram': 1.0, 'gm': 1.0, 'g': 1.0,
+    'milligram': 0.001, 'mg': 0.001,
+    'pound': 453.59237, 'lb': 453.59237,
+    'ounce': 28.349523125, 'oz': 28.349523125,
+}
+_CM_PER_UNIT = {
+    'centimeter': 1.0, 'centimetre': 1.0, 'cm': 1.0,
+    'millimeter': 0.1, 'millimetre': 0.1, 'mm': 0.1,
+    'meter': 100.0, 'metre': 100.0, 'm': 100.0,
+    'inch': 2.54, 'inches': 2.54, 'in': 2.54,
+    'feet': 30.48, 'foot': 30.48, 'ft': 30.48,
+}
+
+
+def _to_number(text: str) -> float:
+    return float(text.replace(',', ''))
+
+
+def _unit_factor(unit: str, factors: Dict[str, float]) -> float:
+    unit = unit.lower()
+    if unit not in factors and unit.endswith('s'):
+        unit = unit[:-1]
+    return factors[unit]
+
+
+def _parse_rating(value: str) -> Optional[float]:
+    matches = _RATING_RE.findall(value)
+    return float(matches[-1]) if matches else None
+
+
+def _parse_rating_count(value: str) -> Optional[int]:
+    match = _RATING_COUNT_RE.search(value)
+    return int(match.group(1).replace(',', '')) if match else None
+
+
+def _parse_best_sellers_rank(value: str) -> Optional[List[Dict]]:
+    entries = [
+        {'rank': int(rank.replace(',', '')), 'category': category.strip()}
+        for rank, category in _BSR_ENTRY_RE.findall(_PARENTHETICAL_RE.sub('', value))
+    ]
+    return entries or None
+
+
+def _parse_weight_g(value: str) -> Optional[float]:
+    match = _WEIGHT_RE.search(value)
+    if not match:
+        return None
+    return round(_to_number(match.group(1)) * _unit_factor(match.group(2), _GRAMS_PER_UNIT), 3)
+
+
+def _parse_dimensions_cm(value: str) -> Optional[Tuple[float, ...]]:
+    match = _DIMENSIONS_RE.search(value)
+    if not match:
+        return None
+    factor = _unit_factor(match.group(4), _CM_PER_UNIT)
+    # A tuple, since parsed values are cached and shared between records
+    return tuple(round(_to_number(number) * factor, 2) for number in match.groups()[:3] if number)
+
+
+# (field, attribute key patterns in order of preference, value parser)
+_ATTRIBUTE_RULES = (
+    ('rating', (re.compile(r'customer reviews', re.IGNORECASE),), _parse_rating),
+    ('rating_count', (re.compile(r'customer reviews', re.IGNORECASE),), _parse_rating_count),
+    ('best_sellers_rank', (re.compile(r'best ?sellers? rank', re.IGNORECASE),), _parse_best_sellers_rank),
+    ('weight_g', (
+        re.compile(r'^item weight$', re.IGNORECASE),
+        re.compile(r'^(?:net |product )?weight$', re.IGNORECASE),
+        re.compile(r'weight', re.IGNORECASE),
+    ), _parse_weight_g),
+    ('dimensions_cm', (
+        re.compile(r'^(?:item|product) dimensions', re.IGNORECASE),
+        re.compile(r'dimensions', re.IGNORECASE),
+    ), _parse_dimensions_cm),
+)
+
+# Ranks are nearly unique per product, so only the other parsers are memoized
+_parsers_by_field = {
+    field: parser if field == 'best_sellers_rank' else functools.lru_cache(maxsize=4096)(parser)
+    for field, _, parser in _ATTRIBUTE_RULES
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _resolve_layout(keys: Tuple[str, ...]) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """
+    Pick the attribute key each normalized field is read from
+
+    :param keys: Attribute keys of a record, in page order
+    :return: (field, key or None) pairs
+    """
+    resolved = []
+    for field, key_patterns, _ in _ATTRIBUTE_RULES:
+        source = None
+        for pattern in key_patterns:
+            source = next((key for key in keys if pattern.search(key)), None)
+            if source is not None:
+                break
+        resolved.append((field, source))
+    return tuple(resolved)
+
+
+def normalize_attributes(attributes: Dict[str, str]) -> Dict:
+    """
+    Turn raw #prodDetails attribute strings into typed fields
+
+    :param attributes: Raw attribute mapping from a product record
+    :return: Dict keyed by NORMALIZED_FIELDS; fields that could not be found
+        or parsed are None. weight_g is in grams, dimensions_cm a list of
+        lengths in centimetres and best_sellers_rank a list of
+        {'rank', 'category'} entries.
+    """
+    normalized = {}
+    for field, key in _resolve_layout(tuple(attributes)):
+        value = attributes.get(key) if key is not None else None
+        parsed = _parsers_by_field[field](value) if value else None
+        normalized[field] = list(parsed) if isinstance(parsed, tuple) else parsed
+    return normalized
+
+
+def normalize_records(records: Iterable[Dict]) -> List[Dict]:
+    """
+    Add a 'normalized' field to a batch of product records
+
+    Records without attributes (e.g. error entries) are passed through.
+
+    :param records: Product records
+    :return: The same records, each successful one with 'normalized' set
+    """
+    batch = []
+    for record in records:
+        attributes = record.get('attributes')
+        if attributes is not None:
+            record['normalized'] = normalize_attributes(attributes)
+        batch.append(record)
+    return batch
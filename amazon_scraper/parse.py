@@ -0,0 +1,347 @@
+"""
+Parse stage: build the HTML tree and pull raw product fields out of it
+
+Callers that only need some fields (a repricing check only wants the price)
+pass a projection: a subset of PRODUCT_FIELDS. parse_html() then only
+builds the tree for the regions those fields are read from,
+extract_product_fields() only extracts them, and a RegionScanner lets the
+download stop as soon as those regions are in.
+"""
+import codecs
+import functools
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import CData, NavigableString, PageElement, Tag
+
+DEFAULT_PARSER = 'html.parser'
+
+# String classes get_text() reads by default: no comments, script or style text
+_TEXT_TYPES = (NavigableString, CData)
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# Browsers only honour a meta charset near the top of the document
+_META_PRESCAN_BYTES = 4096
+_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+# Title placeholder when a page has no #productTitle
+MISSING_TITLE = 'Title not found'
+# Form target of Amazon's "Enter the characters you see below" interstitial
+_CAPTCHA_ACTION = re.compile(r'/errors/validateCaptcha')
+
+# Fields extract_product_fields() returns, in record order
+PRODUCT_FIELDS = ('title', 'price', 'attributes', 'bullet_points')
+
+# Page regions each field is read from, as (tag name, attribute, value)
+_FIELD_REGIONS = {
+    'title': (('span', 'id', 'productTitle'),),
+    'price': (('span', 'class', 'a-price-symbol'), ('span', 'class', 'a-price-whole')),
+    'attributes': (('div', 'id', 'prodDetails'),),
+    'bullet_points': (('div', 'id', 'feature-bullets'),),
+}
+
+
+def select_fields(fields: Optional[Union[str, Iterable[str]]]) -> Optional[Tuple[str, ...]]:
+    """
+    Validate a field projection
+
+    :param fields: Field names, or a comma-separated string of them; None for all fields
+    :return: The requested fields in PRODUCT_FIELDS order, or None for all fields
+    :raises ValueError: On an unknown field name or an empty projection
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    requested = {field.strip() for field in fields if field.strip()}
+    unknown = requested.difference(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(sorted(unknown))}; choose from {', '.join(PRODUCT_FIELDS)}")
+    if not requested:
+        raise ValueError("No fields requested")
+    return tuple(field for field in PRODUCT_FIELDS if field in requested)
+
+
+@functools.lru_cache(maxsize=None)
+def _region_strainer(fields: Tuple[str, ...]) -> SoupStrainer:
+    """
+    :param fields: Projection from select_fields()
+    :return: Strainer keeping only the regions those fields are read from,
+        plus the robot check form
+    """
+    ids = {value for field in fields for _, attribute, value in _FIELD_REGIONS[field] if attribute == 'id'}
+    classes = {value for field in fields for _, attribute, value in _FIELD_REGIONS[field] if attribute == 'class'}
+
+    def keep(name: str, attrs: Dict) -> bool:
+        if attrs.get('id') in ids:
+            return True
+        if name == 'form':
+            return _CAPTCHA_ACTION.search(attrs.get('action') or '') is not None
+        value = attrs.get('class')
+        if not value or not classes:
+            return False
+        return not classes.isdisjoint(value.split() if isinstance(value, str) else value)
+
+    return SoupStrainer(keep)
+
+
+def declared_charset(content: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    Find the encoding a page declares for itself
+
+    :param content: Raw page bytes
+    :param content_type: HTTP Content-Type header, if known
+    :return: Normalized codec name from the header charset, else from the
+        first <meta> charset; None when neither names a known codec
+    """
+    if content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        encoding = match and _codec_name(match.group(1))
+        if encoding:
+            return encoding
+    match = _META_CHARSET.search(content, 0, _META_PRESCAN_BYTES)
+    return match and _codec_name(match.group(1).decode('ascii'))
+
+
+def _codec_name(label: str) -> Optional[str]:
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+def decode_html(content: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    Decode a page with its declared charset, without sniffing
+
+    :param content: Raw page bytes
+    :param content_type: HTTP Content-Type header, if known
+    :return: Decoded HTML, or None when the page starts with a byte order
+        mark, declares no usable charset or does not decode with it
+    """
+    if content.startswith(_BOMS):
+        return None
+    encoding = declared_charset(content, content_type)
+    if encoding is None:
+        return None
+    try:
+        return content.decode(encoding)
+    except UnicodeDecodeError:
+        return None
+
+
+def parse_html(
+    content: Union[bytes, str],
+    parser: str = DEFAULT_PARSER,
+    content_type: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> BeautifulSoup:
+    """
+    Parse a product page into a BeautifulSoup tree
+
+    Bytes are decoded once with the charset from the Content-Type header or
+    the page's <meta> tag; bs4's encoding detection only runs when that fails.
+
+    :param content: Raw page HTML
+    :param parser: bs4 tree builder ('html.parser', or 'lxml' / 'html5lib' when installed)
+    :param content_type: HTTP Content-Type header the page was served with
+    :param fields: Projection from select_fields(); only the regions these
+        fields are read from (and a robot check form) are built into the
+        tree. html5lib always builds the whole tree.
+    :return: Parsed document
+    """
+    strainer = None if fields is None else _region_strainer(fields)
+    if isinstance(content, bytes):
+        text = decode_html(content, content_type)
+        if text is not None:
+            return BeautifulSoup(text, parser, parse_only=strainer)
+    return BeautifulSoup(content, parser, parse_only=strainer)
+
+
+def is_robot_check(soup: BeautifulSoup) -> bool:
+    """
+    :param soup: Parsed page
+    :return: Whether the page is Amazon's robot check (captcha) interstitial
+        instead of a product page
+    """
+    return soup.find('form', action=_CAPTCHA_ACTION) is not None
+
+
+class RegionScanner:
+    """
+    Watches a page's bytes as they download for the end of every region a
+    projection's fields are read from, so the rest of the page need not be
+    read
+
+    A region starts at the first opening tag with its id or class and ends
+    where the nested tags of the same name balance out. The bytes are
+    scanned as sent, so pages in charsets that are not ASCII-compatible
+    never match and are read in full, as are pages (robot checks, missing
+    sections) where a region never shows up.
+    """
+    # Bytes held back between chunks for a tag cut in two; longer tags are not seen
+    _MAX_TAG = 4096
+
+    def __init__(self, fields: Tuple[str, ...]):
+        """
+        :param fields: Projection from select_fields()
+        """
+        regions = {region for field in fields for region in _FIELD_REGIONS[field]}
+        # [start tag pattern, tag name pattern, open depth or None, absolute offset scanned up to]
+        self._pending = [[_region_start(*region), _tag_pattern(region[0]), None, 0] for region in sorted(regions)]
+        self._carry = b''
+        self._offset = 0
+
+    @property
+    def complete(self) -> bool:
+        """Whether every region has been read to its end"""
+        return not self._pending
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        :param chunk: Next piece of the page body
+        :return: Whether every region has now been read to its end
+        """
+        window = self._carry + chunk
+        base = self._offset
+        last_tag = window.rfind(b'<', max(0, len(window) - self._MAX_TAG))
+        carry_start = len(window) if last_tag < 0 else last_tag
+        for region in self._pending:
+            start, tags, depth, scanned = region
+            position = max(0, scanned - base)
+            if depth is None:
+                match = start.search(window, position)
+                if match is None:
+                    region[3] = base + carry_start
+                    continue
+                depth, position = 1, match.end()
+            for match in tags.finditer(window, position):
+                depth += -1 if match.group(1) else 1
+                position = match.end()
+                if depth == 0:
+                    break
+            region[2] = depth
+            region[3] = max(base + position, base + carry_start)
+        self._pending = [region for region in self._pending if region[2] != 0]
+        self._carry = window[carry_start:]
+        self._offset = base + carry_start
+        return not self._pending
+
+
+def _region_start(tag: str, attribute: str, value: str) -> 're.Pattern[bytes]':
+    name, attribute, value = (re.escape(part.encode('ascii')) for part in (tag, attribute, value))
+    if attribute == b'class':
+        value = rb'["\'](?:[^"\'>]*\s)?' + value + rb'(?=[\s"\'])'
+    else:
+        value = rb'["\']?' + value + rb'(?=[\s"\'>])'
+    return re.compile(rb'<' + name + rb'\b[^>]*?\s' + attribute + rb'\s*=\s*' + value, re.IGNORECASE)
+
+
+def _tag_pattern(tag: str) -> 're.Pattern[bytes]':
+    return re.compile(rb'<(/?)' + re.escape(tag.encode('ascii')) + rb'\b', re.IGNORECASE)
+
+
+def extract_product_fields(soup: BeautifulSoup, fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    """
+    Extract title, price, attributes and bullet points from a product page
+
+    :param soup: Parsed product page
+    :param fields: Projection from select_fields(); None extracts every field
+    :return: Dictionary of raw field values, keyed by the requested fields
+    """
+    extracted = {}
+    if fields is None or 'title' in fields:
+        title_elem = soup.find('span', {'id': 'productTitle'})
+        extracted['title'] = title_elem.get_text(strip=True) if title_elem else MISSING_TITLE
+
+    if fields is None or 'price' in fields:
+        price_whole_elem = soup.find('span', {'class': 'a-price-whole'})
+        price_symbol_elem = soup.find('span', {'class': 'a-price-symbol'})
+        extracted['price'] = f"{price_symbol_elem.get_text(strip=True) if price_symbol_elem else '₹'}{price_whole_elem.get_text(strip=True) if price_whole_elem else 'Price not found'}"
+
+    if fields is None or 'attributes' in fields:
+        extracted['attributes'] = _extract_attributes(soup)
+
+    if fields is None or 'bullet_points' in fields:
+        bullet_points = []
+        feature_bullets_div = soup.find('div', {'id': 'feature-bullets'})
+        if feature_bullets_div:
+            bullet_points = [text for _, text in collect_text(feature_bullets_div, ('li',)) if text]
+        extracted['bullet_points'] = bullet_points
+
+    return extracted
+
+
+def _extract_attributes(soup: BeautifulSoup) -> Dict[str, str]:
+    """
+    :return: #prodDetails table rows as {header: value}
+    """
+    attributes = {}
+    product_details_div = soup.find('div', {'id': 'prodDetails'})
+    if product_details_div:
+        key = value = None
+        for name, text in collect_text(product_details_div, ('th', 'td'), markers=('tr',)):
+            if name == 'tr':
+                if key is not None and value is not None:
+                    attributes[key] = value
+                key = value = None
+            elif name == 'th' and key is None:
+                key = text
+            elif name == 'td' and value is None:
+                value = text
+        if key is not None and value is not None:
+            attributes[key] = value
+    return attributes
+
+
+def collect_text(
+    container: Tag,
+    names: Iterable[str],
+    markers: Iterable[str] = ()
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Collect the text of every tag named in names with one walk of the container
+
+    Equivalent to calling get_text(strip=True) on each matching tag, but the
+    subtree is traversed once rather than once per find_all(), find() and
+    get_text() call; nested matches each get their full text.
+
+    :param container: Subtree to walk
+    :param names: Tag names whose text is collected
+    :param markers: Tag names reported in document order without text, to
+        delimit groups such as table rows
+    :return: (tag name, text) pairs in document order; text is None for markers
+    """
+    names = frozenset(names)
+    markers = frozenset(markers)
+    found: List[Tuple[str, Optional[List[str]]]] = []
+    open_parts: List[Tuple[Optional[PageElement], List[str]]] = []
+    for node in container.descendants:
+        while open_parts and node is open_parts[-1][0]:
+            open_parts.pop()
+        if isinstance(node, Tag):
+            if node.name in names:
+                parts = []
+                found.append((node.name, parts))
+                open_parts.append((_next_outside(node), parts))
+            elif node.name in markers:
+                found.append((node.name, None))
+        elif open_parts and type(node) in _TEXT_TYPES:
+            for _, parts in open_parts:
+                parts.append(node)
+    # Whitespace is stripped in one pass once all strings are gathered
+    return [(name, None if parts is None else ''.join(filter(None, map(str.strip, parts))))
+            for name, parts in found]
+
+
+def _next_outside(tag: Tag) -> Optional[PageElement]:
+    """
+    :return: First element after tag's subtree in document order, or None
+    """
+    node = tag
+    while node is not None and node.next_sibling is None:
+        node = node.parent
+    return None if node is None else node.next_sibling
@@ -0,0 +1,48 @@
+"""
+Persist stage: write product records to disk or streams
+"""
+import json
+import logging
+from typing import Dict, Iterable, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+def save_product_details(product_details, filename: str = 'product_details.json') -> None:
+    """
+    Save product details to a JSON file
+
+    :param product_details: Product record (or list of records)
+    :param filename: Output filename
+    """
+    if product_details:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(product_details, f, indent=4, ensure_ascii=False)
+        logger.info(f"Product details saved to {filename}")
+
+
+def write_jsonl_record(record: Dict, stream: TextIO) -> None:
+    """
+    Write one record as a JSON Lines entry and flush it through
+
+    :param record: Product record
+    :param stream: Text stream to write to
+    """
+    stream.write(json.dumps(record, ensure_ascii=False))
+    stream.write('\n')
+    stream.flush()
+
+
+def write_jsonl(records: Iterable[Dict], stream: TextIO) -> int:
+    """
+    Write records as JSON Lines, one record per line
+
+    :param records: Product records
+    :param stream: Text stream to write to
+    :return: Number of records written
+    """
+    count = 0
+    for record in records:
+        write_jsonl_record(record, stream)
+        count += 1
+    return count
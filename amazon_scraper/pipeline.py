@@ -0,0 +1,677 @@
+"""
+Scrape pipeline: fetch -> parse -> normalize for one or many ASINs
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+from .breaker import CircuitBreaker, CircuitOpenError, is_failure
+from .cache import PageCache
+from .deadline import Deadline, DeadlineExceeded
+from .fetch import (
+    DEFAULT_BASE_URL, DEFAULT_TIMEOUT, FetchedPage, build_session, fetch_page, prewarm_session, product_url
+)
+from .embedded import VariationFamily, extract_embedded_fields, extract_variation_family, find_json_blobs
+from .hedge import Hedger
+from .listing import LISTING_FIELDS, ListingRun, listing_covers, parse_listing
+from .metrics import (
+    CACHE_REQUESTS_TOTAL, FIELD_SOURCE_TOTAL, IN_FLIGHT, LISTING_PAGES_TOTAL, QUEUE_DEPTH, RESULTS_TOTAL, STAGE_SECONDS
+)
+from .normalize import build_product_record, normalize_attributes
+from .parse import MISSING_TITLE, PRODUCT_FIELDS, extract_product_fields, is_robot_check, parse_html, select_fields
+from .profiler import SamplingProfiler
+from .proxies import NoHealthyProxyError, ProxyPool
+from .ratelimit import RateLimiter
+from .scheduler import FetchScheduler
+from .record import ProductRecord
+from .trace import ScrapeTrace, summarize_traces
+from .variations import FamilyRun
+
+logger = logging.getLogger(__name__)
+
+_parse_seconds = STAGE_SECONDS.labels(stage='parse')
+_extract_seconds = STAGE_SECONDS.labels(stage='extract')
+
+
+@dataclass
+class ScrapeResult:
+    """Outcome of scraping one ASIN, with the bookkeeping batch runs report on"""
+    asin: str
+    record: Optional[Dict] = None
+    error: Optional[str] = None
+    status: str = 'ok'
+    bytes_received: int = 0
+    wire_bytes: int = 0
+    elapsed: float = 0.0
+    cache_hit: bool = False
+    trace: Optional[ScrapeTrace] = None
+    # The page's variation family, when the scraper reads them
+    family: Optional[VariationFamily] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.record is not None
+
+    def to_dict(self) -> Dict:
+        """
+        :return: The product record, or the {'asin', 'error', 'status'}
+            entry on failure; with a 'trace' timing breakdown when tracing
+            was on
+        """
+        if self.record is not None:
+            entry = self.record
+        else:
+            entry = {'asin': self.asin, 'error': self.error, 'status': self.status}
+        if self.trace is not None:
+            entry = {**entry, 'trace': self.trace.to_dict()}
+        return entry
+
+
+def classify_request_error(error: requests.exceptions.RequestException) -> str:
+    """
+    Map a fetch failure to a coarse result status for metrics
+
+    :param error: Exception raised while fetching
+    :return: One of 'http_4xx', 'http_5xx', 'timeout', 'no_proxy', 'circuit_open', 'network_error'
+    """
+    response = getattr(error, 'response', None)
+    if response is not None and response.status_code >= 400:
+        return 'http_5xx' if response.status_code >= 500 else 'http_4xx'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, NoHealthyProxyError):
+        return 'no_proxy'
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    return 'network_error'
+
+
+class Scraper:
+    """
+    Runs the scrape pipeline with shared connection, cache and rate-limit state
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        session: Optional[requests.Session] = None,
+        concurrency: int = 1,
+        cache: Optional[PageCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        normalize: bool = False,
+        trace: bool = False,
+        profiler: Optional[SamplingProfiler] = None,
+        scheduler: Optional[FetchScheduler] = None,
+        priority: str = 'bulk',
+        proxy_pool: Optional[ProxyPool] = None,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        asin_budget: Optional[float] = None,
+        deadline: Optional[float] = None,
+        http2: bool = False,
+        prewarm: int = 0,
+        hedger: Optional[Hedger] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        fields: Optional[Union[str, Sequence[str]]] = None,
+        embedded_json: bool = True,
+        variations: bool = False,
+        expand_variations: bool = True
+    ):
+        """
+        :param base_url: Marketplace root URL
+        :param session: Session to fetch with; one sized for concurrency is created if omitted
+        :param concurrency: Number of ASINs scraped in parallel
+        :param cache: Optional on-disk page cache
+        :param rate_limiter: Optional limiter applied to network fetches
+        :param normalize: Add typed 'normalized' fields parsed from the attributes
+        :param trace: Attach a ScrapeTrace to every result and keep them in
+            self.traces for trace_summary()
+        :param profiler: Started SamplingProfiler to sample worker threads
+            while they scrape
+        :param scheduler: Process-wide FetchScheduler that network fetches
+            wait on, shared with other scrapers
+        :param priority: Scheduler priority class of this scraper's fetches
+        :param proxy_pool: Egress proxies to balance fetches across; used
+            when the session is created here
+        :param timeout: (connect, read) timeouts in seconds for each fetch
+        :param asin_budget: Seconds one ASIN may take from fetch to record,
+            waits for rate limit and fetch slot included
+        :param deadline: Seconds a whole iter_results()/process() call may
+            take; ASINs not finished by then are reported 'deadline_exceeded'
+        :param http2: Fetch over multiplexed HTTP/2 connections instead of
+            one HTTP/1.1 connection per worker; used when the session is
+            created here
+        :param prewarm: Keep-alive connections to open when each
+            iter_results()/process() call starts, so the first fetches skip
+            connection setup; typically the concurrency
+        :param hedger: Hedges network fetches that run past the recent p95
+            latency with a second request, within the hedger's budget
+        :param circuit_breaker: Breaker for the marketplace, usually shared
+            by every scraper in the process; while it is open network fetches
+            are refused (status 'circuit_open') instead of sent
+        :param fields: Only scrape these of PRODUCT_FIELDS (names or a
+            comma-separated string); records then hold asin and these
+            fields, and downloads stop once the page regions they are read
+            from are in. None scrapes every field.
+        :param embedded_json: Read the fields a page's embedded JSON carries
+            (price, title) from the JSON and build the tree only for the
+            rest; False always extracts from the tree
+        :param variations: Scrape variation families together (see
+            variations.py): each family's twister data is read once, every
+            ASIN is fetched at most once per run, and children are fetched
+            only for the fields that differ between siblings. Requests per
+            family are kept in self.family_stats.
+        :param expand_variations: In variations mode, also scrape the
+            children of each family found that the input does not list
+        :raises ValueError: On an unknown field name
+        """
+        self.base_url = base_url
+        self.concurrency = max(1, concurrency)
+        self.proxy_pool = proxy_pool
+        # Hedges are extra requests in flight, so they need connections of their own
+        pool_size = self.concurrency * 2 if hedger is not None else self.concurrency
+        self.session = session or build_session(pool_size=pool_size, proxy_pool=proxy_pool, http2=http2)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.normalize = normalize
+        self.trace = trace
+        self.traces: List[Tuple[str, ScrapeTrace]] = []
+        self.profiler = profiler
+        self.scheduler = scheduler
+        self.priority = priority
+        self.timeout = timeout
+        self.asin_budget = asin_budget
+        self.deadline = deadline
+        self.prewarm = prewarm
+        self.hedger = hedger
+        self.circuit_breaker = circuit_breaker
+        self.fields = select_fields(fields)
+        # Fields read from the page: 'normalized' is parsed from the attributes
+        self._read_fields = self.fields
+        if self.fields is not None and normalize and 'attributes' not in self.fields:
+            self._read_fields = select_fields(self.fields + ('attributes',))
+        self.embedded_json = embedded_json
+        self.variations = variations
+        self.expand_variations = expand_variations
+        # Parent ASIN -> children, records, requests, ... of each family scraped
+        self.family_stats: Dict[str, Dict] = {}
+        # Totals of the listings harvested by iter_listing_results()
+        self.listing_stats = {'listings': 0, 'pages': 0, 'requests': 0, 'products': 0, 'duplicates': 0}
+
+    def fetch(
+        self,
+        asin: str,
+        deadline: Optional[Deadline] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> FetchedPage:
+        """
+        Fetch a product page, serving it from the cache when possible
+
+        :param asin: Amazon Standard Identification Number
+        :param deadline: When the page must be in hand, waits included
+        :param fields: Stop the download once the regions of these fields
+            are in; None reads the whole page
+        :return: Fetched page; status_code 0 marks a cache hit. Cache lookup,
+            rate-limit and scheduler wait times are added to page.timings.
+            With fields the page may be truncated after their regions.
+        :raises DeadlineExceeded: When the deadline passes first
+        :raises CircuitOpenError: When the marketplace circuit is open
+        """
+        return self.fetch_url(product_url(asin, self.base_url), deadline, fields, asin=asin)
+
+    def fetch_url(
+        self,
+        url: str,
+        deadline: Optional[Deadline] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        asin: str = ''
+    ) -> FetchedPage:
+        """
+        Fetch any marketplace page (a search results page, say) the way
+        fetch() fetches product pages: cached, rate limited, scheduled,
+        hedged and behind the circuit breaker
+
+        :param url: Page URL
+        :param deadline: When the page must be in hand, waits included
+        :param fields: See fetch()
+        :param asin: The product's ASIN when the page is a product page
+        :return: Fetched page; see fetch()
+        :raises DeadlineExceeded: When the deadline passes first
+        :raises CircuitOpenError: When the marketplace circuit is open
+        """
+        cache_time = 0.0
+        if self.cache is not None:
+            lookup_start = time.perf_counter()
+            content = self.cache.get(url)
+            cache_time = time.perf_counter() - lookup_start
+            CACHE_REQUESTS_TOTAL.labels(result='miss' if content is None else 'hit').inc()
+            if content is not None:
+                return FetchedPage(asin=asin, url=url, status_code=0, content=content, timings={'cache': cache_time})
+
+        if self.circuit_breaker is None:
+            page, rate_limit_time, schedule_time = self._send(url, asin, deadline, fields)
+        else:
+            probe = self.circuit_breaker.allow(deadline)
+            try:
+                page, rate_limit_time, schedule_time = self._send(url, asin, deadline, fields)
+            except requests.exceptions.RequestException as e:
+                self.circuit_breaker.report(probe, is_failure(e))
+                raise
+            except BaseException:
+                self.circuit_breaker.report(probe, None)
+                raise
+            self.circuit_breaker.report(probe, False)
+        page.timings['cache'] = cache_time
+        page.timings['rate_limit'] = rate_limit_time
+        page.timings['schedule'] = schedule_time
+
+        if self.cache is not None and not page.truncated:
+            self.cache.put(page.url, page.content)
+        return page
+
+    def _send(
+        self,
+        url: str,
+        asin: str,
+        deadline: Optional[Deadline],
+        fields: Optional[Tuple[str, ...]]
+    ) -> Tuple[FetchedPage, float, float]:
+        """Wait for the rate limit and a scheduler slot, then download; returns the page and both waits"""
+        wait_start = time.perf_counter()
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(deadline)
+        rate_limit_time = time.perf_counter() - wait_start
+        if self.scheduler is None:
+            return self._download(url, asin, deadline, fields), rate_limit_time, 0.0
+        with self.scheduler.slot(self.priority, deadline) as schedule_time:
+            page = self._download(url, asin, deadline, fields)
+        return page, rate_limit_time, schedule_time
+
+    def _download(
+        self,
+        url: str,
+        asin: str,
+        deadline: Optional[Deadline],
+        fields: Optional[Tuple[str, ...]]
+    ) -> FetchedPage:
+        """Fetch a page from the network, hedged when a hedger is set"""
+        if self.hedger is None:
+            return fetch_page(url, session=self.session, timeout=self.timeout, deadline=deadline, fields=fields,
+                              asin=asin)
+
+        def attempt(cancel: threading.Event) -> FetchedPage:
+            return fetch_page(url, session=self.session, timeout=self.timeout, deadline=deadline, cancel=cancel,
+                              fields=fields, asin=asin)
+
+        def rate_limited_attempt(cancel: threading.Event) -> FetchedPage:
+            # The hedge is an extra request and waits its turn like any other
+            self.rate_limiter.acquire(deadline)
+            return attempt(cancel)
+
+        def reserve_slot() -> Optional[Callable[[], None]]:
+            # The hedge holds a slot of its own, so per-class caps count it;
+            # it is dropped rather than queued when none is free
+            if not self.scheduler.try_acquire(self.priority):
+                return None
+            return lambda: self.scheduler.release(self.priority)
+
+        return self.hedger.run(attempt, deadline, rate_limited_attempt if self.rate_limiter is not None else None,
+                               reserve_slot if self.scheduler is not None else None)
+
+    def scrape(
+        self,
+        asin: str,
+        queue_wait: float = 0.0,
+        deadline: Optional[Deadline] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> ScrapeResult:
+        """
+        Scrape one ASIN, capturing any failure in the result
+
+        :param asin: Amazon Standard Identification Number
+        :param queue_wait: Seconds the ASIN waited for a worker, for its trace
+        :param deadline: Job deadline; the ASIN budget is applied within it
+        :param fields: Projection for this ASIN instead of the scraper's,
+            from select_fields(); normalized only when it has attributes
+        :return: Scrape result
+        """
+        deadline = (deadline or Deadline()).within(self.asin_budget)
+        if self.profiler is None:
+            return self._scrape(asin, queue_wait, deadline, fields)
+        self.profiler.register_thread()
+        try:
+            return self._scrape(asin, queue_wait, deadline, fields)
+        finally:
+            self.profiler.unregister_thread()
+
+    def _scrape(
+        self,
+        asin: str,
+        queue_wait: float,
+        deadline: Deadline,
+        projection: Optional[Tuple[str, ...]]
+    ) -> ScrapeResult:
+        result = ScrapeResult(asin=asin)
+        if projection is None:
+            projection, read_fields, normalize = self.fields, self._read_fields, self.normalize
+            # A page's twister data comes after the regions, so pages that
+            # may name a variation family are read whole
+            download_fields = None if self.variations else read_fields
+        else:
+            read_fields, normalize = projection, self.normalize and 'attributes' in projection
+            download_fields = read_fields
+        trace = ScrapeTrace(queue_wait_ms=queue_wait * 1000) if self.trace else None
+        start = time.perf_counter()
+        with IN_FLIGHT.track():
+            try:
+                deadline.check('the scrape started')
+                page = self.fetch(asin, deadline, download_fields)
+                if trace is not None:
+                    trace.fetch_ms = (time.perf_counter() - start) * 1000
+                    for stage, seconds in page.timings.items():
+                        setattr(trace, f"{stage}_ms", seconds * 1000)
+                result.cache_hit = page.status_code == 0
+                result.bytes_received = 0 if result.cache_hit else len(page.content)
+                result.wire_bytes = page.wire_bytes
+
+                # The embedded JSON goes first; the tree is then built only
+                # for the regions of fields it did not carry. bs4 cannot be
+                # interrupted mid-document, so the budget is enforced between
+                # stages; the fetched page stays cached.
+                wanted = read_fields or PRODUCT_FIELDS
+                content_type = page.headers.get('Content-Type')
+                deadline.check('extraction')
+                json_start = time.perf_counter()
+                # One scan finds the blobs for both the fields and the family
+                blobs = None
+                if self.variations and download_fields is None:
+                    blobs = find_json_blobs(page.content, content_type)
+                fields = extract_embedded_fields(page.content, content_type, wanted, blobs) if self.embedded_json else {}
+                from_json = frozenset(fields)
+                extract_time = time.perf_counter() - json_start
+                parse_time = 0.0
+                soup = None
+                remaining = tuple(field for field in wanted if field not in from_json)
+                if remaining:
+                    deadline.check('parsing')
+                    parse_start = time.perf_counter()
+                    soup = parse_html(page.content, content_type=content_type, fields=remaining)
+                    extract_start = time.perf_counter()
+                    deadline.check('extraction')
+                    fields.update(extract_product_fields(soup, remaining))
+                    parse_time = extract_start - parse_start
+                    extract_time += time.perf_counter() - extract_start
+                    _parse_seconds.observe(parse_time)
+                _extract_seconds.observe(extract_time)
+                if trace is not None:
+                    trace.parse_ms = parse_time * 1000
+                    trace.extract_ms = extract_time * 1000
+
+                # Without the title to go by, every parsed page is checked for
+                # the form; a page whose JSON carried every field is no robot check
+                if fields.get('title', MISSING_TITLE) == MISSING_TITLE and soup is not None and is_robot_check(soup):
+                    self._blocked(page)
+                    result.status = 'blocked'
+                    result.error = 'Blocked by robot check page'
+                else:
+                    for field in wanted:
+                        FIELD_SOURCE_TOTAL.labels(field=field, source='json' if field in from_json else 'dom').inc()
+                    result.record = build_product_record(asin, fields, projection)
+                    if normalize:
+                        result.record['normalized'] = normalize_attributes(fields['attributes'])
+                    if blobs is not None:
+                        result.family = extract_variation_family(page.content, content_type, blobs)
+            except DeadlineExceeded as e:
+                logger.warning(f"ASIN {asin}: {e}")
+                result.status = 'deadline_exceeded'
+                result.error = str(e)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching product details: {e}")
+                result.status = classify_request_error(e)
+                result.error = 'Unable to fetch product details'
+            except Exception as e:
+                # Catch any unexpected errors
+                result.status = 'error'
+                result.error = str(e)
+        result.elapsed = time.perf_counter() - start
+        RESULTS_TOTAL.labels(status=result.status).inc()
+        if trace is not None:
+            trace.total_ms = result.elapsed * 1000
+            trace.bytes_received = result.bytes_received
+            trace.wire_bytes = result.wire_bytes
+            trace.cache_hit = result.cache_hit
+            result.trace = trace
+            self.traces.append((asin, trace))
+        return result
+
+    def scrape_listing_page(
+        self,
+        url: str,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[ScrapeResult], Optional[str], bool]:
+        """
+        Scrape one search/browse results page, capturing any failure
+
+        :param url: Results page URL, from listing_url()
+        :param deadline: Job deadline; the ASIN budget applies to the page
+        :return: (a result per card, or a single error result with asin ''
+            when the page failed; the next page's URL; whether a request
+            went out for it)
+        """
+        deadline = (deadline or Deadline()).within(self.asin_budget)
+        failure = ScrapeResult(asin='')
+        page = None
+        start = time.perf_counter()
+        with IN_FLIGHT.track():
+            try:
+                deadline.check('the listing page started')
+                page = self.fetch_url(url, deadline)
+                deadline.check('parsing')
+                parse_start = time.perf_counter()
+                listing = parse_listing(page.content, page.headers.get('Content-Type'), url)
+                _parse_seconds.observe(time.perf_counter() - parse_start)
+                if listing.robot_check:
+                    self._blocked(page)
+                    failure.status = 'blocked'
+                    failure.error = 'Blocked by robot check page'
+            except DeadlineExceeded as e:
+                logger.warning(f"Listing page {url}: {e}")
+                failure.status = 'deadline_exceeded'
+                failure.error = str(e)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching listing page: {e}")
+                failure.status = classify_request_error(e)
+                failure.error = 'Unable to fetch listing page'
+            except Exception as e:
+                failure.status = 'error'
+                failure.error = str(e)
+        elapsed = time.perf_counter() - start
+        sent = page is not None and page.status_code != 0
+        LISTING_PAGES_TOTAL.labels(status=failure.status).inc()
+        if failure.error is not None:
+            failure.elapsed = elapsed
+            failure.bytes_received = len(page.content) if sent else 0
+            RESULTS_TOTAL.labels(status=failure.status).inc()
+            return [failure], None, sent or failure.status not in ('deadline_exceeded', 'circuit_open', 'no_proxy')
+
+        results = []
+        for card in listing.cards:
+            record = build_product_record(card['asin'], card, self.fields)
+            if self.normalize:
+                # The card's stars and rating count, read as the product page's attribute would be
+                record['normalized'] = normalize_attributes({'Customer Reviews': card['reviews']} if card['reviews'] else {})
+            results.append(ScrapeResult(asin=card['asin'], record=record, elapsed=elapsed, cache_hit=not sent))
+            RESULTS_TOTAL.labels(status='ok').inc()
+        for field in self.fields:
+            FIELD_SOURCE_TOTAL.labels(field=field, source='listing').inc(len(results))
+        if results:
+            # The page's bytes go on its first record, so batch totals add up
+            results[0].bytes_received = len(page.content) if sent else 0
+            results[0].wire_bytes = page.wire_bytes
+        return results, listing.next_url, sent
+
+    def iter_listing_results(self, listings: Iterable[str], max_pages: Optional[int] = None) -> Iterator[ScrapeResult]:
+        """
+        Harvest search/browse results pages instead of product pages: one
+        request per page of products (see listing.py)
+
+        Listings are paged through concurrently, each following its
+        next-page links; every ASIN is yielded once, sponsored repeats
+        skipped. Request, page and product counts go to self.listing_stats.
+
+        :param listings: Search keywords or results page URLs
+        :param max_pages: Results pages read per listing at most; None for all
+        :return: Iterator of results in completion order; a results page
+            that failed gives one error result with asin ''
+        :raises ValueError: When the scraper's fields are not all among
+            LISTING_FIELDS
+        """
+        if not listing_covers(self.fields):
+            raise ValueError(f"Listing pages only carry {', '.join(LISTING_FIELDS)}; "
+                             f"scrape them with fields limited to those")
+        deadline = Deadline.after(self.deadline)
+        if self.prewarm:
+            prewarm_session(self.session, self.prewarm, base_url=self.base_url, timeout=self.timeout[0])
+        return ListingRun(self, deadline, max_pages).iter_results(listings)
+
+    def _blocked(self, page: FetchedPage) -> None:
+        """Keep a block page out of the cache and count it against its proxy and the marketplace"""
+        logger.warning(f"Robot check page served for ASIN {page.asin}")
+        if self.cache is not None:
+            self.cache.discard(page.url)
+        if self.proxy_pool is not None and page.proxy is not None:
+            self.proxy_pool.report_block(page.proxy)
+        if self.circuit_breaker is not None and page.status_code != 0:
+            self.circuit_breaker.report_block()
+
+    def trace_summary(self, slowest: int = 10) -> Dict:
+        """
+        Summarize the traces collected so far (requires trace=True)
+
+        :param slowest: How many of the slowest ASINs to list
+        :return: See summarize_traces()
+        """
+        return summarize_traces(self.traces, slowest=slowest)
+
+    def iter_results(self, asins: Iterable[str]) -> Iterator[ScrapeResult]:
+        """
+        Scrape ASINs concurrently, yielding results as they complete
+
+        At most twice the concurrency is queued at once, so arbitrarily
+        long ASIN streams are consumed lazily. Once the scraper's deadline
+        has passed, the remaining ASINs are reported 'deadline_exceeded'
+        without being fetched. With prewarm set, connections are opened
+        before the first ASIN is scraped. In variations mode ASINs are
+        scraped family by family (see FamilyRun): each distinct ASIN once,
+        with the children of the families found added when expanding.
+
+        :param asins: ASINs to scrape
+        :return: Iterator of results in completion order
+        """
+        deadline = Deadline.after(self.deadline)
+        if self.prewarm:
+            prewarm_session(self.session, self.prewarm, base_url=self.base_url, timeout=self.timeout[0])
+        if self.variations:
+            yield from FamilyRun(self, deadline, expand=self.expand_variations).iter_results(asins)
+            return
+        if self.concurrency == 1:
+            for asin in asins:
+                yield self.scrape(asin, deadline=deadline)
+            return
+
+        def dequeue_and_scrape(asin: str, queued_at: float) -> ScrapeResult:
+            QUEUE_DEPTH.dec()
+            return self.scrape(asin, queue_wait=time.perf_counter() - queued_at, deadline=deadline)
+
+        window = self.concurrency * 2
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = set()
+            for asin in asins:
+                QUEUE_DEPTH.inc()
+                pending.add(pool.submit(dequeue_and_scrape, asin, time.perf_counter()))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def process(self, asins: List[str], compact: bool = False) -> List[Union[Dict, ProductRecord]]:
+        """
+        Scrape ASINs and return their details in input order
+
+        :param asins: List of Amazon Standard Identification Numbers
+        :param compact: Hold successful records as ProductRecord instead of
+            dicts, for jobs that keep very many products in memory; to_dict()
+            gives back the entry as it would have been
+        :return: List of product details or error information; in
+            variations mode an ASIN listed twice gets the same entry twice,
+            and the entries of family children not listed follow the rest
+        """
+        results: List[Optional[Union[Dict, ProductRecord]]] = [None] * len(asins)
+        expanded: List[Union[Dict, ProductRecord]] = []
+        positions: Dict[str, List[int]] = {}
+        for index, asin in enumerate(asins):
+            positions.setdefault(asin, []).append(index)
+
+        for result in self.iter_results(asins):
+            if compact and result.ok:
+                entry = ProductRecord.from_dict(result.to_dict())
+            else:
+                entry = result.to_dict()
+            slots = positions.get(result.asin)
+            if not slots:
+                expanded.append(entry)
+            elif self.variations:
+                for index in positions.pop(result.asin):
+                    results[index] = entry
+            else:
+                results[slots.pop(0)] = entry
+        return results + expanded
+
+
+def get_amazon_product_details(
+    asin: str,
+    base_url: str = DEFAULT_BASE_URL,
+    session: Optional[requests.Session] = None,
+    fields: Optional[Union[str, Sequence[str]]] = None
+) -> Optional[Dict]:
+    """
+    Scrape product details from Amazon using the product ASIN
+
+    :param asin: Amazon Standard Identification Number
+    :param base_url: Marketplace root URL
+    :param session: Optional session to reuse connections across fetches
+    :param fields: Only scrape these of PRODUCT_FIELDS, e.g. ['price']; None for all
+    :return: Dictionary containing product details, or None if scraping failed
+    :raises ValueError: On an unknown field name
+    """
+    return Scraper(base_url=base_url, session=session, fields=fields).scrape(asin).record
+
+
+def process_asins(
+    asins: List[str],
+    base_url: str = DEFAULT_BASE_URL,
+    session: Optional[requests.Session] = None,
+    concurrency: int = 1,
+    fields: Optional[Union[str, Sequence[str]]] = None
+) -> List[Dict]:
+    """
+    Process a list of ASINs and return their details
+
+    :param asins: List of Amazon Standard Identification Numbers
+    :param base_url: Marketplace root URL
+    :param session: Optional session to reuse connections across fetches
+    :param concurrency: Number of ASINs scraped in parallel
+    :param fields: Only scrape these of PRODUCT_FIELDS, e.g. ['price']; None for all
+    :return: List of product details or error information
+    :raises ValueError: On an unknown field name
+    """
+    scraper = Scraper(base_url=base_url, session=session, concurrency=concurrency, fields=fields)
+    return scraper.process(asins)
@@ -0,0 +1,183 @@
+"""
+Sampling profiler for scrape jobs
+
+SamplingProfiler runs a background thread that periodically snapshots the
+Python stacks of the threads currently scraping (workers register via
+the Scraper while inside scrape()). Samples are kept as folded stacks,
+the format read by flamegraph.pl and speedscope, and can be summarized as
+a top-N hot function report with time grouped by hot-path category
+(bs4 tree construction, get_text, soupsieve, network I/O).
+
+Nothing runs unless a profiler is passed to the Scraper, so the hot path
+pays a single None check when profiling is off.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# (category, substrings of "path:function" frame labels), first match wins
+# when walking a stack from the innermost frame outwards
+HOT_PATH_CATEGORIES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('soupsieve', ('soupsieve/',)),
+    ('get_text', ('element.py:get_text', 'element.py:_all_strings')),
+    ('bs4 tree construction', ('bs4/builder/', 'html/parser.py', 'bs4/__init__.py', 'lxml', 'html5lib')),
+    ('bs4 search', ('element.py:find', 'element.py:_find', 'filter.py', 'element.py:search')),
+    ('network I/O', ('socket.py', 'ssl.py', 'urllib3/', 'http/client.py', 'requests/')),
+)
+
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    parts = code.co_filename.replace('\\', '/').split('/')
+    return f"{'/'.join(parts[-2:])}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Periodically samples the stacks of registered threads
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.started: Optional[float] = None
+        self.duration = 0.0
+
+    def start(self) -> 'SamplingProfiler':
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='scrape-profiler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if self.started is not None:
+            self.duration = time.perf_counter() - self.started
+
+    def __enter__(self) -> 'SamplingProfiler':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def register_thread(self) -> None:
+        """
+        Include the calling thread in samples until unregister_thread()
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def unregister_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            remaining = self._threads.get(ident, 0) - 1
+            if remaining > 0:
+                self._threads[ident] = remaining
+            else:
+                self._threads.pop(ident, None)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                targets = list(self._threads)
+            if not targets:
+                continue
+            frames = sys._current_frames()
+            for ident in targets:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+                self.sample_count += 1
+
+    def folded(self) -> str:
+        """
+        :return: Samples as folded stacks ("root;...;leaf count" per line)
+        """
+        return '\n'.join(
+            f"{';'.join(stack)} {count}"
+            for stack, count in self.samples.most_common()
+        ) + '\n'
+
+    def report(self, top: int = 20) -> Dict:
+        """
+        Summarize samples as hot functions and hot-path categories
+
+        :param top: Number of functions to list
+        :return: Dict with 'samples', 'interval_ms', 'duration_s',
+            'categories' (share of samples per category), 'self' and
+            'cumulative' (top functions by own and inclusive samples)
+        """
+        self_counts: Counter = Counter()
+        cumulative: Counter = Counter()
+        categories: Counter = Counter()
+        total = sum(self.samples.values())
+        for stack, count in self.samples.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                cumulative[label] += count
+            categories[self._categorize(stack)] += count
+
+        def ranked(counter: Counter) -> List[Dict]:
+            return [
+                {'function': label, 'samples': count, 'share': round(count / total, 4)}
+                for label, count in counter.most_common(top)
+            ]
+
+        return {
+            'samples': total,
+            'interval_ms': self.interval * 1000,
+            'duration_s': round(self.duration, 3),
+            'categories': {
+                name: {'samples': count, 'share': round(count / total, 4)}
+                for name, count in categories.most_common()
+            } if total else {},
+            'self': ranked(self_counts) if total else [],
+            'cumulative': ranked(cumulative) if total else [],
+        }
+
+    @staticmethod
+    def _categorize(stack: Tuple[str, ...]) -> str:
+        for label in reversed(stack):
+            for category, markers in HOT_PATH_CATEGORIES:
+                if any(marker in label for marker in markers):
+                    return category
+        return 'other'
+
+
+def format_report(report: Dict) -> str:
+    """
+    Render a profile report for the terminal
+
+    :param report: Output of SamplingProfiler.report()
+    :return: Multi-line text
+    """
+    lines = [f"Profile: {report['samples']} samples every {report['interval_ms']:.1f} ms over {report['duration_s']}s"]
+    for name, entry in report['categories'].items():
+        lines.append(f"  {name:<24} {entry['share'] * 100:5.1f}%")
+    lines.append('Hottest functions (self):')
+    for entry in report['self']:
+        lines.append(f"  {entry['share'] * 100:5.1f}%  {entry['function']}")
+    return '\n'.join(lines)
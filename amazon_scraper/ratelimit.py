@@ -0,0 +1,52 @@
+"""
+Request rate limiting shared across scraper worker threads
+"""
+import threading
+import time
+from typing import Optional
+
+from .deadline import Deadline, DeadlineExceeded
+
+
+class RateLimiter:
+    """
+    Token bucket limiting how many requests start per second
+
+    ``rate`` tokens are added per second up to ``burst``; each request
+    takes one token and blocks until one is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: Sustained requests per second
+        :param burst: Maximum requests allowed back to back
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> None:
+        """
+        Block until a request may be sent
+
+        :param deadline: Give up rather than wait past this
+        :raises DeadlineExceeded: When the next token comes after the deadline
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            remaining = None if deadline is None else deadline.remaining()
+            if remaining is not None and wait >= remaining:
+                # Fail now instead of sleeping until the deadline
+                raise DeadlineExceeded("Deadline exceeded waiting for the rate limit")
+            time.sleep(wait)
@@ -0,0 +1,174 @@
+"""
+Compact in-memory product record for large batch jobs
+
+A product dict holds its own copies of every attribute key ("Material Type",
+"Item Weight", ...) plus a dict and a list per record. ProductRecord keeps
+the same data in slots: attribute keys are interned and the key sequence
+itself is shared between records with the same layout, values and bullet
+points live in tuples, and the attribute dict is only rebuilt when asked for.
+Projected records keep only the fields they have, and keys beyond
+RECORD_FIELDS ('normalized', 'variation', 'trace') are carried as they are.
+"""
+import functools
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .normalize import RECORD_FIELDS
+
+# Attribute values at most this long are interned too; short values such as
+# colours, materials and units repeat heavily across a catalogue.
+INTERN_VALUE_MAX_LENGTH = 32
+
+# Attribute key layouts kept for sharing; beyond this many the least
+# recently used is dropped, so one-off layouts do not pile up in a
+# long-running worker while a batch's categories stay shared
+KEY_LAYOUT_CACHE_SIZE = 1024
+
+
+def _intern_value(value: str) -> str:
+    if len(value) <= INTERN_VALUE_MAX_LENGTH:
+        return sys.intern(value)
+    return value
+
+
+# One shared tuple per set of present RECORD_FIELDS; asin is always one of
+# them, so there are at most 16
+_FIELD_LAYOUTS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _field_layout(fields: Sequence[str]) -> Tuple[str, ...]:
+    layout = tuple(field for field in RECORD_FIELDS if field == 'asin' or field in fields)
+    return _FIELD_LAYOUTS.setdefault(layout, layout)
+
+
+@functools.lru_cache(maxsize=KEY_LAYOUT_CACHE_SIZE)
+def _shared_layout(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """:return: The keys tuple records with this layout share"""
+    return tuple(sys.intern(key) for key in keys)
+
+
+class ProductRecord:
+    """
+    Slot-based equivalent of the canonical product record dict
+
+    Converts losslessly with from_dict() / to_dict(): the same keys come
+    back, in the same order, with the same values.
+    """
+    __slots__ = ('asin', 'title', 'price', '_attribute_keys', '_attribute_values', 'bullet_points', '_fields',
+                 'extras')
+
+    def __init__(
+        self,
+        asin: str,
+        title: Optional[str],
+        price: Optional[str],
+        attributes: Optional[Dict[str, str]] = None,
+        bullet_points: Iterable[str] = (),
+        fields: Sequence[str] = RECORD_FIELDS,
+        extras: Optional[Dict] = None
+    ):
+        """
+        :param fields: RECORD_FIELDS the record has; fewer for a projected
+            record (asin is always kept)
+        :param extras: Keys beyond RECORD_FIELDS, e.g. 'normalized'; None when there are none
+        """
+        self._fields = _field_layout(fields)
+        self.extras = extras or None
+        self.asin = asin
+        self.title = title
+        self.price = price
+        if attributes:
+            self._attribute_keys = _shared_layout(tuple(attributes))
+            self._attribute_values = tuple(_intern_value(value) for value in attributes.values())
+        else:
+            self._attribute_keys = ()
+            self._attribute_values = ()
+        self.bullet_points: Tuple[str, ...] = tuple(bullet_points)
+
+    @classmethod
+    def from_dict(cls, record: Dict) -> 'ProductRecord':
+        """
+        :param record: Canonical product record dict, projected or not,
+            with any extra keys
+        :return: Compact record holding the same data
+        """
+        return cls(
+            record['asin'],
+            record.get('title'),
+            record.get('price'),
+            record.get('attributes'),
+            record.get('bullet_points', ()),
+            fields=tuple(key for key in record if key in RECORD_FIELDS),
+            extras={key: value for key, value in record.items() if key not in RECORD_FIELDS}
+        )
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """
+        RECORD_FIELDS the record has, in RECORD_FIELDS order
+        """
+        return self._fields
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        """
+        Attribute mapping, rebuilt on each access; use get_attribute() for single lookups
+        """
+        return dict(zip(self._attribute_keys, self._attribute_values))
+
+    def get_attribute(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Look up one attribute without building the full mapping
+
+        :param key: Attribute name, e.g. "Item Weight"
+        :param default: Returned when the attribute is missing
+        :return: Attribute value
+        """
+        try:
+            return self._attribute_values[self._attribute_keys.index(key)]
+        except ValueError:
+            return default
+
+    def to_dict(self) -> Dict:
+        """
+        :return: Canonical product record dict, ready for JSON: the fields
+            the record has, then its extra keys
+        """
+        record = {}
+        for field in self._fields:
+            if field == 'attributes':
+                record[field] = self.attributes
+            elif field == 'bullet_points':
+                record[field] = list(self.bullet_points)
+            else:
+                record[field] = getattr(self, field)
+        if self.extras:
+            record.update(self.extras)
+        return record
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return (
+            self.asin == other.asin
+            and self.title == other.title
+            and self.price == other.price
+            and self._attribute_keys == other._attribute_keys
+            and self._attribute_values == other._attribute_values
+            and self.bullet_points == other.bullet_points
+            and self._fields == other._fields
+            and self.extras == other.extras
+        )
+
+    def __repr__(self) -> str:
+        return f"ProductRecord(asin={self.asin!r}, title={self.title!r}, price={self.price!r})"
+
+
+def compact_records(records: Iterable[Dict]) -> List[ProductRecord]:
+    """
+    Convert canonical record dicts to compact records
+
+    :param records: Product record dicts
+    :return: List of ProductRecord
+    """
+    return [ProductRecord.from_dict(record) for record in records]
@@ -0,0 +1,165 @@
+"""
+Priority scheduling of page fetches shared by every scrape in a process
+
+All Scrapers given the same FetchScheduler draw their network fetches from
+one pool of slots. Each fetch names a priority class; when a slot frees up
+it goes to the highest class with a waiting fetch, so a three-ASIN manual
+request overtakes a thousand-ASIN bulk job. Per-class shares cap how many
+slots a class may hold at once, which keeps headroom for interactive
+fetches even while bulk traffic is saturating the pool, and a fetch that
+has waited longer than max_wait is served before any fresher one
+regardless of class, so background work is never starved outright.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import SCHEDULE_WAIT_SECONDS, SCHEDULER_ACTIVE, SCHEDULER_WAITING
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ('interactive', 'bulk', 'background')
+
+# Share of the slots each class may hold at once
+DEFAULT_SHARES = {'interactive': 1.0, 'bulk': 0.75, 'background': 0.25}
+
+
+class _Ticket:
+    __slots__ = ('priority', 'enqueued')
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+
+
+class FetchScheduler:
+    """
+    Fixed pool of fetch slots handed out by priority class, with per-class
+    caps and aging
+    """
+
+    def __init__(self, slots: int = 16, shares: Optional[Dict[str, float]] = None, max_wait: float = 10.0):
+        """
+        :param slots: Fetches allowed in flight at once across all classes
+        :param shares: Fraction of the slots each class may hold (at least
+            one slot each); defaults to DEFAULT_SHARES
+        :param max_wait: Seconds after which a waiting fetch goes ahead of
+            every fresher one, whatever its class
+        """
+        self.slots = max(1, slots)
+        self.max_wait = max_wait
+        shares = {**DEFAULT_SHARES, **(shares or {})}
+        unknown = set(shares) - set(PRIORITY_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown priority classes: {', '.join(sorted(unknown))}")
+        self.limits = {name: max(1, min(self.slots, int(self.slots * shares[name]))) for name in PRIORITY_CLASSES}
+        self._active = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._waiting: Dict[str, Deque[_Ticket]] = {name: deque() for name in PRIORITY_CLASSES}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority: str = 'bulk', deadline: Optional[Deadline] = None) -> Iterator[float]:
+        """
+        Hold a fetch slot for the duration of a block
+
+        :param priority: One of PRIORITY_CLASSES
+        :param deadline: Stop waiting for a slot at this deadline
+        :return: Context manager yielding the seconds spent waiting
+        :raises DeadlineExceeded: When no slot was granted in time
+        """
+        waited = self.acquire(priority, deadline)
+        try:
+            yield waited
+        finally:
+            self.release(priority)
+
+    def acquire(self, priority: str = 'bulk', deadline: Optional[Deadline] = None) -> float:
+        """
+        Block until this priority class is granted a slot
+
+        :param priority: One of PRIORITY_CLASSES
+        :param deadline: Stop waiting at this deadline
+        :return: Seconds spent waiting
+        :raises DeadlineExceeded: When no slot was granted in time
+        """
+        if priority not in self._waiting:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        deadline = deadline or Deadline()
+        ticket = _Ticket(priority)
+        with self._condition:
+            self._waiting[priority].append(ticket)
+            SCHEDULER_WAITING.labels(priority=priority).inc()
+            while self._next_ticket() is not ticket:
+                if deadline.expired():
+                    self._waiting[priority].remove(ticket)
+                    # This ticket may have been holding up the next one
+                    self._condition.notify_all()
+                    SCHEDULER_WAITING.labels(priority=priority).dec()
+                    raise DeadlineExceeded("Deadline exceeded waiting for a fetch slot")
+                self._condition.wait(deadline.remaining())
+            self._waiting[priority].popleft()
+            self._active[priority] += 1
+            # Another class may be eligible for a remaining free slot
+            self._condition.notify_all()
+        SCHEDULER_WAITING.labels(priority=priority).dec()
+        SCHEDULER_ACTIVE.labels(priority=priority).inc()
+        waited = time.monotonic() - ticket.enqueued
+        SCHEDULE_WAIT_SECONDS.labels(priority=priority).observe(waited)
+        return waited
+
+    def try_acquire(self, priority: str = 'bulk') -> bool:
+        """
+        Take a slot for this priority class only if one can be granted at
+        once, ahead of nobody already waiting
+
+        :param priority: One of PRIORITY_CLASSES
+        :return: Whether a slot was taken; release() it when done
+        """
+        if priority not in self._waiting:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        ticket = _Ticket(priority)
+        with self._condition:
+            self._waiting[priority].append(ticket)
+            granted = self._next_ticket() is ticket
+            self._waiting[priority].pop()
+            if not granted:
+                return False
+            self._active[priority] += 1
+        SCHEDULER_ACTIVE.labels(priority=priority).inc()
+        return True
+
+    def release(self, priority: str = 'bulk') -> None:
+        with self._condition:
+            self._active[priority] -= 1
+            self._condition.notify_all()
+        SCHEDULER_ACTIVE.labels(priority=priority).dec()
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """
+        :return: Ticket to grant the next free slot to, None when no slot is
+            free or no waiting class is under its cap
+        """
+        if sum(self._active.values()) >= self.slots:
+            return None
+        eligible = [queue[0] for name, queue in self._waiting.items()
+                    if queue and self._active[name] < self.limits[name]]
+        if not eligible:
+            return None
+        # Starvation protection: the oldest overdue ticket wins outright
+        overdue_before = time.monotonic() - self.max_wait
+        overdue = [ticket for ticket in eligible if ticket.enqueued <= overdue_before]
+        if overdue:
+            return min(overdue, key=lambda ticket: ticket.enqueued)
+        return eligible[0]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        :return: Active and waiting fetches per class, with each class's cap
+        """
+        with self._condition:
+            return {
+                name: {'active': self._active[name], 'waiting': len(self._waiting[name]), 'limit': self.limits[name]}
+                for name in PRIORITY_CLASSES
+            }
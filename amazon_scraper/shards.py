@@ -0,0 +1,566 @@
+"""
+Sharded bulk jobs: a SQLite-backed queue of leased ASIN shards
+
+A coordinator splits a job's ASIN list into shards and stores them in a
+SQLite file. Any number of worker processes lease shards, scrape them and
+commit the records: processes on one machine, or on several machines that
+share the file over a network filesystem with working locks (NFS, SMB). A
+worker renews its lease while it scrapes; a lease that runs out (the worker
+died or hung) hands the shard to the next worker that asks, and a shard
+whose lease expires max_attempts times is failed with an error entry per
+ASIN. Results are merged back into input order per job.
+
+On one machine the file is kept in WAL mode. WAL keeps its index in shared
+memory, which processes on different hosts cannot share, so a file on a
+network filesystem uses the rollback journal instead (journal mode
+'delete'). A file stays in WAL mode once set, so when any worker reaches it
+over the network, give --journal-mode delete to every process, including
+those on the machine that holds the file.
+
+    python -m amazon_scraper.shards submit jobs.db asins.csv --shard-size 200
+    python -m amazon_scraper.shards worker jobs.db -c 8        # on every node
+    python -m amazon_scraper.shards collect jobs.db <job id> -o products.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from .cache import PageCache
+from .cli import (
+    add_circuit_arguments, add_connection_arguments, add_extraction_arguments, add_proxy_arguments, add_timeout_arguments,
+    circuit_breaker_from_args, hedger_from_args, iter_input_asins, proxy_pool_from_args
+)
+from .fetch import DEFAULT_BASE_URL
+from .persist import write_jsonl_record
+from .pipeline import Scraper
+from .ratelimit import RateLimiter
+from .transport import DNS_CACHE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    asin_count INTEGER NOT NULL,
+    shard_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    job_id TEXT NOT NULL,
+    shard_no INTEGER NOT NULL,
+    first_position INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    asins TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, shard_no)
+);
+CREATE INDEX IF NOT EXISTS shards_by_state ON shards (state, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+# Shard states; 'done' and 'failed' shards have one results row per ASIN
+SHARD_STATES = ('pending', 'leased', 'done', 'failed')
+
+# SQLite journal modes a queue file can use
+JOURNAL_MODES = ('wal', 'delete')
+
+# Filesystem types (as in /proc/mounts) that reach the file over the network
+NETWORK_FILESYSTEMS = frozenset({
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', '9p', 'afs', 'ceph', 'glusterfs', 'lustre'
+})
+
+_MOUNTS = '/proc/mounts'
+
+
+def on_network_filesystem(path: str) -> bool:
+    """
+    Tell whether a file lives on a network filesystem: a UNC path, or on
+    Linux a network mount in /proc/mounts. Elsewhere this cannot be told,
+    and the answer is False.
+
+    :param path: File path; the file need not exist yet
+    :return: Whether the path is on a network filesystem
+    """
+    if path.startswith('\\\\'):
+        return True
+    path = os.path.realpath(os.path.abspath(path))
+    try:
+        with open(_MOUNTS, 'r', encoding='utf-8') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    mount_point, fs_type = '', ''
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        # Spaces in mount points are written as \040
+        point = fields[1].replace('\\040', ' ')
+        if (path == point or path.startswith(point.rstrip('/') + '/')) and len(point) >= len(mount_point):
+            mount_point, fs_type = point, fields[2]
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+@dataclass
+class Lease:
+    """A shard handed to one worker until expires (time.time())"""
+    job_id: str
+    shard_no: int
+    first_position: int
+    asins: List[str]
+    worker: str
+    token: str
+    expires: float
+
+
+class ShardQueue:
+    """
+    Job and shard bookkeeping in a SQLite file shared by coordinator and workers
+
+    Every state change runs in an IMMEDIATE transaction, so concurrent
+    workers never lease the same shard; each thread gets its own connection.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        journal_mode: Optional[str] = None
+    ):
+        """
+        :param path: SQLite database file, created if missing
+        :param lease_seconds: How long a lease lasts without renewal
+        :param max_attempts: Leases a shard may expire under before it is failed
+        :param journal_mode: 'wal' (one machine) or 'delete' (workers on
+            several machines); None picks 'delete' for a path on a network
+            filesystem and 'wal' otherwise
+        :raises ValueError: For an unknown journal mode
+        :raises RuntimeError: When the file is held open in WAL mode by
+            another process and cannot be switched to 'delete'
+        """
+        if journal_mode is None:
+            journal_mode = 'delete' if on_network_filesystem(path) else 'wal'
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode {journal_mode!r}; expected one of {', '.join(JOURNAL_MODES)}")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        db = self._connection()
+        try:
+            mode, = db.execute(f'PRAGMA journal_mode={journal_mode.upper()}').fetchone()
+        except sqlite3.OperationalError as e:
+            # Leaving WAL needs the file to ourselves
+            if journal_mode != 'delete':
+                raise
+            mode = str(e)
+        if mode.lower() != journal_mode:
+            if journal_mode == 'delete':
+                raise RuntimeError(f"Cannot switch {path} to journal mode 'delete' ({mode}): stop the processes "
+                                   f"using it in WAL mode and run all of them with journal mode 'delete'")
+            logger.warning(f"{path}: WAL journal not available, using {mode}")
+        db.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # NORMAL is only crash-safe with WAL
+            db.execute(f"PRAGMA synchronous={'NORMAL' if self.journal_mode == 'wal' else 'FULL'}")
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def submit(self, asins: List[str], shard_size: int = 100, job_id: Optional[str] = None) -> str:
+        """
+        Register a job and split its ASINs into pending shards
+
+        :param asins: ASINs in the order results should be merged back
+        :param shard_size: ASINs per shard
+        :param job_id: Id to use instead of a generated one
+        :return: Job id
+        """
+        job_id = job_id or uuid.uuid4().hex[:12]
+        shard_size = max(1, shard_size)
+        shards = [
+            (job_id, shard_no, first, len(asins[first:first + shard_size]), json.dumps(asins[first:first + shard_size]))
+            for shard_no, first in enumerate(range(0, len(asins), shard_size))
+        ]
+        with self._transaction() as db:
+            db.execute('INSERT INTO jobs (id, created, asin_count, shard_count) VALUES (?, ?, ?, ?)',
+                       (job_id, time.time(), len(asins), len(shards)))
+            db.executemany('INSERT INTO shards (job_id, shard_no, first_position, size, asins) VALUES (?, ?, ?, ?, ?)',
+                           shards)
+        logger.info(f"Submitted job {job_id}: {len(asins)} ASINs in {len(shards)} shards")
+        return job_id
+
+    def lease(self, worker: str) -> Optional[Lease]:
+        """
+        Lease the oldest pending shard, or one whose lease has expired
+
+        :param worker: Id of the worker taking the shard
+        :return: Lease, or None when no shard is available
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._fail_exhausted(db, now)
+            row = db.execute(
+                "SELECT job_id, shard_no, first_position, asins, state, worker FROM shards "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, shard_no, first_position, asins, state, previous = row
+            lease = Lease(job_id=job_id, shard_no=shard_no, first_position=first_position, asins=json.loads(asins),
+                          worker=worker, token=uuid.uuid4().hex, expires=now + self.lease_seconds)
+            db.execute(
+                "UPDATE shards SET state = 'leased', worker = ?, lease_token = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE job_id = ? AND shard_no = ?",
+                (worker, lease.token, lease.expires, job_id, shard_no)
+            )
+        if state == 'leased':
+            logger.warning(f"Reassigning shard {job_id}/{shard_no} from {previous} to {worker}: lease expired")
+        return lease
+
+    def _fail_exhausted(self, db: sqlite3.Connection, now: float) -> None:
+        exhausted = db.execute(
+            "SELECT job_id, shard_no, first_position, asins FROM shards "
+            "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, self.max_attempts)
+        ).fetchall()
+        for job_id, shard_no, first_position, asins in exhausted:
+            logger.error(f"Failing shard {job_id}/{shard_no}: lease expired {self.max_attempts} times")
+            error = f"Shard abandoned after {self.max_attempts} expired leases"
+            db.executemany(
+                'INSERT OR REPLACE INTO results (job_id, position, record) VALUES (?, ?, ?)',
+                [(job_id, first_position + offset, json.dumps({'asin': asin, 'error': error, 'status': 'error'}))
+                 for offset, asin in enumerate(json.loads(asins))]
+            )
+            db.execute("UPDATE shards SET state = 'failed', lease_token = NULL WHERE job_id = ? AND shard_no = ?",
+                       (job_id, shard_no))
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """
+        Extend a lease by lease_seconds
+
+        :return: False when the lease was lost to another worker
+        """
+        expires = time.time() + self.lease_seconds
+        with self._transaction() as db:
+            renewed = db.execute(
+                "UPDATE shards SET lease_expires = ? "
+                "WHERE job_id = ? AND shard_no = ? AND lease_token = ? AND state = 'leased'",
+                (expires, lease.job_id, lease.shard_no, lease.token)
+            ).rowcount == 1
+        if renewed:
+            lease.expires = expires
+        return renewed
+
+    def complete(self, lease: Lease, entries: List[Dict]) -> bool:
+        """
+        Store a shard's results and mark it done
+
+        :param lease: Lease the results were produced under
+        :param entries: One record or error entry per ASIN, in shard order
+        :return: False when the lease was lost and the results were discarded
+        """
+        with self._transaction() as db:
+            row = db.execute('SELECT lease_token, state FROM shards WHERE job_id = ? AND shard_no = ?',
+                             (lease.job_id, lease.shard_no)).fetchone()
+            if row is None or row != (lease.token, 'leased'):
+                logger.warning(f"Discarding results for shard {lease.job_id}/{lease.shard_no}: lease lost")
+                return False
+            db.executemany(
+                'INSERT OR REPLACE INTO results (job_id, position, record) VALUES (?, ?, ?)',
+                [(lease.job_id, lease.first_position + offset, json.dumps(entry, ensure_ascii=False))
+                 for offset, entry in enumerate(entries)]
+            )
+            db.execute("UPDATE shards SET state = 'done', lease_token = NULL WHERE job_id = ? AND shard_no = ?",
+                       (lease.job_id, lease.shard_no))
+        return True
+
+    def release(self, lease: Lease) -> None:
+        """Hand a leased shard back untouched, e.g. when a worker shuts down"""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE shards SET state = 'pending', worker = NULL, lease_token = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1 WHERE job_id = ? AND shard_no = ? AND lease_token = ?",
+                (lease.job_id, lease.shard_no, lease.token)
+            )
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        :param job_id: Job id
+        :return: ASIN and shard counts per state, or None for an unknown job
+        """
+        db = self._connection()
+        job = db.execute('SELECT asin_count, shard_count, created FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if job is None:
+            return None
+        shards = dict.fromkeys(SHARD_STATES, 0)
+        shards.update(db.execute('SELECT state, COUNT(*) FROM shards WHERE job_id = ? GROUP BY state',
+                                 (job_id,)).fetchall())
+        workers = [worker for worker, in db.execute(
+            "SELECT DISTINCT worker FROM shards WHERE job_id = ? AND state = 'leased'", (job_id,))]
+        results = db.execute('SELECT COUNT(*) FROM results WHERE job_id = ?', (job_id,)).fetchone()[0]
+        return {
+            'job_id': job_id,
+            'created': job[2],
+            'asins': job[0],
+            'results': results,
+            'shards': {'total': job[1], **shards},
+            'active_workers': workers,
+            'finished': shards['done'] + shards['failed'] == job[1],
+        }
+
+    def iter_results(self, job_id: str, follow: bool = False, poll_interval: float = 1.0) -> Iterator[Dict]:
+        """
+        Stream a job's results in input order as its shards finish
+
+        :param job_id: Job id
+        :param follow: Wait for unfinished shards; otherwise stop at the first one
+        :param poll_interval: Seconds between checks while following
+        :return: Iterator of records and error entries
+        """
+        db = self._connection()
+        shards = db.execute('SELECT shard_no, first_position, size FROM shards WHERE job_id = ? ORDER BY shard_no',
+                            (job_id,)).fetchall()
+        for shard_no, first_position, size in shards:
+            while True:
+                state, = db.execute('SELECT state FROM shards WHERE job_id = ? AND shard_no = ?',
+                                    (job_id, shard_no)).fetchone()
+                if state in ('done', 'failed'):
+                    break
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+            for record, in db.execute(
+                'SELECT record FROM results WHERE job_id = ? AND position >= ? AND position < ? ORDER BY position',
+                (job_id, first_position, first_position + size)
+            ):
+                yield json.loads(record)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardWorker:
+    """
+    Leases shards from a queue, scrapes them and commits the results,
+    renewing each lease from a background thread while it works
+    """
+
+    def __init__(self, queue: ShardQueue, scraper: Scraper, worker_id: Optional[str] = None):
+        """
+        :param queue: Shared shard queue
+        :param scraper: Scraper the shards are processed with
+        :param worker_id: Name recorded on leases; host and pid by default
+        """
+        self.queue = queue
+        self.scraper = scraper
+        self.worker_id = worker_id or default_worker_id()
+        self.shards_done = 0
+        self.asins_done = 0
+
+    def run_once(self) -> bool:
+        """
+        Process one shard if any is available
+
+        :return: Whether a shard was leased
+        """
+        lease = self.queue.lease(self.worker_id)
+        if lease is None:
+            return False
+        logger.info(f"{self.worker_id} leased shard {lease.job_id}/{lease.shard_no} ({len(lease.asins)} ASINs)")
+
+        finished = threading.Event()
+        renewer = threading.Thread(target=self._keep_alive, args=(lease, finished), daemon=True)
+        renewer.start()
+        try:
+            entries = self.scraper.process(lease.asins)
+        except BaseException:
+            finished.set()
+            renewer.join()
+            self.queue.release(lease)
+            raise
+        finished.set()
+        renewer.join()
+        if self.queue.complete(lease, entries):
+            self.shards_done += 1
+            self.asins_done += len(entries)
+        return True
+
+    def _keep_alive(self, lease: Lease, finished: threading.Event) -> None:
+        while not finished.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(lease):
+                logger.warning(f"{self.worker_id} lost the lease on shard {lease.job_id}/{lease.shard_no}")
+                return
+
+    def run(self, wait: bool = False, poll_interval: float = 2.0, stop: Optional[threading.Event] = None) -> int:
+        """
+        Process shards until the queue is empty, or forever with wait=True
+
+        :param wait: Keep polling for new shards instead of exiting when idle
+        :param poll_interval: Seconds between polls of an empty queue
+        :param stop: Event that ends the loop between shards
+        :return: Number of shards completed
+        """
+        while stop is None or not stop.is_set():
+            if self.run_once():
+                continue
+            if not wait:
+                break
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+        return self.shards_done
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='amazon_scraper.shards',
+        description='Run bulk scrape jobs as leased shards shared by any number of workers.'
+    )
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log every lease and fetch')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help='Split ASINs into shards and queue them as a job')
+    submit.add_argument('queue', help='SQLite queue file (created if missing)')
+    submit.add_argument('inputs', nargs='*', default=['-'],
+                        help="Files with one ASIN per line (CSV first column); '-' reads stdin (default)")
+    submit.add_argument('--shard-size', type=int, default=100, help='ASINs per shard (default 100)')
+
+    worker = commands.add_parser('worker', help='Lease and scrape shards until the queue is empty')
+    worker.add_argument('queue', help='SQLite queue file')
+    worker.add_argument('-c', '--concurrency', type=int, default=4, help='ASINs scraped in parallel (default 4)')
+    worker.add_argument('--rate', type=float, help='Maximum page requests per second for this worker')
+    worker.add_argument('--burst', type=int, default=1, help='Requests allowed back to back under --rate')
+    worker.add_argument('--cache-dir', help='Cache fetched pages in this directory')
+    worker.add_argument('--normalize', action='store_true', help="Add typed 'normalized' fields to each record")
+    add_extraction_arguments(worker)
+    worker.add_argument('--base-url', default=DEFAULT_BASE_URL, help=f'Marketplace root (default {DEFAULT_BASE_URL})')
+    add_proxy_arguments(worker)
+    add_timeout_arguments(worker)
+    add_circuit_arguments(worker)
+    add_connection_arguments(worker)
+    worker.add_argument('--shard-deadline', type=float,
+                        help='Seconds one shard may take; ASINs left over are reported deadline_exceeded')
+    worker.add_argument('--lease', type=float, default=60.0, help='Lease length in seconds (default 60)')
+    worker.add_argument('--wait', action='store_true', help='Keep polling for new jobs instead of exiting when idle')
+    worker.add_argument('--id', help='Worker name recorded on leases (default host-pid)')
+
+    collect = commands.add_parser('collect', help="Stream a job's merged results as JSON Lines")
+    collect.add_argument('queue', help='SQLite queue file')
+    collect.add_argument('job', help='Job id printed by submit')
+    collect.add_argument('-o', '--output', help='Write JSONL here instead of stdout')
+    collect.add_argument('--follow', action='store_true', help='Wait for unfinished shards instead of stopping')
+
+    status = commands.add_parser('status', help="Show a job's shard counts")
+    status.add_argument('queue', help='SQLite queue file')
+    status.add_argument('job', help='Job id printed by submit')
+
+    for command in (submit, worker, collect, status):
+        command.add_argument('--journal-mode', choices=JOURNAL_MODES,
+                             help="SQLite journal: 'delete' whenever any worker reaches the queue file over a network "
+                                  "filesystem (give it to every process), 'wal' for one machine (default: 'delete' "
+                                  "if the file is on a network mount, else 'wal')")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if args.command == 'submit':
+        queue = ShardQueue(args.queue, journal_mode=args.journal_mode)
+        job_id = queue.submit(list(iter_input_asins(args.inputs)), shard_size=args.shard_size)
+        print(job_id)
+        return 0
+
+    if args.command == 'worker':
+        DNS_CACHE.ttl = args.dns_ttl
+        scraper = Scraper(
+            base_url=args.base_url.rstrip('/'),
+            concurrency=args.concurrency,
+            cache=PageCache(args.cache_dir) if args.cache_dir else None,
+            rate_limiter=RateLimiter(args.rate, burst=args.burst) if args.rate else None,
+            normalize=args.normalize,
+            proxy_pool=proxy_pool_from_args(args),
+            timeout=(args.connect_timeout, args.read_timeout),
+            asin_budget=args.asin_budget,
+            deadline=args.shard_deadline,
+            http2=args.http2,
+            prewarm=args.prewarm,
+            hedger=hedger_from_args(args),
+            circuit_breaker=circuit_breaker_from_args(args),
+            fields=args.fields,
+            embedded_json=args.embedded_json
+        )
+        queue = ShardQueue(args.queue, lease_seconds=args.lease, journal_mode=args.journal_mode)
+        worker = ShardWorker(queue, scraper, worker_id=args.id)
+        started = time.perf_counter()
+        try:
+            worker.run(wait=args.wait)
+        except KeyboardInterrupt:
+            sys.stderr.write('\nInterrupted; current shard released\n')
+        wall = time.perf_counter() - started
+        sys.stderr.write(f"{worker.worker_id}: {worker.shards_done} shards, {worker.asins_done} ASINs "
+                         f"in {wall:.1f}s\n")
+        return 0
+
+    queue = ShardQueue(args.queue, journal_mode=args.journal_mode)
+    if queue.status(args.job) is None:
+        sys.stderr.write(f"Unknown job {args.job}\n")
+        return 1
+    if args.command == 'status':
+        print(json.dumps(queue.status(args.job), indent=4))
+        return 0
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for entry in queue.iter_results(args.job, follow=args.follow):
+            write_jsonl_record(entry, output)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
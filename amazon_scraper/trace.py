@@ -0,0 +1,140 @@
+"""
+Per-ASIN timing traces and per-job summaries
+
+With tracing on, every ScrapeResult carries a ScrapeTrace breaking its
+wall time into stages. summarize_traces() folds a job's traces into a
+flame-style tree (where did the job's time go, stage by stage), collapsed
+stack lines for flamegraph tools, and the slowest ASINs with the stage
+that dominated each.
+"""
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Tuple
+
+# Stage layout of a scrape, as (path, field) pairs; paths nest under 'scrape'
+TRACE_STAGES: Tuple[Tuple[str, str], ...] = (
+    ('queue_wait', 'queue_wait_ms'),
+    ('fetch;rate_limit', 'rate_limit_ms'),
+    ('fetch;schedule', 'schedule_ms'),
+    ('fetch;dns', 'dns_ms'),
+    ('fetch;connect', 'connect_ms'),
+    ('fetch;tls', 'tls_ms'),
+    ('fetch;ttfb', 'ttfb_ms'),
+    ('fetch;download', 'download_ms'),
+    ('fetch;cache', 'cache_ms'),
+    ('parse', 'parse_ms'),
+    ('extract', 'extract_ms'),
+)
+
+
+@dataclass
+class ScrapeTrace:
+    """Timing breakdown of one ASIN, in milliseconds"""
+    queue_wait_ms: float = 0.0
+    fetch_ms: float = 0.0
+    rate_limit_ms: float = 0.0
+    schedule_ms: float = 0.0
+    dns_ms: float = 0.0
+    connect_ms: float = 0.0
+    tls_ms: float = 0.0
+    ttfb_ms: float = 0.0
+    download_ms: float = 0.0
+    cache_ms: float = 0.0
+    parse_ms: float = 0.0
+    extract_ms: float = 0.0
+    total_ms: float = 0.0
+    bytes_received: int = 0
+    wire_bytes: int = 0
+    cache_hit: bool = False
+
+    def to_dict(self) -> Dict:
+        return {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in asdict(self).items()
+        }
+
+    def stage_times(self) -> Dict[str, float]:
+        """
+        :return: Milliseconds per stage path, plus 'other' for unattributed time
+        """
+        stages = {path: getattr(self, field) for path, field in TRACE_STAGES}
+        # Everything within the scrape that no stage accounts for (record
+        # building, normalization, error handling)
+        accounted = sum(stages.values())
+        stages['other'] = max(0.0, self.total_ms + self.queue_wait_ms - accounted)
+        return stages
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summarize_traces(traces: Iterable[Tuple[str, ScrapeTrace]], slowest: int = 10) -> Dict:
+    """
+    Aggregate a job's per-ASIN traces
+
+    :param traces: (asin, trace) pairs
+    :param slowest: How many of the slowest ASINs to list
+    :return: Dict with 'asins', 'bytes_received' and 'wire_bytes' (decoded
+        and transferred body bytes), 'stages' (per-stage totals and percentiles),
+        'flame' (nested time tree), 'collapsed' (flamegraph stack lines) and
+        'slowest' (ASINs by total time with their dominant stage)
+    """
+    traces = list(traces)
+    per_stage: Dict[str, List[float]] = {}
+    for _, trace in traces:
+        for path, ms in trace.stage_times().items():
+            per_stage.setdefault(path, []).append(ms)
+
+    job_ms = sum(trace.total_ms + trace.queue_wait_ms for _, trace in traces)
+    stages = {}
+    for path, samples in per_stage.items():
+        ordered = sorted(samples)
+        total = sum(ordered)
+        stages[path] = {
+            'total_ms': round(total, 3),
+            'share': round(total / job_ms, 4) if job_ms else 0.0,
+            'p50_ms': round(_percentile(ordered, 50), 3),
+            'p95_ms': round(_percentile(ordered, 95), 3),
+            'max_ms': round(ordered[-1], 3),
+        }
+
+    # Nested tree: scrape -> fetch -> dns/connect/..., with totals at every level
+    flame = {'name': 'scrape', 'total_ms': round(job_ms, 3), 'children': []}
+    for path, summary in stages.items():
+        node = flame
+        for part in path.split(';'):
+            child = next((c for c in node['children'] if c['name'] == part), None)
+            if child is None:
+                child = {'name': part, 'total_ms': 0.0, 'children': []}
+                node['children'].append(child)
+            child['total_ms'] = round(child['total_ms'] + summary['total_ms'], 3)
+            node = child
+
+    collapsed = [
+        f"scrape;{path} {int(round(summary['total_ms'] * 1000))}"
+        for path, summary in stages.items() if summary['total_ms'] > 0
+    ]
+
+    ranked = sorted(traces, key=lambda item: item[1].total_ms, reverse=True)[:slowest]
+    slowest_asins = []
+    for asin, trace in ranked:
+        stage, ms = max(trace.stage_times().items(), key=lambda item: item[1])
+        slowest_asins.append({
+            'asin': asin,
+            'total_ms': round(trace.total_ms, 3),
+            'dominant_stage': stage,
+            'dominant_ms': round(ms, 3),
+        })
+
+    return {
+        'asins': len(traces),
+        'total_ms': round(job_ms, 3),
+        'bytes_received': sum(trace.bytes_received for _, trace in traces),
+        'wire_bytes': sum(trace.wire_bytes for _, trace in traces),
+        'stages': stages,
+        'flame': flame,
+        'collapsed': collapsed,
+        'slowest': slowest_asins,
+    }
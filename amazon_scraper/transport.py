@@ -0,0 +1,411 @@
+"""
+Transport layer: connection pools with per-connection timing
+
+build_session() in fetch.py mounts InstrumentedAdapter, whose urllib3
+connections resolve the host and open the socket as separate timed steps.
+Timings go to the stage histogram and are also accumulated per thread so
+the fetch stage can subtract connection setup from time-to-first-byte.
+
+Host names resolve through DNS_CACHE, a process-wide cache shared by every
+session, so a bulk run looks the marketplace up once per TTL instead of
+once per new connection. InstrumentedAdapter.prewarm() opens keep-alive
+connections ahead of a job so the first fetch of each worker skips the
+connect and TLS handshake.
+
+Inside abortable(), the connection a thread's request goes out on is
+tracked, so another thread can abort the request even while it is blocked
+waiting for the response headers: hedged fetches use this to stop the
+slower twin at once instead of at its next body chunk.
+
+accept_encoding() builds the Accept-Encoding header from the content codings
+urllib3 can decode in this environment (brotli and zstd need the optional
+brotli/brotlicffi and zstandard packages), so servers never send a body the
+fetch stage would have to pass on undecoded.
+"""
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .metrics import DNS_CACHE_TOTAL, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_dns_seconds = STAGE_SECONDS.labels(stage='dns')
+_connect_seconds = STAGE_SECONDS.labels(stage='connect')
+_tls_seconds = STAGE_SECONDS.labels(stage='tls')
+
+
+# Content codings in order of preference: best compression ratio first
+ENCODING_PREFERENCE = ('zstd', 'br', 'gzip', 'deflate')
+
+# Codings urllib3 decodes with the packages installed here
+SUPPORTED_ENCODINGS = frozenset(ACCEPT_ENCODING.split(','))
+
+
+def accept_encoding() -> str:
+    """
+    :return: Accept-Encoding header value listing only the decodable
+        content codings, best first
+    """
+    return ', '.join(encoding for encoding in ENCODING_PREFERENCE if encoding in SUPPORTED_ENCODINGS)
+
+
+@dataclass
+class ConnectionTimings:
+    """Connection setup time spent by the current thread since the last reset"""
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    new_connections: int = 0
+
+    @property
+    def total(self) -> float:
+        return self.dns + self.connect + self.tls
+
+
+_local = threading.local()
+
+
+def reset_connection_timings() -> ConnectionTimings:
+    """
+    Start a fresh connection timing accumulator for the current thread
+
+    :return: The new accumulator, filled in by connections opened on this thread
+    """
+    _local.timings = ConnectionTimings()
+    return _local.timings
+
+
+def _current_timings() -> ConnectionTimings:
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        timings = reset_connection_timings()
+    return timings
+
+
+def record_connection_step(step: str, seconds: float) -> None:
+    """
+    Record connection setup done outside urllib3 (e.g. by the HTTP/2 backend)
+
+    :param step: 'dns', 'connect' or 'tls'
+    :param seconds: Time the step took
+    """
+    STAGE_SECONDS.labels(stage=step).observe(seconds)
+    timings = _current_timings()
+    setattr(timings, step, getattr(timings, step) + seconds)
+    if step == 'connect':
+        timings.new_connections += 1
+
+
+class RequestWatch:
+    """The connection a thread's request is on, so another thread can abort it"""
+
+    def __init__(self):
+        self.aborted = False
+        self._connection: Optional[HTTPConnection] = None
+        self._lock = threading.Lock()
+
+    def attach(self, connection: HTTPConnection) -> bool:
+        """:return: Whether the request was aborted already"""
+        with self._lock:
+            self._connection = connection
+            return self.aborted
+
+    def abort(self) -> None:
+        """Shut the request's socket down; the blocked read fails at once and the connection is discarded"""
+        with self._lock:
+            self.aborted = True
+            if self._connection is not None:
+                _shut_down(self._connection)
+
+
+def _shut_down(connection: HTTPConnection) -> None:
+    sock = connection.sock
+    if sock is None:
+        return
+    try:
+        # socket.socket's own shutdown: SSLSocket.shutdown() would drop the
+        # TLS object from under the reading thread
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@contextmanager
+def abortable() -> Iterator[RequestWatch]:
+    """
+    Track the connections the current thread's requests go out on
+
+    Only connections from InstrumentedAdapter are tracked; other transports
+    (HTTP/2) are not aborted.
+
+    :return: Context manager yielding the watch to abort() from another thread
+    """
+    watch = _local.watch = RequestWatch()
+    try:
+        yield watch
+    finally:
+        _local.watch = None
+
+
+def request_aborted() -> bool:
+    """:return: Whether the current thread's request was aborted through its RequestWatch"""
+    watch = getattr(_local, 'watch', None)
+    return watch is not None and watch.aborted
+
+
+def _getaddrinfo(host: str, port: int) -> List[Tuple[int, str]]:
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        entry = (family, sockaddr[0])
+        if entry not in addresses:
+            addresses.append(entry)
+    return addresses
+
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class DNSCache:
+    """
+    Thread-safe cache of resolved addresses with expiry
+
+    getaddrinfo() does not expose record TTLs, so entries live for a fixed
+    ttl (keep it at or below the records' TTL); failed lookups are cached
+    for negative_ttl. Concurrent misses for one host share a single lookup.
+    """
+
+    def __init__(self, ttl: float = 60.0, negative_ttl: float = 5.0, max_entries: int = 1024):
+        """
+        :param ttl: Seconds a successful lookup is reused; 0 disables the cache
+        :param negative_ttl: Seconds a failed lookup is reused
+        :param max_entries: Hosts kept at most; the oldest entry goes first
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, int], Tuple[float, Union[List[Tuple[int, str]], socket.gaierror]]] = {}
+        self._lookup_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[Tuple[int, str]]:
+        """
+        :param host: Hostname or IP literal
+        :param port: Port number
+        :return: (address family, IP) pairs in resolver order
+        :raises socket.gaierror: When the name cannot be resolved
+        """
+        if self.ttl <= 0 or _is_ip_literal(host):
+            return _getaddrinfo(host, port)
+        key = (host.lower(), port)
+        cached = self._cached(key)
+        if cached is None:
+            with self._lock:
+                lookup_lock = self._lookup_locks.setdefault(key, threading.Lock())
+            with lookup_lock:
+                # Another thread may have finished the same lookup meanwhile
+                cached = self._cached(key)
+                if cached is None:
+                    DNS_CACHE_TOTAL.labels(result='miss').inc()
+                    return self._lookup(key)
+        DNS_CACHE_TOTAL.labels(result='hit').inc()
+        if isinstance(cached, socket.gaierror):
+            raise socket.gaierror(*cached.args)
+        return cached
+
+    def _cached(self, key: Tuple[str, int]) -> Optional[Union[List[Tuple[int, str]], socket.gaierror]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def _lookup(self, key: Tuple[str, int]) -> List[Tuple[int, str]]:
+        try:
+            result = _getaddrinfo(*key)
+        except socket.gaierror as e:
+            self._store(key, e, self.negative_ttl)
+            raise
+        self._store(key, result, self.ttl)
+        return result
+
+    def _store(self, key: Tuple[str, int], result, ttl: float) -> None:
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + ttl, result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every session in the process
+DNS_CACHE = DNSCache()
+
+
+def resolve_host(host: str, port: int) -> List[Tuple[int, str]]:
+    """
+    Resolve a host to connectable addresses, through DNS_CACHE
+
+    :param host: Hostname or IP literal
+    :param port: Port number
+    :return: (address family, IP) pairs in resolver order
+    :raises socket.gaierror: When the name cannot be resolved
+    """
+    return DNS_CACHE.resolve(host, port)
+
+
+class _TimedConnectionMixin:
+    """
+    Splits urllib3's _new_conn() into a timed DNS step and timed connect
+    attempts, and tells the thread's RequestWatch which connection it is on
+    """
+
+    def request(self, *args, **kwargs):
+        watch = getattr(_local, 'watch', None)
+        if watch is None:
+            return super().request(*args, **kwargs)
+        if watch.attach(self):
+            raise ConnectionAbortedError("Request aborted")
+        super().request(*args, **kwargs)
+        if watch.aborted:
+            # Aborted while connecting, before there was a socket to shut down
+            _shut_down(self)
+
+    def _new_conn(self):
+        timings = _current_timings()
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = resolve_host(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        _dns_seconds.observe(resolved - start)
+        timings.dns += resolved - start
+
+        last_error = None
+        try:
+            for _, address in addresses:
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    last_error = e
+            else:
+                raise last_error or NewConnectionError(self, f"No addresses found for {host}")
+        finally:
+            self._dns_host = host
+            connected = time.perf_counter()
+            _connect_seconds.observe(connected - resolved)
+            timings.connect += connected - resolved
+        timings.new_connections += 1
+        return sock
+
+
+class InstrumentedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class InstrumentedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        # _new_conn() times DNS and TCP connect itself; the rest is the TLS handshake
+        timings = _current_timings()
+        before = timings.dns + timings.connect
+        start = time.perf_counter()
+        super().connect()
+        handshake = time.perf_counter() - start - (timings.dns + timings.connect - before)
+        _tls_seconds.observe(handshake)
+        timings.tls += handshake
+
+
+class InstrumentedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = InstrumentedHTTPConnection
+
+
+class InstrumentedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = InstrumentedHTTPSConnection
+
+
+_POOL_CLASSES = {
+    'http': InstrumentedHTTPConnectionPool,
+    'https': InstrumentedHTTPSConnectionPool,
+}
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools, direct or per proxy, open timed connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        # SOCKS managers bring their own connection classes
+        if not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = _POOL_CLASSES
+        return manager
+
+    def prewarm(self, url: str, connections: int, timeout: Optional[float] = None, verify=True,
+                proxies: Optional[Dict[str, str]] = None) -> int:
+        """
+        Open keep-alive connections to a URL's host and leave them in the pool
+
+        :param url: Any URL on the host to connect to
+        :param connections: Connections to open (at most the pool size)
+        :param timeout: Connect timeout in seconds
+        :param verify: TLS verification setting the requests will be sent
+            with; connection pools are kept per setting
+        :param proxies: Proxies the requests will be sent through
+        :return: Connections now open and idle in the pool
+        """
+        # The same pool send() will pick for a request to this URL
+        pool = self.get_connection_with_tls_context(requests.Request('GET', url).prepare(), verify, proxies)
+        # Take the connections out of the pool all at once so each one is
+        # distinct, connect them in parallel, then return them
+        taken = [pool._get_conn() for _ in range(max(0, min(connections, self._pool_maxsize)))]
+
+        def connect(conn) -> bool:
+            if conn.is_connected:
+                return True
+            conn.timeout = timeout
+            try:
+                conn.connect()
+            except (OSError, ConnectTimeoutError, NewConnectionError) as e:
+                logger.warning(f"Could not pre-warm a connection to {pool.host}: {e}")
+                conn.close()
+                return False
+            return True
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(taken))) as executor:
+                opened = sum(executor.map(connect, taken))
+        finally:
+            for conn in taken:
+                pool._put_conn(conn)
+        return opened
@@ -0,0 +1,315 @@
+"""
+Variation families: scrape a parent listing's children from one parse
+
+Catalogues list many children of the same parent listing (one per colour
+or size), and scraped one by one every child page is fetched and parsed in
+full. With Scraper(variations=True) a run instead works family by family:
+
+    seed     the first page of a family that comes up is read in full; its
+             twister data names the parent and every child with its
+             dimension values
+    probes   siblings are scraped in full too, enough of them that every
+             twister dimension some child differs from the seed in (colour,
+             size) is covered by a probe differing in it, and compared field
+             by field with the seed
+    children the remaining children are fetched only for the fields any
+             probe found differing (price always: offers are per child
+             ASIN), with the download stopping once those regions are in;
+             every other field is taken from the seed. A child waits until
+             each dimension it differs in has been probed, and is fetched
+             in full when a probe for one of them failed. When nothing needs
+             fetching a child's record is built without a request.
+
+Every ASIN is scraped at most once per run: siblings already claimed by a
+family, in flight or done, are not fetched again when they come up in the
+input. With expand (the default) the run yields every child of each family
+found, whether or not the input listed it. Family records carry
+'variation': {'parent_asin', 'dimensions': {dimension: value}}.
+"""
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .deadline import Deadline
+from .embedded import VariationFamily
+from .metrics import QUEUE_DEPTH, VARIATION_RECORDS_TOTAL
+from .normalize import RECORD_FIELDS
+from .parse import PRODUCT_FIELDS
+
+if TYPE_CHECKING:
+    from .pipeline import ScrapeResult, Scraper
+
+logger = logging.getLogger(__name__)
+
+# Fields fetched for every child, however the seed and probe compare
+PER_CHILD_FIELDS = ('price',)
+
+# Statuses of fetches that never reached the marketplace
+_NOT_SENT = ('deadline_exceeded', 'circuit_open', 'no_proxy')
+
+SEED = 'seed'
+PROBE = 'probe'
+CHILD = 'child'
+
+
+# States of a family's dimensions
+_UNPROBED = 'unprobed'
+_PROBING = 'probing'
+_PROBED = 'probed'
+_FAILED = 'failed'
+
+
+class _Family:
+    """A family's state within one run"""
+
+    def __init__(self, data: VariationFamily, seed: 'ScrapeResult', wanted: Tuple[str, ...]):
+        self.data = data
+        self.seed = seed
+        self.wanted = wanted
+        self._seed_values = data.children.get(seed.asin, {})
+        # Dimension -> _UNPROBED, _PROBING, _PROBED or _FAILED; a family whose
+        # twister names no dimensions gets one no sibling has a value for
+        self.dimensions = dict.fromkeys(data.dimensions or [''], _UNPROBED)
+        # Fields some probe found differing from the seed, plus the per-child ones
+        self.differing: Set[str] = {field for field in PER_CHILD_FIELDS if field in wanted}
+        # Probe in flight -> the dimensions it was sent to cover
+        self.probes: Dict[str, List[str]] = {}
+        # Children claimed while a probe they depend on is out
+        self.waiting: List[str] = []
+
+    def differs_in(self, asin: str) -> List[str]:
+        """:return: The dimensions a sibling's values differ from the seed's in (all of them when unknown)"""
+        values = self.data.children.get(asin, {})
+        return [dimension for dimension in self.dimensions
+                if values.get(dimension) is None or values.get(dimension) != self._seed_values.get(dimension)]
+
+    def fields_for(self, asin: str) -> Optional[Tuple[str, ...]]:
+        """
+        :return: Fields to fetch for a child, in wanted order; None while a
+            dimension it differs in is still being probed
+        """
+        states = [self.dimensions[dimension] for dimension in self.differs_in(asin)]
+        if _UNPROBED in states or _PROBING in states:
+            return None
+        if _FAILED in states:
+            return self.wanted
+        return tuple(field for field in self.wanted if field in self.differing)
+
+    def learn(self, sibling: 'ScrapeResult') -> None:
+        """Take in a sibling read in full: its dimensions are probed, and its differing fields fetched per child"""
+        seed = self.seed.record
+        self.differing.update(field for field in self.wanted if sibling.record.get(field) != seed.get(field))
+        for dimension in self.differs_in(sibling.asin):
+            self.dimensions[dimension] = _PROBED
+
+    def fetched_fields(self) -> List[str]:
+        """:return: The fields children are fetched for, over every dimension settled so far"""
+        if _FAILED in self.dimensions.values():
+            return list(self.wanted)
+        return [field for field in self.wanted if field in self.differing]
+
+
+class FamilyRun:
+    """One iter_results() call of a Scraper in variations mode"""
+
+    def __init__(self, scraper: 'Scraper', deadline: Deadline, expand: bool = True):
+        """
+        :param scraper: Scraper to fetch with; its family_stats are updated
+        :param deadline: Job deadline
+        :param expand: Scrape every child of the families found, not only
+            the ones the input lists
+        """
+        self.scraper = scraper
+        self.deadline = deadline
+        self.expand = expand
+        self.wanted = scraper.fields or PRODUCT_FIELDS
+        self._claimed: Set[str] = set()
+        self._families: Dict[str, _Family] = {}
+        self._family_of: Dict[str, _Family] = {}
+        # (asin, fields, family, role) ready to be submitted, children first
+        self._ready: Deque[Tuple[str, Optional[Tuple[str, ...]], Optional[_Family], str]] = deque()
+        # Results built without a request
+        self._finished: Deque['ScrapeResult'] = deque()
+
+    def _stats(self, family: _Family) -> Dict:
+        stats = self.scraper.family_stats.get(family.data.parent_asin)
+        if stats is None:
+            stats = self.scraper.family_stats.setdefault(family.data.parent_asin, {
+                'parent_asin': family.data.parent_asin,
+                'children': len(family.data.children),
+                'records': 0,
+                'requests': 0,
+                'deduplicated': 0,
+                'fetched_fields': [],
+            })
+        return stats
+
+    def _route(self, asin: str) -> None:
+        """Queue an input ASIN, unless a family has already claimed it"""
+        family = self._family_of.get(asin)
+        if asin in self._claimed:
+            if family is not None:
+                self._stats(family)['deduplicated'] += 1
+            return
+        self._claimed.add(asin)
+        if family is None:
+            self._ready.append((asin, None, None, SEED))
+        else:
+            self._queue_child(family, asin)
+
+    def _queue_child(self, family: _Family, asin: str) -> None:
+        unprobed = [dimension for dimension in family.differs_in(asin)
+                    if family.dimensions[dimension] == _UNPROBED]
+        if unprobed:
+            # The child is the first to differ in these dimensions: it probes them
+            for dimension in unprobed:
+                family.dimensions[dimension] = _PROBING
+            family.probes[asin] = unprobed
+            self._ready.appendleft((asin, None, family, PROBE))
+            return
+        fields = family.fields_for(asin)
+        if fields is None:
+            family.waiting.append(asin)
+        elif fields:
+            self._ready.appendleft((asin, fields, family, CHILD))
+        else:
+            self._finished.append(self._child_result(family, asin, None))
+
+    def _register(self, result: 'ScrapeResult') -> Optional[_Family]:
+        """:return: The family a seed's page belongs to, registering it when new"""
+        data = result.family
+        if data is None:
+            return None
+        family = self._families.get(data.parent_asin)
+        if family is not None:
+            return family
+        family = self._families[data.parent_asin] = _Family(data, result, self.wanted)
+        logger.info(f"ASIN {result.asin}: variation family {data.parent_asin} with {len(data.children)} children")
+        for child in data.children:
+            self._family_of.setdefault(child, family)
+        if self.expand:
+            for child in data.children:
+                if child not in self._claimed:
+                    self._claimed.add(child)
+                    self._queue_child(family, child)
+        return family
+
+    def _learn(self, family: _Family, sibling: 'ScrapeResult') -> None:
+        """Take in a probe or a sibling read in full, then release the children it settles"""
+        probed = family.probes.pop(sibling.asin, [])
+        if sibling.ok:
+            family.learn(sibling)
+        else:
+            # Nothing learned: children differing in these dimensions are fetched in full
+            for dimension in probed:
+                if family.dimensions[dimension] == _PROBING:
+                    family.dimensions[dimension] = _FAILED
+        self._stats(family)['fetched_fields'] = family.fetched_fields()
+        waiting, family.waiting = family.waiting, []
+        for asin in waiting:
+            self._queue_child(family, asin)
+
+    def _child_result(self, family: _Family, asin: str, fetched: Optional['ScrapeResult']) -> 'ScrapeResult':
+        """:return: A child's result: fetched fields from its own page, the rest from the seed"""
+        from .pipeline import ScrapeResult
+        if fetched is None:
+            fetched = ScrapeResult(asin=asin, record={'asin': asin})
+            source = 'shared'
+        elif not fetched.ok:
+            return fetched
+        else:
+            source = 'projected'
+        seed = family.seed.record
+        record = {key: fetched.record[key] if key in fetched.record else seed[key]
+                  for key in RECORD_FIELDS if key in seed or key in fetched.record}
+        if 'normalized' in seed or 'normalized' in fetched.record:
+            record['normalized'] = fetched.record.get('normalized', seed.get('normalized'))
+        fetched.record = record
+        VARIATION_RECORDS_TOTAL.labels(source=source).inc()
+        return fetched
+
+    def _complete(self, result: 'ScrapeResult', family: Optional[_Family], role: str) -> 'ScrapeResult':
+        """Account for a finished scrape and shape its record"""
+        if role == SEED:
+            # A listed sibling seeded before its family was known belongs to
+            # it, whether or not its own page names the family
+            family = self._register(result) or self._family_of.get(result.asin)
+            if family is not None and family.seed is not result and result.ok:
+                # A sibling seeded in parallel is as good a probe as any
+                self._learn(family, result)
+            if family is not None and result.ok:
+                VARIATION_RECORDS_TOTAL.labels(source=SEED).inc()
+        elif role == PROBE:
+            self._learn(family, result)
+            if result.ok:
+                VARIATION_RECORDS_TOTAL.labels(source=PROBE).inc()
+        else:
+            result = self._child_result(family, result.asin, result)
+        if family is not None:
+            self._count(family, result, sent=True)
+        return result
+
+    def _count(self, family: _Family, result: 'ScrapeResult', sent: bool) -> None:
+        stats = self._stats(family)
+        if sent and not result.cache_hit and (result.bytes_received > 0 or result.status not in _NOT_SENT):
+            stats['requests'] += 1
+        if result.ok:
+            stats['records'] += 1
+            result.record['variation'] = {
+                'parent_asin': family.data.parent_asin,
+                'dimensions': family.data.children.get(result.asin, {}),
+            }
+
+    def _drain_finished(self) -> Iterator['ScrapeResult']:
+        while self._finished:
+            result = self._finished.popleft()
+            self._count(self._family_of[result.asin], result, sent=False)
+            yield result
+
+    def iter_results(self, asins: Iterable[str]) -> Iterator['ScrapeResult']:
+        """
+        Scrape ASINs family by family, yielding results as they complete
+
+        :param asins: ASINs to scrape
+        :return: Iterator of results in completion order; one per distinct
+            ASIN, plus one per child of the families found when expanding
+        """
+        scraper = self.scraper
+        window = scraper.concurrency * 2
+        inputs = iter(asins)
+        exhausted = False
+
+        def dequeue_and_scrape(asin: str, fields: Optional[Tuple[str, ...]], queued_at: float) -> 'ScrapeResult':
+            QUEUE_DEPTH.dec()
+            return scraper.scrape(asin, queue_wait=time.perf_counter() - queued_at, deadline=self.deadline,
+                                  fields=fields)
+
+        with ThreadPoolExecutor(max_workers=scraper.concurrency) as pool:
+            pending = {}
+            while True:
+                # Children are queued ahead of new input, so siblings further
+                # down the input find themselves already claimed
+                while len(pending) < window:
+                    if not self._ready:
+                        if exhausted:
+                            break
+                        asin = next(inputs, None)
+                        if asin is None:
+                            exhausted = True
+                        else:
+                            self._route(asin)
+                        yield from self._drain_finished()
+                        continue
+                    asin, fields, family, role = self._ready.popleft()
+                    QUEUE_DEPTH.inc()
+                    future = pool.submit(dequeue_and_scrape, asin, fields, time.perf_counter())
+                    pending[future] = (family, role)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    family, role = pending.pop(future)
+                    yield self._complete(future.result(), family, role)
+                yield from self._drain_finished()
@@ -1,128 +1,34 @@
 import os
+import sys
 import csv
+import json
 import logging
-import requests
 from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
-from flask import Flask, send_file, render_template, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, send_file, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from io import BytesIO
+from urllib.parse import urlsplit
+
+# The scraper core lives at the repository root, one level above this app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from amazon_scraper import (
+    DEFAULT_BASE_URL, CircuitBreaker, FetchScheduler, Hedger, JobStore, ProxyPool, SamplingProfiler, Scraper, process_asins,
+    select_fields
+)
+from amazon_scraper.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY
+from amazon_scraper.shards import ShardQueue
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_amazon_product_details(asin: str) -> Optional[Dict]:
-    """
-    Scrape product details from Amazon using the product ASIN
-    
-    :param asin: Amazon Standard Identification Number
-    :return: Dictionary containing product details
+def read_csv_asins(filepath: str) -> List[str]:
     """
-    # Amazon product URL (using .in domain, can be parameterized if needed)
-    url = f"https://www.amazon.in/dp/{asin}"
-    
-    # Headers to mimic a browser request
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
-    
-    try:
-        logger.info(f"Fetching product details for ASIN: {asin}")
-        
-        # Send GET request
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract product title
-        title_elem = soup.find('span', {'id': 'productTitle'})
-        title = title_elem.get_text(strip=True) if title_elem else 'Title not found'
-        
-        # Extract product price
-        price_whole_elem = soup.find('span', {'class': 'a-price-whole'})
-        price_symbol_elem = soup.find('span', {'class': 'a-price-symbol'})
-        price = f"{price_symbol_elem.get_text(strip=True) if price_symbol_elem else '₹'}{price_whole_elem.get_text(strip=True) if price_whole_elem else 'Price not found'}"
-        
-        # Extract product attributes
-        attributes = {}
-        product_details_div = soup.find('div', {'id': 'prodDetails'})
-        if product_details_div:
-            for table in product_details_div.find_all('table'):
-                for row in table.find_all('tr'):
-                    key = row.find('th')
-                    value = row.find('td')
-                    if key and value:
-                        attributes[key.get_text(strip=True)] = value.get_text(strip=True)
-        
-        # Extract bullet points
-        bullet_points = []
-        feature_bullets_div = soup.find('div', {'id': 'feature-bullets'})
-        if feature_bullets_div:
-            bullet_points = [
-                li.get_text(strip=True)
-                for li in feature_bullets_div.find_all('li') if li.get_text(strip=True)
-            ]
-        
-        # Combine all details
-        product_details = {
-            'asin': asin,
-            'title': title,
-            'price': price,
-            'attributes': attributes,
-            'bullet_points': bullet_points
-        }
-        
-        return product_details
-    
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching product details: {e}")
-        return None
-
-def process_asins(asins: List[str]) -> List[Dict]:
-    """
-    Process a list of ASINs and return their details
-    
-    :param asins: List of Amazon Standard Identification Numbers
-    :return: List of product details or error information
-    """
-    results = []
-    for asin in asins:
-        try:
-            # Attempt to scrape product details
-            product_data = get_amazon_product_details(asin)
-            
-            if product_data:
-                # Successfully scraped
-                results.append(product_data)
-            else:
-                # Failed to scrape
-                results.append({
-                    'asin': asin,
-                    'error': 'Unable to fetch product details'
-                })
-        except Exception as e:
-            # Catch any unexpected errors
-            results.append({
-                'asin': asin,
-                'error': str(e)
-            })
-    
-    return results
+    Read ASINs from the first column of an uploaded CSV file
 
-def process_csv_asins(filepath: str) -> List[Dict]:
-    """
-    Process ASINs from uploaded CSV file
-    
     :param filepath: Path to uploaded CSV file
-    :return: List of scraped product details
+    :return: List of ASINs
     """
     asins = []
     with open(filepath, 'r') as csvfile:
@@ -133,33 +39,224 @@ def process_csv_asins(filepath: str) -> List[Dict]:
             if row and row[0].strip():
                 asins.append(row[0].strip())
     
-    return process_asins(asins)
+    return asins
+
+def process_csv_asins(filepath: str, base_url: str = DEFAULT_BASE_URL) -> List[Dict]:
+    """
+    Process ASINs from uploaded CSV file
+    
+    :param filepath: Path to uploaded CSV file
+    :param base_url: Marketplace root URL
+    :return: List of scraped product details
+    """
+    return process_asins(read_csv_asins(filepath), base_url=base_url)
 
-# Create Flask App
-app = Flask(__name__)
-CORS(app)  # Enable CORS for API calls
+def request_flag(name: str) -> bool:
+    """
+    Read a boolean query parameter such as ?trace=1
 
-# Configuration
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    :param name: Query parameter name
+    :return: True for 1/true/yes/on
+    """
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+def request_deadline() -> Optional[float]:
+    """
+    Seconds the current scrape request may take: the SCRAPE_DEADLINE config,
+    shortened by a ?deadline=<seconds> query parameter
+
+    :return: Seconds, or None when neither sets a deadline
+    """
+    limit = current_app.config.get('SCRAPE_DEADLINE')
+    requested = request.args.get('deadline', type=float)
+    if requested is None or requested <= 0:
+        return limit
+    return requested if limit is None else min(requested, limit)
+
+def run_scrape_job(asins: List[str], priority: str = 'bulk') -> Response:
+    """
+    Scrape ASINs for the current request and build the JSON response
 
-# Ensure uploads directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    Fetches go through the app-wide FetchScheduler under the given priority
+    class, so interactive requests overtake bulk jobs for fetch slots.
+
+    With ?fields=price (or any comma-separated PRODUCT_FIELDS) records
+    carry only asin and those fields, and pages are read only as far as
+    needed; an unknown field is answered with 400. With ?variations=1
+    siblings of one parent listing are scraped as a family, fetching each
+    child only for the fields that differ; &expand=1 also returns the
+    children not asked for, after the requested entries.
+
+    With ?trace=1 every result carries a timing breakdown, and the job's
+    trace summary is kept for GET /jobs/<job_id>/trace. With ?profile=1 the
+    job is sampled and its profile kept for GET /jobs/<job_id>/profile. In
+    either case the job id is sent back in the X-Scrape-Job header; jobs
+    are kept in JOB_FOLDER, so any worker process can answer those GETs.
+
+    The job runs under request_deadline() and each ASIN under ASIN_BUDGET;
+    ASINs that run out of time come back as error entries with status
+    'deadline_exceeded' alongside the records that did finish.
+
+    :param asins: ASINs to scrape
+    :param priority: Scheduler priority class ('interactive', 'bulk' or 'background')
+    :return: JSON response with one entry per ASIN
+    """
+    try:
+        fields = select_fields(request.args.get('fields'))
+    except ValueError as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 400
+        return response
+    trace = request_flag('trace')
+    profiler = None
+    if request_flag('profile'):
+        profiler = SamplingProfiler(interval=current_app.config.get('PROFILE_INTERVAL', 0.005))
+    scraper = Scraper(
+        base_url=current_app.config['AMAZON_BASE_URL'],
+        concurrency=current_app.config['SCRAPE_CONCURRENCY'].get(priority, 1),
+        trace=trace,
+        profiler=profiler,
+        scheduler=current_app.extensions['fetch_scheduler'],
+        priority=priority,
+        proxy_pool=current_app.extensions.get('proxy_pool'),
+        timeout=current_app.config['FETCH_TIMEOUT'],
+        asin_budget=current_app.config['ASIN_BUDGET'],
+        deadline=request_deadline(),
+        http2=current_app.config['HTTP2'],
+        hedger=current_app.extensions.get('hedger'),
+        circuit_breaker=current_app.extensions.get('circuit_breaker'),
+        fields=fields,
+        embedded_json=current_app.config['EMBEDDED_JSON'],
+        variations=request_flag('variations'),
+        expand_variations=request_flag('expand')
+    )
+
+    if profiler is not None:
+        with profiler:
+            results = scraper.process(asins)
+    else:
+        results = scraper.process(asins)
+
+    response = jsonify(results)
+    if trace or profiler is not None:
+        job = current_app.extensions['scrape_jobs'].create(asin_count=len(asins))
+        if trace:
+            job.trace_summary = scraper.trace_summary()
+        if profiler is not None:
+            job.artifacts['profile'] = profiler.folded()
+            job.artifacts['profile_report'] = profiler.report()
+        current_app.extensions['scrape_jobs'].save(job)
+        response.headers['X-Scrape-Job'] = job.id
+    return response
+
+# Blueprint holding all scraper routes, registered by create_app()
+bp = Blueprint('scraper', __name__)
+
+def create_app(config: Optional[Dict] = None) -> Flask:
+    """
+    Create and configure the Flask application
 
-@app.route('/')
+    Defaults can be overridden through SCRAPER_-prefixed environment
+    variables (e.g. SCRAPER_UPLOAD_FOLDER, SCRAPER_AMAZON_BASE_URL), and
+    finally through the explicit config mapping.
+
+    :param config: Optional mapping of config overrides
+    :return: Configured Flask application
+    """
+    app = Flask(__name__)
+    CORS(app, expose_headers=['X-Scrape-Job'])  # Enable CORS for API calls
+
+    # Configuration
+    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['AMAZON_BASE_URL'] = DEFAULT_BASE_URL
+    # Fetch slots shared by all requests of this process, and the share
+    # each priority class may hold (see amazon_scraper.scheduler)
+    app.config['FETCH_SLOTS'] = 16
+    app.config['FETCH_SHARES'] = {'interactive': 1.0, 'bulk': 0.75, 'background': 0.25}
+    app.config['SCHEDULER_MAX_WAIT'] = 10.0
+    # ASINs each request scrapes in parallel, per priority class
+    app.config['SCRAPE_CONCURRENCY'] = {'interactive': 4, 'bulk': 8, 'background': 2}
+    # (connect, read) seconds per fetch, seconds per ASIN, and seconds per
+    # scrape request (kept under the gunicorn worker timeout so a slow job
+    # returns partial results instead of being killed)
+    app.config['FETCH_TIMEOUT'] = (5.0, 30.0)
+    app.config['ASIN_BUDGET'] = 60.0
+    app.config['SCRAPE_DEADLINE'] = 540.0
+    # Multiplex fetches over HTTP/2 (needs httpx and h2)
+    app.config['HTTP2'] = False
+    # Extra requests hedging may add for fetches slower than the recent p95
+    # (e.g. 0.05 for 5%); 0 turns hedging off
+    app.config['HEDGE_BUDGET'] = 0.0
+    # Seconds the marketplace circuit stays open once most recent fetches
+    # failed or were blocked (0 disables it), and how long a fetch may wait
+    # for it to close before being refused
+    app.config['CIRCUIT_COOLDOWN'] = 30.0
+    app.config['CIRCUIT_WAIT'] = 0.0
+    # Read price and title from a page's embedded JSON where it has them
+    app.config['EMBEDDED_JSON'] = True
+    app.config.from_prefixed_env('SCRAPER')
+    if config:
+        app.config.update(config)
+
+    # Ensure uploads directory exists
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    app.extensions['fetch_scheduler'] = FetchScheduler(
+        slots=app.config['FETCH_SLOTS'],
+        shares=app.config['FETCH_SHARES'],
+        max_wait=app.config['SCHEDULER_MAX_WAIT']
+    )
+
+    # Egress proxies shared by every request, so health and cooldowns carry over
+    if app.config.get('PROXIES'):
+        app.extensions['proxy_pool'] = ProxyPool(
+            app.config['PROXIES'],
+            cooldown=app.config.get('PROXY_COOLDOWN', 30.0)
+        )
+
+    # One hedger for every request, so the latency estimate and budget are process-wide
+    if app.config['HEDGE_BUDGET'] > 0:
+        app.extensions['hedger'] = Hedger(budget=app.config['HEDGE_BUDGET'])
+
+    # One breaker for the marketplace, shared by every request
+    if app.config['CIRCUIT_COOLDOWN'] > 0:
+        app.extensions['circuit_breaker'] = CircuitBreaker(
+            urlsplit(app.config['AMAZON_BASE_URL']).hostname or app.config['AMAZON_BASE_URL'],
+            cooldown=app.config['CIRCUIT_COOLDOWN'],
+            max_wait=app.config['CIRCUIT_WAIT']
+        )
+
+    # Recent jobs, for trace summaries and other per-job artifacts; kept on
+    # disk so a follow-up request can reach any worker process
+    app.extensions['scrape_jobs'] = JobStore(
+        max_jobs=app.config.get('MAX_STORED_JOBS', 100),
+        directory=app.config.get('JOB_FOLDER') or os.path.join(app.instance_path, 'jobs')
+    )
+
+    # Bulk jobs handed to separate shard workers (python -m amazon_scraper.shards worker)
+    if app.config.get('SHARD_QUEUE'):
+        app.extensions['shard_queue'] = ShardQueue(
+            app.config['SHARD_QUEUE'],
+            journal_mode=app.config.get('SHARD_JOURNAL_MODE')
+        )
+
+    app.register_blueprint(bp)
+    return app
+
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/scrape/manual', methods=['POST'])
+@bp.route('/scrape/manual', methods=['POST'])
 def scrape_manual():
     """
     Handle manual ASIN scraping request
     """
     asins = request.json.get('asins', [])
-    results = process_asins(asins)
-    return jsonify(results)
+    return run_scrape_job(asins, priority='interactive')
 
-@app.route('/scrape/bulk', methods=['POST'])
+@bp.route('/scrape/bulk', methods=['POST'])
 def scrape_bulk():
     """
     Handle bulk ASIN scraping from uploaded CSV
@@ -173,13 +270,125 @@ def scrape_bulk():
     
     if file:
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
-        results = process_csv_asins(filepath)
-        return jsonify(results)
+        # Scheduled refreshes can run below regular bulk jobs with ?priority=background
+        priority = 'background' if request.args.get('priority') == 'background' else 'bulk'
+        return run_scrape_job(read_csv_asins(filepath), priority=priority)
+
+@bp.route('/jobs/sharded', methods=['POST'])
+def submit_sharded_job():
+    """
+    Queue ASINs (JSON {'asins': [...]} or a CSV upload) as a sharded job for
+    shard worker processes; needs SCRAPER_SHARD_QUEUE
+    """
+    queue = current_app.extensions.get('shard_queue')
+    if queue is None:
+        return jsonify({'error': 'Sharded jobs are not enabled'}), 404
+
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
+        file.save(filepath)
+        asins = read_csv_asins(filepath)
+    else:
+        asins = (request.get_json(silent=True) or {}).get('asins', [])
+    if not asins:
+        return jsonify({'error': 'No ASINs given'}), 400
+
+    job_id = queue.submit(asins, shard_size=current_app.config.get('SHARD_SIZE', 100))
+    return jsonify(queue.status(job_id)), 202
+
+@bp.route('/jobs/<job_id>/status')
+def sharded_job_status(job_id: str):
+    """
+    Return shard progress of a sharded job
+    """
+    queue = current_app.extensions.get('shard_queue')
+    status = queue.status(job_id) if queue is not None else None
+    if status is None:
+        return jsonify({'error': 'No such sharded job'}), 404
+    return jsonify(status)
+
+@bp.route('/jobs/<job_id>/results')
+def sharded_job_results(job_id: str):
+    """
+    Stream a sharded job's results as JSON Lines in input order; with
+    ?follow=1 the stream stays open until every shard has finished
+    """
+    queue = current_app.extensions.get('shard_queue')
+    if queue is None or queue.status(job_id) is None:
+        return jsonify({'error': 'No such sharded job'}), 404
+    entries = queue.iter_results(job_id, follow=request_flag('follow'))
+    lines = (json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+    return Response(lines, mimetype='application/x-ndjson')
+
+@bp.route('/jobs/<job_id>/trace')
+def job_trace(job_id: str):
+    """
+    Return the trace summary of a job scraped with ?trace=1
+    """
+    job = current_app.extensions['scrape_jobs'].get(job_id)
+    if job is None or job.trace_summary is None:
+        return jsonify({'error': 'No trace for this job'}), 404
+    return jsonify({'job_id': job.id, 'asins': job.asin_count, **job.trace_summary})
+
+@bp.route('/jobs/<job_id>/profile')
+def job_profile(job_id: str):
+    """
+    Download the folded-stack profile of a job scraped with ?profile=1
+    """
+    job = current_app.extensions['scrape_jobs'].get(job_id)
+    if job is None or 'profile' not in job.artifacts:
+        return jsonify({'error': 'No profile for this job'}), 404
+    return send_file(
+        BytesIO(job.artifacts['profile'].encode('utf-8')),
+        mimetype='text/plain',
+        as_attachment=True,
+        download_name=f'profile-{job.id}.folded'
+    )
+
+@bp.route('/jobs/<job_id>/profile/report')
+def job_profile_report(job_id: str):
+    """
+    Return the top-N hot function report of a job scraped with ?profile=1
+    """
+    job = current_app.extensions['scrape_jobs'].get(job_id)
+    if job is None or 'profile_report' not in job.artifacts:
+        return jsonify({'error': 'No profile for this job'}), 404
+    return jsonify({'job_id': job.id, **job.artifacts['profile_report']})
+
+@bp.route('/metrics')
+def metrics():
+    """
+    Expose scraper pipeline metrics in the Prometheus text format
+    """
+    return Response(METRICS_REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@bp.route('/proxies')
+def proxy_health():
+    """
+    Return latency, block and cooldown state of each configured egress proxy
+    """
+    pool = current_app.extensions.get('proxy_pool')
+    if pool is None:
+        return jsonify({'error': 'No proxies configured'}), 404
+    return jsonify(pool.stats())
+
+@bp.route('/circuit')
+def circuit_state():
+    """
+    Return the marketplace circuit breaker's state and counts
+    """
+    breaker = current_app.extensions.get('circuit_breaker')
+    if breaker is None:
+        return jsonify({'error': 'Circuit breaker disabled'}), 404
+    return jsonify(breaker.stats())
 
-@app.route('/download/asin_template')
+@bp.route('/download/asin_template')
 def download_asin_template():
     """
     Generate and send a CSV template with 'ASINS' column
@@ -215,7 +424,7 @@ def download_asin_template():
         download_name='asin_template.csv'
     )
 
-@app.route('/download/template.csv')
+@bp.route('/download/template.csv')
 def download_template_csv():
     """
     Send the template CSV file for ASIN upload
@@ -233,4 +442,5 @@ def download_template_csv():
         return jsonify({'error': 'Template file not found'}), 404
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server only; use wsgi.py with a WSGI server in production
+    create_app().run(debug=True)
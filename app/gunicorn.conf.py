@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for serving the scraper in production
+
+Scrape requests spend almost all of their time waiting on Amazon, so the
+app is served by a few processes with many threads each rather than many
+single-threaded processes. Every value can be overridden through the
+environment.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('SCRAPER_BIND', '0.0.0.0:8000')
+
+# One process per core keeps HTML parsing (CPU-bound, GIL-held) spread
+# across cores; threads cover the I/O wait on product page fetches.
+workers = int(os.environ.get('SCRAPER_WEB_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('SCRAPER_WEB_THREADS', 16))
+
+# Bulk CSV requests scrape every ASIN before responding, so allow long requests
+timeout = int(os.environ.get('SCRAPER_WEB_TIMEOUT', 600))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to cap memory growth from large parse trees
+max_requests = int(os.environ.get('SCRAPER_WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('SCRAPER_LOG_LEVEL', 'info')
@@ -0,0 +1,15 @@
+"""
+Production WSGI entry point
+
+Run behind a multi-worker WSGI server instead of the Flask development
+server, e.g. from this directory:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+or on Windows:
+
+    waitress-serve --threads=16 --port=8000 wsgi:app
+"""
+from app import create_app
+
+app = create_app()
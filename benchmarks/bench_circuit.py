@@ -0,0 +1,100 @@
+"""
+Circuit breaker benchmark: a marketplace outage with and without the breaker
+
+Scrapes a stream of ASINs from the stand-in server, which goes dark for
+--outage seconds after --outage-at seconds (every response held back past
+the read timeout), three times: without a circuit breaker, with one that
+refuses fetches while open, and with one that parks fetches until it closes
+again (--wait). Reports wall time, records, timeouts and refusals, and the
+worker time spent on ASINs that failed -- the waste the breaker is there to
+cut.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_circuit.py
+    python benchmarks/bench_circuit.py --asins 600 --outage-at 2 --outage 8 --read-timeout 2
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from standin import FaultConfig, StandInServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import CircuitBreaker, Scraper  # noqa: E402
+
+
+def schedule_outage(server, start, length, latency):
+    """
+    Hold every response back latency seconds from start until start + length (seconds from now)
+
+    :return: The thread ending the outage; join it before the next run
+    """
+    normal = server.faults.latency
+
+    def outage():
+        time.sleep(start)
+        server.faults.latency = latency
+        time.sleep(length)
+        server.faults.latency = normal
+
+    thread = threading.Thread(target=outage, daemon=True)
+    thread.start()
+    return thread
+
+
+def run(server, args, breaker):
+    scraper = Scraper(base_url=server.url, concurrency=args.concurrency, timeout=(1.0, args.read_timeout),
+                      circuit_breaker=breaker)
+    outage = schedule_outage(server, args.outage_at, args.outage, args.read_timeout * 5)
+    statuses = Counter()
+    wasted = 0.0
+    started = time.perf_counter()
+    for result in scraper.iter_results(f'B0CIRC{i:05d}' for i in range(args.asins)):
+        statuses[result.status] += 1
+        if not result.ok:
+            wasted += result.elapsed
+    wall = time.perf_counter() - started
+    scraper.session.close()
+    outage.join()
+    return wall, statuses, wasted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--asins', type=int, default=160, help='ASINs per run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Scraper concurrency')
+    parser.add_argument('--latency', type=float, default=0.02, help='Stand-in latency outside the outage')
+    parser.add_argument('--outage-at', type=float, default=1.0, help='Seconds into each run the outage starts')
+    parser.add_argument('--outage', type=float, default=6.0, help='Length of the outage in seconds')
+    parser.add_argument('--read-timeout', type=float, default=1.0, help='Fetch read timeout in seconds')
+    parser.add_argument('--cooldown', type=float, default=1.0, help='Circuit cooldown in seconds')
+    parser.add_argument('--wait', type=float, default=15.0, help='Seconds parked fetches wait in the parking run')
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    server = StandInServer(faults=FaultConfig(latency=args.latency)).start()
+    print(f'Stand-in on {server.url}: outage of {args.outage:g}s after {args.outage_at:g}s, '
+          f'read timeout {args.read_timeout:g}s')
+    print(f"{'mode':<16} {'wall s':>7} {'ok':>5} {'timeout':>8} {'refused':>8} {'other':>6} {'wasted s':>9} {'opened':>7}")
+    modes = (
+        ('no breaker', None),
+        ('breaker, refuse', CircuitBreaker('stand-in', cooldown=args.cooldown)),
+        ('breaker, park', CircuitBreaker('stand-in', cooldown=args.cooldown, max_wait=args.wait)),
+    )
+    for label, breaker in modes:
+        wall, statuses, wasted = run(server, args, breaker)
+        other = sum(statuses.values()) - statuses['ok'] - statuses['timeout'] - statuses['circuit_open']
+        opened = '-' if breaker is None else breaker.stats()['opened']
+        print(f"{label:<16} {wall:7.2f} {statuses['ok']:5d} {statuses['timeout']:8d} {statuses['circuit_open']:8d} "
+              f"{other:6d} {wasted:9.1f} {opened:>7}")
+    print('wasted: worker seconds spent on ASINs that did not produce a record')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Decode benchmark: bs4 encoding detection vs the declared-charset fast path
+
+For every corpus page this times what BeautifulSoup does when handed raw
+bytes (UnicodeDammit: declared encoding lookup, then charset_normalizer
+sniffing when the page declares nothing) against parse.decode_html, which
+decodes once with the Content-Type or <meta> charset. Pages are timed both
+as fetched (with the HTTP Content-Type) and as cache hits (bytes only).
+
+Usage (from the repository root):
+
+    python benchmarks/bench_decode.py
+    python benchmarks/bench_decode.py --repeat 21
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from bs4 import UnicodeDammit  # noqa: E402
+
+from amazon_scraper.parse import decode_html  # noqa: E402
+
+CORPUS_DIR = os.path.join(HERE, 'corpus', 'v1')
+
+
+def timed_ms(func, repeat):
+    """
+    :return: (first call ms, best of the remaining calls ms, last result)
+    """
+    samples = []
+    result = None
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples[0], min(samples[1:]), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=9, help='Timed runs per case (the fastest is reported)')
+    args = parser.parse_args()
+
+    with open(os.path.join(CORPUS_DIR, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    print(f"{'page':<24} {'source':<8} {'sniff first':>11} {'sniff ms':>9} {'fast ms':>8} {'speedup':>8}  path")
+    for page in manifest['pages']:
+        with gzip.open(os.path.join(CORPUS_DIR, page['file']), 'rb') as f:
+            content = f.read()
+        for source, content_type in (('fetched', page['content_type']), ('cached', None)):
+            sniff_first, sniff_ms, dammit = timed_ms(lambda: UnicodeDammit(content, is_html=True), args.repeat)
+            text = decode_html(content, content_type)
+            # As in parse_html(): sniffing still runs when the fast path declines
+            _, fast_ms, _ = timed_ms(lambda: decode_html(content, content_type)
+                                     or UnicodeDammit(content, is_html=True).unicode_markup, args.repeat)
+            if text is None:
+                path = 'falls back to sniffing'
+            elif text != dammit.unicode_markup:
+                path = 'DIFFERENT OUTPUT'
+            else:
+                path = 'declared charset'
+            print(f"{page['name']:<24} {source:<8} {sniff_first:11.2f} {sniff_ms:9.2f} {fast_ms:8.2f} "
+                  f"{sniff_ms / fast_ms:7.1f}x  {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Embedded JSON fast path benchmark: JSON blobs vs BeautifulSoup on the corpus
+
+For every product page in the corpus and each --fields projection this
+measures, best of --repeat:
+
+    json       byte scan + json.loads of the page's embedded blobs alone
+    hybrid     what Scraper does: the JSON first, then a tree of only the
+               regions of fields the JSON did not carry
+    dom        the tree of the projection's regions only, no JSON
+    full tree  the whole page through BeautifulSoup, as before projections
+
+It lists which fields the JSON carried and whether they agree with the DOM
+values, and ends with each field's JSON hit rate over the corpus.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_embedded.py
+    python benchmarks/bench_embedded.py --fields price --fields title,price --repeat 9
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+from bench_extract import load_corpus
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper.embedded import EMBEDDED_FIELDS, extract_embedded_fields, find_json_blobs  # noqa: E402
+from amazon_scraper.parse import PRODUCT_FIELDS, extract_product_fields, parse_html, select_fields  # noqa: E402
+
+
+def best_ms(function, repeat):
+    """:return: (fastest run in ms, last result)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), result
+
+
+def hybrid(content, content_type, fields):
+    found = extract_embedded_fields(content, content_type, fields)
+    remaining = tuple(field for field in fields if field not in found)
+    if remaining:
+        found.update(extract_product_fields(parse_html(content, content_type=content_type, fields=remaining), remaining))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fields', action='append',
+                        help="Projection(s) to run, e.g. price or title,price; 'all' for every field "
+                             "(default: price and all)")
+    parser.add_argument('--page', action='append', help='Corpus page name(s) to run (default: all product pages)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement (the fastest is reported)')
+    args = parser.parse_args()
+
+    manifest, pages = load_corpus()
+    projections = [PRODUCT_FIELDS if value == 'all' else select_fields(value) for value in args.fields or ('price', 'all')]
+    product_pages = [page for page in manifest['pages']
+                     if page['kind'] == 'product' and (not args.page or page['name'] in args.page)]
+
+    for projection in projections:
+        print(f"\nfields: {','.join(projection)}")
+        print(f"{'page':<24} {'blobs':<22} {'json ms':>8} {'hybrid ms':>10} {'dom ms':>8} {'full ms':>8}  from json")
+        totals = Counter()
+        for page in product_pages:
+            content, content_type = pages[page['name']], page['content_type']
+            blobs = find_json_blobs(content, content_type)
+            json_ms, from_json = best_ms(lambda: extract_embedded_fields(content, content_type, projection), args.repeat)
+            hybrid_ms, combined = best_ms(lambda: hybrid(content, content_type, projection), args.repeat)
+            dom_ms, dom = best_ms(
+                lambda: extract_product_fields(parse_html(content, content_type=content_type, fields=projection),
+                                               projection), args.repeat)
+            full_ms, _ = best_ms(lambda: extract_product_fields(parse_html(content, content_type=content_type)),
+                                 max(1, args.repeat // 2))
+            notes = [f"{field}{'' if from_json[field] == dom[field] else ' (DIFFERS from DOM)'}" for field in from_json]
+            if combined != dom:
+                notes.append('HYBRID OUTPUT CHANGED')
+            kinds = ','.join(sorted({blob.kind for blob in blobs})) or '-'
+            print(f"{page['name']:<24} {kinds:<22} {json_ms:8.2f} {hybrid_ms:10.2f} {dom_ms:8.2f} {full_ms:8.2f}  "
+                  f"{', '.join(notes) or '-'}")
+            totals.update(hybrid=hybrid_ms, dom=dom_ms, full=full_ms)
+        print(f"{'total':<24} {'':<22} {'':>8} {totals['hybrid']:10.2f} {totals['dom']:8.2f} {totals['full']:8.2f}")
+
+    hits = Counter(field for page in product_pages
+                   for field in extract_embedded_fields(pages[page['name']], page['content_type']))
+    print(f"\nJSON hit rate over {len(product_pages)} product pages: "
+          + ', '.join(f"{field} {hits[field]}/{len(product_pages)}" for field in EMBEDDED_FIELDS))
+    print('Fields other than ' + ', '.join(EMBEDDED_FIELDS) + ' always come from the DOM.')
+
+
+if __name__ == '__main__':
+    main()
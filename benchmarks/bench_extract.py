@@ -0,0 +1,202 @@
+"""
+Parse + extract benchmark over the saved product page corpus
+
+For every corpus page and every available bs4 parser mode this measures
+best-of-N parse and extract time, the peak traced memory of one
+parse+extract and the memory still held by the parsed tree afterwards.
+Extraction output is checked against the record stored in the corpus
+manifest.
+
+A short CPU calibration loop is sampled before every page and timings are
+compared with benchmarks/baselines.json after scaling by the fastest
+calibration of the run, so baselines recorded on one machine stay usable
+on another and a single slow calibration sample cannot skew the result.
+A page over its limit is measured once more before it counts; the run
+exits non-zero when a page gets slower or uses more memory than its
+baseline allows, or when its output changes.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_extract.py                  # compare with baselines
+    python benchmarks/bench_extract.py --save-baseline  # record new baselines
+    python benchmarks/bench_extract.py --parser html.parser --page standard-large
+"""
+import argparse
+import gc
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from amazon_scraper.normalize import build_product_record
+from amazon_scraper.parse import extract_product_fields, parse_html
+
+CORPUS_DIR = os.path.join(HERE, 'corpus', 'v1')
+BASELINE_PATH = os.path.join(HERE, 'baselines.json')
+
+# bs4 parser mode -> module that must be importable for it
+PARSER_MODES = {'html.parser': None, 'lxml': 'lxml', 'html5lib': 'html5lib'}
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """
+    :param corpus_dir: Directory holding manifest.json and the gzipped pages
+    :return: (manifest, {page name: page bytes})
+    """
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    pages = {}
+    for page in manifest['pages']:
+        with gzip.open(os.path.join(corpus_dir, page['file']), 'rb') as f:
+            pages[page['name']] = f.read()
+    return manifest, pages
+
+
+def available_parsers():
+    return [mode for mode, module in PARSER_MODES.items()
+            if module is None or importlib.util.find_spec(module) is not None]
+
+
+def calibrate(rounds=3):
+    """
+    Time a fixed pure-Python workload, used to scale timings across machines
+
+    :return: List of round times in milliseconds
+    """
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        total = 0
+        for i in range(300_000):
+            total += i % 7
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def measure_page(content, parser, repeat, content_type=None):
+    """
+    :return: Dict of best parse/extract ms, peak KiB and tree KiB, plus the extracted fields
+    """
+    parse_times, extract_times = [], []
+    fields = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = parse_html(content, parser, content_type)
+        parsed = time.perf_counter()
+        fields = extract_product_fields(soup)
+        parse_times.append((parsed - start) * 1000)
+        extract_times.append((time.perf_counter() - parsed) * 1000)
+        soup.decompose()
+
+    gc.collect()
+    tracemalloc.start()
+    soup = parse_html(content, parser, content_type)
+    extract_product_fields(soup)
+    tree, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    soup.decompose()
+
+    return {
+        'parse_ms': round(min(parse_times), 3),
+        'extract_ms': round(min(extract_times), 3),
+        'peak_kib': round(peak / 1024, 1),
+        'tree_kib': round(tree / 1024, 1),
+    }, fields
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark parse + extract over the page corpus')
+    arg_parser.add_argument('--parser', action='append', help='Parser mode(s) to run (default: all installed)')
+    arg_parser.add_argument('--page', action='append', help='Corpus page name(s) to run (default: all)')
+    arg_parser.add_argument('--repeat', type=int, default=7, help='Timed runs per page (the fastest is reported)')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown / memory growth over baseline (default 0.25 = 25%%)')
+    arg_parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Slowdowns smaller than this are treated as noise (default 1.0)')
+    arg_parser.add_argument('--save-baseline', action='store_true', help='Record results as the new baselines')
+    args = arg_parser.parse_args()
+
+    manifest, pages = load_corpus()
+    parsers = args.parser or available_parsers()
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    results = {}
+    outputs = {}
+    calibration = []
+    for page in manifest['pages']:
+        if args.page and page['name'] not in args.page:
+            continue
+        for parser in parsers:
+            calibration.extend(calibrate())
+            key = f"{page['name']}|{parser}"
+            results[key], outputs[key] = measure_page(pages[page['name']], parser, args.repeat, page['content_type'])
+    calibration_ms = min(calibration)
+    scale = calibration_ms / baselines['calibration_ms'] if baselines.get('calibration_ms') else 1.0
+
+    failures = []
+    print(f"Corpus {manifest['version']}, calibration {calibration_ms:.1f} ms (x{scale:.2f} vs baseline)")
+    print(f"{'page':<24} {'parser':<12} {'parse ms':>9} {'extract ms':>10} {'peak KiB':>9} {'tree KiB':>9}  vs baseline")
+    for page in manifest['pages']:
+        for parser in parsers:
+            key = f"{page['name']}|{parser}"
+            if key not in results:
+                continue
+            measured = results[key]
+            notes = []
+            # Expected output is recorded with the default parser; other
+            # parsers may legitimately normalize whitespace differently
+            if parser == 'html.parser' and build_product_record(page['asin'], outputs[key]) != page['expected']:
+                notes.append('OUTPUT CHANGED')
+            base = baselines.get('results', {}).get(key)
+            if base and not args.save_baseline:
+                total = measured['parse_ms'] + measured['extract_ms']
+                expected = (base['parse_ms'] + base['extract_ms']) * scale
+                allowed = max(expected * (1 + args.tolerance), expected + args.min_delta_ms)
+                if total > allowed:
+                    # Re-measure before failing: a burst of background load
+                    # on a shared runner easily outlasts a handful of repeats
+                    retry, _ = measure_page(pages[page['name']], parser, args.repeat, page['content_type'])
+                    measured['parse_ms'] = min(measured['parse_ms'], retry['parse_ms'])
+                    measured['extract_ms'] = min(measured['extract_ms'], retry['extract_ms'])
+                    total = measured['parse_ms'] + measured['extract_ms']
+                change = total / expected - 1
+                notes.append(f"{change * 100:+.0f}% time")
+                if total > allowed:
+                    notes.append('SLOWER')
+                if measured['peak_kib'] > base['peak_kib'] * (1 + args.tolerance):
+                    notes.append('MORE MEMORY')
+            if any(note.isupper() for note in notes):
+                failures.append(f"{key}: {', '.join(notes)}")
+            print(f"{page['name']:<24} {parser:<12} {measured['parse_ms']:9.2f} {measured['extract_ms']:10.2f} "
+                  f"{measured['peak_kib']:9.0f} {measured['tree_kib']:9.0f}  {', '.join(notes)}")
+
+    if args.save_baseline:
+        merged = baselines.get('results', {}) if (args.page or args.parser) else {}
+        merged.update(results)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'corpus': manifest['version'], 'calibration_ms': round(calibration_ms, 3),
+                       'results': merged}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines written to {BASELINE_PATH}")
+        return 0
+
+    if failures:
+        print('\nRegressions:')
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Field projection benchmark: what each field costs to scrape
+
+For every product page in the corpus and every projection (each field on
+its own, all four fields, and no projection at all, which reads the whole
+page and builds the whole tree) this measures how much of the page the
+download has to read before the RegionScanner has every region it needs
+(in the fetch's 64 KiB steps), and best-of-N parse and extract time on
+that much of the page. Output is checked against the full extraction.
+
+A second table fetches the corpus pages from the stand-in server through
+Scraper with each projection, with a --bandwidth cap so reading less of a
+page shows up in wall time, and reports the mean time, decoded bytes and
+wire bytes per ASIN.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_fields.py
+    python benchmarks/bench_fields.py --page standard-large --bandwidth 500000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from bench_extract import load_corpus
+from standin import FaultConfig, StandInServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import PRODUCT_FIELDS, Scraper  # noqa: E402
+from amazon_scraper.parse import RegionScanner, extract_product_fields, parse_html  # noqa: E402
+
+# (label, fields passed on); None is the unprojected scrape
+PROJECTIONS = [(field, (field,)) for field in PRODUCT_FIELDS] + [('all fields', PRODUCT_FIELDS), ('no projection', None)]
+
+_CHUNK = 64 * 1024
+
+
+def bytes_needed(content, fields):
+    """:return: Bytes the download reads before every region of the projection is in"""
+    if fields is None:
+        return len(content)
+    scanner = RegionScanner(fields)
+    for offset in range(0, len(content), _CHUNK):
+        if scanner.feed(content[offset:offset + _CHUNK]):
+            return min(len(content), offset + _CHUNK)
+    return len(content)
+
+
+def measure(content, content_type, fields, repeat):
+    """:return: (best parse ms, best extract ms, extracted fields)"""
+    parse_times, extract_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = parse_html(content, content_type=content_type, fields=fields)
+        parsed = time.perf_counter()
+        extracted = extract_product_fields(soup, fields)
+        parse_times.append((parsed - start) * 1000)
+        extract_times.append((time.perf_counter() - parsed) * 1000)
+    return min(parse_times), min(extract_times), extracted
+
+
+def corpus_table(manifest, pages, args):
+    print(f"{'page':<24} {'fields':<16} {'read KiB':>9} {'of KiB':>7} {'parse ms':>9} {'extract ms':>10}")
+    for page in manifest['pages']:
+        if page['kind'] != 'product' or (args.page and page['name'] not in args.page):
+            continue
+        content = pages[page['name']]
+        _, _, full = measure(content, page['content_type'], None, 1)
+        for label, fields in PROJECTIONS:
+            needed = bytes_needed(content, fields)
+            parse_ms, extract_ms, extracted = measure(content[:needed], page['content_type'], fields, args.repeat)
+            note = '' if extracted == {key: full[key] for key in fields or PRODUCT_FIELDS} else '  OUTPUT CHANGED'
+            print(f"{page['name']:<24} {label:<16} {needed / 1024:9.0f} {len(content) / 1024:7.0f} "
+                  f"{parse_ms:9.2f} {extract_ms:10.2f}{note}")
+
+
+def standin_table(manifest, args):
+    asins = [page['asin'] for page in manifest['pages']
+             if page['kind'] == 'product' and (not args.page or page['name'] in args.page)]
+    server = StandInServer(faults=FaultConfig(latency=args.latency, bandwidth=args.bandwidth)).start()
+    print(f"\nStand-in on {server.url}: {args.bandwidth / 1024:.0f} KiB/s per response, "
+          f"{args.latency * 1000:.0f} ms latency, {len(asins)} ASINs x {args.rounds}")
+    print(f"{'fields':<16} {'ms/ASIN':>8} {'decoded KiB':>12} {'wire KiB':>9}")
+    for label, fields in PROJECTIONS:
+        scraper = Scraper(base_url=server.url, fields=fields)
+        results = [result for _ in range(args.rounds) for result in scraper.iter_results(asins)]
+        scraper.session.close()
+        count = len(results)
+        print(f"{label:<16} {sum(result.elapsed for result in results) / count * 1000:8.1f} "
+              f"{sum(result.bytes_received for result in results) / count / 1024:12.0f} "
+              f"{sum(result.wire_bytes for result in results) / count / 1024:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--page', action='append', help='Corpus page name(s) to run (default: all product pages)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per page and projection (the fastest is reported)')
+    parser.add_argument('--bandwidth', type=int, default=1_000_000, help='Stand-in throughput cap in bytes/sec')
+    parser.add_argument('--latency', type=float, default=0.02, help='Stand-in latency in seconds')
+    parser.add_argument('--rounds', type=int, default=3, help='Times each ASIN is scraped per projection')
+    parser.add_argument('--no-standin', action='store_true', help='Only run the corpus table')
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    manifest, pages = load_corpus()
+    corpus_table(manifest, pages, args)
+    if not args.no_standin:
+        standin_table(manifest, args)
+    print("read: bytes the download needs before stopping. Corpus 'no projection' rows build the whole tree, as "
+          "parse_html() does without fields; Scraper always builds only the product regions, but without a "
+          "projection reads every page to the end")
+
+
+if __name__ == '__main__':
+    main()
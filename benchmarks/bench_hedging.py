@@ -0,0 +1,83 @@
+"""
+Hedged fetch benchmark: tail latency with and without request hedging
+
+Starts the stand-in server with a slow tail (--stall-rate of responses held
+back --stall seconds on top of --latency) and fetches the same ASINs
+through Scraper.fetch() twice: without hedging, and with a Hedger at
+--budget. Reports p50/p95/p99/max fetch latency, wall time, how many
+requests the stand-in served (the extra load hedging cost) and the hedge
+outcomes. Only the fetch stage runs, so parsing does not mask the tail.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_hedging.py
+    python benchmarks/bench_hedging.py --fetches 2000 --stall-rate 0.01 --stall 3 --budget 0.02
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest import percentile
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import Hedger, Scraper  # noqa: E402
+
+
+def run(server, concurrency, fetches, hedger):
+    scraper = Scraper(base_url=server.url, concurrency=concurrency, hedger=hedger)
+    server.reset_stats()
+
+    def fetch(asin):
+        start = time.perf_counter()
+        scraper.fetch(asin)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(fetch, [f'B0HEDGE{i:05d}' for i in range(fetches)]))
+    wall = time.perf_counter() - started
+    scraper.session.close()
+    stats = server.stats()
+    return {
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'max': max(latencies) * 1000,
+        'wall': wall,
+        'served': sum(count for kind, count in stats.items() if kind != 'stalled'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=16, help='Fetches in flight')
+    parser.add_argument('--fetches', type=int, default=1000, help='Pages fetched per run')
+    parser.add_argument('--budget', type=float, default=0.05, help='Hedge budget (extra requests per fetch)')
+    parser.add_argument('--hedge-percentile', type=float, default=95.0, help='Latency percentile to hedge after')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.05, jitter=0.02, stall_rate=0.02, stall=1.0, seed=7)
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    server = StandInServer(faults=faults_from_args(args)).start()
+    print(f'Stand-in on {server.url}: latency {args.latency * 1000:.0f}+/-{args.jitter * 1000:.0f} ms, '
+          f'{args.stall_rate:.1%} of responses stalled {args.stall:g}s')
+    print(f"{'mode':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'wall s':>7} {'requests':>9}")
+    for label, hedger in (('no hedging', None),
+                          (f'hedge {args.budget:.0%}', Hedger(budget=args.budget, percentile=args.hedge_percentile))):
+        row = run(server, args.concurrency, args.fetches, hedger)
+        print(f"{label:<12} {row['p50']:8.1f} {row['p95']:8.1f} {row['p99']:8.1f} {row['max']:8.1f} "
+              f"{row['wall']:7.2f} {row['served']:9d}")
+        if hedger is not None:
+            stats = hedger.stats()
+            print(f"  hedged after {stats['delay_ms']} ms: {stats['hedges']} hedges ({stats['hedge_rate']:.1%} extra), "
+                  f"{stats['won']} won, {stats['lost']} lost, {stats['failed']} failed, {stats['denied']} over budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Fetch benchmark: pooled HTTP/1.1 vs multiplexed HTTP/2
+
+Starts the HTTP/1.1 stand-in (standin.py) and the h2c stand-in
+(standin_h2.py) with the same corpus and faults, then at each concurrency
+level downloads the same product pages through fetch_product_page() with a
+session from build_session() and one from build_session(http2=True).
+Reports fetches/sec, p50/p99 fetch latency and how many connections each
+server accepted. Only the fetch stage runs, so parsing does not mask
+transport differences.
+
+Over cleartext the saving is the TCP handshakes and per-connection slow
+start; against a TLS endpoint each avoided connection also saves a TLS
+handshake, so real marketplaces gain more than this shows.
+
+Needs httpx and h2 (pip install "httpx[http2]").
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_http2.py
+    python benchmarks/bench_http2.py --concurrency 8 32 64 --fetches 600 --latency 0.1
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loadtest import percentile
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import build_session, fetch_product_page  # noqa: E402
+from amazon_scraper.http2 import DEFAULT_MAX_STREAMS, http2_available  # noqa: E402
+
+
+def run(server, base_url, concurrency, fetches, http2):
+    session = build_session(pool_size=concurrency, http2=http2)
+    asins = [f'B0HTTP{i:05d}' for i in range(fetches)]
+    server.reset_stats()
+
+    def fetch(asin):
+        start = time.perf_counter()
+        page = fetch_product_page(asin, base_url=base_url, session=session)
+        return time.perf_counter() - start, page.wire_bytes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, asins))
+    wall = time.perf_counter() - started
+    session.close()
+    latencies = [latency for latency, _ in results]
+    return {
+        'rate': fetches / wall,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'connections': server.connections,
+        'wire_mb': sum(wire for _, wire in results) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64], help='Fetches in flight')
+    parser.add_argument('--fetches', type=int, default=400, help='Pages fetched per run')
+    parser.add_argument('--max-streams', type=int, default=128, help='Streams the h2 stand-in allows per connection')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.05)
+    args = parser.parse_args()
+    if not http2_available():
+        raise SystemExit('The HTTP/2 benchmark needs httpx and h2: pip install "httpx[http2]"')
+    from standin_h2 import H2StandInServer
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    http1 = StandInServer(faults=faults_from_args(args)).start()
+    http2 = H2StandInServer(faults=faults_from_args(args), max_streams=args.max_streams).start()
+    print(f'HTTP/1.1 stand-in on {http1.url}, HTTP/2 stand-in on {http2.url}; '
+          f'client streams per connection: {DEFAULT_MAX_STREAMS}')
+    print(f"{'concurrency':>11} {'transport':<9} {'fetches/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'conns':>6} {'wire MB':>8}")
+    for concurrency in args.concurrency:
+        for label, server, use_http2 in (('HTTP/1.1', http1, False), ('HTTP/2', http2, True)):
+            row = run(server, server.url, concurrency, args.fetches, use_http2)
+            print(f"{concurrency:11d} {label:<9} {row['rate']:9.1f} {row['p50']:8.1f} {row['p99']:8.1f} "
+                  f"{row['connections']:6d} {row['wire_mb']:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Listing harvest benchmark: product pages vs search results pages for a price sweep
+
+Harvests --listings search queries from the stand-in server (LISTING_PAGES
+pages of LISTING_CARDS results each) with Scraper.iter_listing_results(),
+then scrapes the same ASINs one product page each with the same --fields
+projection. Reports requests, requests per product, wall time and bytes for
+both, and how many listing records agree with the product page records.
+
+A product page without a price block still yields a price from its
+carousel, where its results card shows none; those products are counted
+apart from real disagreements.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_listing.py
+    python benchmarks/bench_listing.py --listings 4 --fields title,price --concurrency 8 --bandwidth 500000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from standin import LISTING_CARDS, LISTING_PAGES, FaultConfig, StandInServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import Scraper  # noqa: E402
+
+_UNAVAILABLE = '₹Price not found'
+
+
+def timed(server, results):
+    """:return: (results as a list, wall seconds, requests the stand-in answered)"""
+    server.reset_stats()
+    started = time.perf_counter()
+    results = list(results)
+    return results, time.perf_counter() - started, sum(server.stats().values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--listings', type=int, default=2, help='Search queries to harvest')
+    parser.add_argument('--fields', default='price', help='Projection, within title,price (default price)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Scraper concurrency')
+    parser.add_argument('--bandwidth', type=int, default=1_000_000, help='Stand-in throughput cap in bytes/sec')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stand-in latency in seconds')
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    server = StandInServer(faults=FaultConfig(latency=args.latency, bandwidth=args.bandwidth)).start()
+    queries = [f'benchmark query {index}' for index in range(args.listings)]
+    print(f"Stand-in on {server.url}: {len(queries)} queries x {LISTING_PAGES} pages x {LISTING_CARDS} cards, "
+          f"{args.latency * 1000:.0f} ms latency, {args.bandwidth / 1024:.0f} KiB/s per response")
+
+    scraper = Scraper(base_url=server.url, concurrency=args.concurrency, fields=args.fields)
+    listed, listing_wall, listing_requests = timed(server, scraper.iter_listing_results(queries))
+    products, product_wall, product_requests = timed(server, scraper.iter_results(result.asin for result in listed))
+    scraper.session.close()
+
+    print(f"{'mode':<16} {'products':>9} {'requests':>9} {'req/product':>12} {'wall s':>7} {'KiB decoded':>12} "
+          f"{'KiB wire':>9}")
+    for label, results, wall, requests in (('listing pages', listed, listing_wall, listing_requests),
+                                           ('product pages', products, product_wall, product_requests)):
+        ok = sum(result.ok for result in results)
+        print(f"{label:<16} {ok:9d} {requests:9d} {requests / max(1, ok):12.3f} {wall:7.2f} "
+              f"{sum(result.bytes_received for result in results) / 1024:12.0f} "
+              f"{sum(result.wire_bytes for result in results) / 1024:9.0f}")
+
+    by_asin = {result.asin: result.record for result in products if result.ok}
+    agree = unavailable = differ = 0
+    for result in listed:
+        record = by_asin.get(result.asin)
+        if record is None:
+            continue
+        if record == result.record:
+            agree += 1
+        elif result.record.get('price') == _UNAVAILABLE:
+            unavailable += 1
+        else:
+            differ += 1
+    print(f"listing records matching the product page: {agree}, unavailable on the card (carousel price on the "
+          f"product page): {unavailable}, different: {differ}")
+
+
+if __name__ == '__main__':
+    main()
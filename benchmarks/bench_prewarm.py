@@ -0,0 +1,136 @@
+"""
+Connection setup benchmark: DNS cache and pool pre-warming
+
+Runs the same small jobs (a fresh Scraper and session each, like shard
+workers picking up shards) against the stand-in server in three modes:
+
+    cold        every new connection resolves the host and connects on demand
+    dns-cache   lookups go through the process-wide DNS cache
+    prewarm     DNS cache, plus one keep-alive connection per worker opened
+                when the job starts
+
+The stand-in is addressed by name (localhost) and name resolution is slowed
+by --dns-delay, standing in for a resolver round trip; --handshake makes
+every new connection stall before its first response, standing in for TLS.
+Over plain HTTP the handshake stall lands in the first response's ttfb, so
+the report shows first-result latency, first-wave fetch time and the
+per-fetch dns/connect stage times from the traces, plus how many
+connections and lookups the transport histograms recorded.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_prewarm.py
+    python benchmarks/bench_prewarm.py --concurrency 16 --asins 64 --dns-delay 0.05 --handshake 0.1
+"""
+import argparse
+import ipaddress
+import logging
+import os
+import socket
+import sys
+import time
+
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import Scraper  # noqa: E402
+from amazon_scraper.metrics import STAGE_SECONDS  # noqa: E402
+from amazon_scraper.transport import DNS_CACHE  # noqa: E402
+
+MODES = (
+    ('cold', 0.0, False),
+    ('dns-cache', 60.0, False),
+    ('prewarm', 60.0, True),
+)
+
+
+class SlowResolver:
+    """Replacement for socket.getaddrinfo whose lookups take delay seconds (IPv4 only, like the stand-in)"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lookups = 0
+        self._getaddrinfo = socket.getaddrinfo
+
+    def __call__(self, host, port, family=0, type=0, proto=0, flags=0):
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            # Only names go to the resolver; IP literals are parsed locally
+            self.lookups += 1
+            time.sleep(self.delay)
+        return self._getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
+
+
+def stage_totals():
+    """:return: {stage: (observations, seconds)} from the connection stage histograms"""
+    totals = {}
+    for stage in ('dns', 'connect'):
+        _, total, count = STAGE_SECONDS.labels(stage=stage).snapshot()
+        totals[stage] = (count, total)
+    return totals
+
+
+def run_job(base_url, concurrency, asins, prewarm):
+    scraper = Scraper(base_url=base_url, concurrency=concurrency, trace=True,
+                      prewarm=concurrency if prewarm else 0)
+    started = time.perf_counter()
+    first = None
+    results = []
+    for result in scraper.iter_results(asins):
+        if first is None:
+            first = time.perf_counter() - started
+        results.append(result)
+    wall = time.perf_counter() - started
+    scraper.session.close()
+    first_wave = [result.trace.fetch_ms for result in results[:concurrency]]
+    return {
+        'first_ms': first * 1000,
+        'first_wave_ms': sum(first_wave) / len(first_wave),
+        'dns_ms': sum(result.trace.dns_ms for result in results),
+        'connect_ms': sum(result.trace.connect_ms for result in results),
+        'wall_ms': wall * 1000,
+        'ok': sum(1 for result in results if result.ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=8, help='Workers per job')
+    parser.add_argument('--asins', type=int, default=32, help='ASINs per job')
+    parser.add_argument('--jobs', type=int, default=5, help='Jobs per mode')
+    parser.add_argument('--dns-delay', type=float, default=0.03, help='Seconds each name lookup takes')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.02, handshake=0.05)
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    server = StandInServer(faults=faults_from_args(args)).start()
+    base_url = f'http://localhost:{server.server_address[1]}'
+    resolver = socket.getaddrinfo = SlowResolver(args.dns_delay)
+    print(f'Stand-in on {base_url}: lookups {args.dns_delay * 1000:.0f} ms, '
+          f'handshake {args.handshake * 1000:.0f} ms, latency {args.latency * 1000:.0f} ms')
+    print(f"{'mode':<10} {'first ms':>9} {'wave ms':>8} {'wall ms':>8} {'dns ms':>8} {'conn ms':>8} "
+          f"{'lookups':>8} {'conns':>6} {'hist s':>7} {'ok':>5}")
+    for label, ttl, prewarm in MODES:
+        DNS_CACHE.ttl = ttl
+        DNS_CACHE.clear()
+        server.reset_stats()
+        resolver.lookups = 0
+        before = stage_totals()
+        rows = [run_job(base_url, args.concurrency, [f'B0WARM{job:02d}{i:03d}' for i in range(args.asins)], prewarm)
+                for job in range(args.jobs)]
+        after = stage_totals()
+        hist_seconds = sum(after[stage][1] - before[stage][1] for stage in after)
+        mean = {key: sum(row[key] for row in rows) / len(rows) for key in rows[0]}
+        print(f"{label:<10} {mean['first_ms']:9.1f} {mean['first_wave_ms']:8.1f} {mean['wall_ms']:8.1f} "
+              f"{mean['dns_ms']:8.1f} {mean['connect_ms']:8.1f} "
+              f"{resolver.lookups:8d} {server.connections:6d} {hist_seconds:7.2f} {mean['ok']:5.0f}")
+    print('first: job start to first result; wave: mean fetch time of the first result per worker; '
+          'dns/conn: per-job sums of fetch-path stage times; lookups/conns: resolver calls and connections '
+          'accepted over all jobs; hist: dns + connect histogram seconds over all jobs, pre-warming included')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Interactive latency while bulk scrapes saturate a shared FetchScheduler
+
+Starts the local stand-in (benchmarks/standin.py) and keeps a bulk Scraper
+busy with more concurrent fetches than the scheduler has slots. Meanwhile
+small interactive scrapes (3 ASINs, like a manual request) run back to
+back, first in the same 'bulk' class (plain FIFO sharing of the pool), then
+as 'interactive'. Reports interactive latency percentiles and bulk
+throughput for both runs.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_priority.py --slots 8 --bulk-concurrency 32 --latency 0.2
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from loadtest import percentile
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import FetchScheduler, Scraper  # noqa: E402
+
+# The smallest corpus product page keeps local parse CPU out of the way
+ASIN = 'B0CORP0001'
+
+
+def run(upstream_url, interactive_class, args):
+    scheduler = FetchScheduler(slots=args.slots, max_wait=args.max_wait)
+    stop = threading.Event()
+    bulk_done = [0]
+
+    def bulk():
+        scraper = Scraper(base_url=upstream_url, concurrency=args.bulk_concurrency,
+                          scheduler=scheduler, priority='bulk')
+
+        def endless():
+            while not stop.is_set():
+                yield ASIN
+
+        for _ in scraper.iter_results(endless()):
+            bulk_done[0] += 1
+
+    thread = threading.Thread(target=bulk, daemon=True)
+    thread.start()
+    time.sleep(args.warmup)
+
+    interactive = Scraper(base_url=upstream_url, concurrency=3, scheduler=scheduler, priority=interactive_class)
+    latencies = []
+    started = time.perf_counter()
+    bulk_before = bulk_done[0]
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        interactive.process([ASIN] * 3)
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - started
+    bulk_rate = (bulk_done[0] - bulk_before) / wall
+    stop.set()
+    thread.join()
+    return latencies, bulk_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--slots', type=int, default=8, help='Scheduler fetch slots')
+    parser.add_argument('--bulk-concurrency', type=int, default=32, help='Concurrent bulk fetches attempted')
+    parser.add_argument('--requests', type=int, default=20, help='Interactive 3-ASIN scrapes per run')
+    parser.add_argument('--max-wait', type=float, default=10.0, help='Scheduler starvation limit in seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Seconds of bulk load before measuring')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.2)
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    upstream = StandInServer(faults=faults_from_args(args)).start()
+    print(f'Stand-in Amazon server on {upstream.url}')
+    print(f"{'manual scrapes as':<18} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'bulk ASINs/s':>13}")
+    for interactive_class in ('bulk', 'interactive'):
+        latencies, bulk_rate = run(upstream.url, interactive_class, args)
+        print(f'{interactive_class:<18} {percentile(latencies, 50) * 1000:8.0f} {percentile(latencies, 95) * 1000:8.0f} '
+              f'{max(latencies) * 1000:8.0f} {bulk_rate:13.1f}')
+
+
+if __name__ == '__main__':
+    main()
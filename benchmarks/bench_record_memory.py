@@ -0,0 +1,109 @@
+"""
+Memory of 100k products held as dicts vs ProductRecord
+
+Builds synthetic records shaped like product_details.json, with attribute
+keys drawn from a realistic pool and every string freshly allocated per
+record (as it is when parsed from separate pages), then measures the
+traced allocation of each representation.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_record_memory.py --records 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper.record import ProductRecord
+
+ATTRIBUTE_KEYS = [
+    'Material Type', 'Colour', 'Mounting Type', 'Water Resistance Level', 'Alarm', 'Lock Type',
+    'Control Type', 'Additional Features', 'Customer Reviews', 'Best Sellers Rank',
+    'Included Components', 'ASIN', 'Model Number', 'Brand Name', 'Item Weight',
+    'Item Dimensions D x W x H', 'Chamber Height', 'Capacity', 'Manufacturer', 'Country of Origin',
+]
+SHORT_VALUES = ['Alloy Steel', 'Grey', 'Black', 'Wall Mount', 'Not Water Resistant', 'Electronic, Key',
+                'Touchpad Control', 'India', '15 litres', '9000 Grams', 'Godrej Security Solutions']
+
+
+def fresh(text: str) -> str:
+    # Force a distinct string object, as a per-page parse would produce
+    return (text + ' ')[:-1]
+
+
+def make_record(rng: random.Random, index: int) -> dict:
+    asin = f"B0{index:08d}"
+    keys = ATTRIBUTE_KEYS[:rng.randint(12, len(ATTRIBUTE_KEYS))]
+    attributes = {}
+    for key in keys:
+        if key == 'ASIN':
+            value = asin
+        elif key in ('Customer Reviews', 'Best Sellers Rank', 'Included Components', 'Model Number'):
+            value = f"{key} value {rng.random():.6f} " * 2
+        else:
+            value = rng.choice(SHORT_VALUES)
+        attributes[fresh(key)] = fresh(value)
+    return {
+        'asin': asin,
+        'title': f"Synthetic product {index} " + 'x' * rng.randint(40, 120),
+        'price': f"₹{rng.randint(100, 99999):,}.",
+        'attributes': attributes,
+        'bullet_points': [f"Bullet {n} for product {index} " + 'y' * rng.randint(60, 160) for n in range(5)],
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dict and ProductRecord memory use')
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    dicts, dict_bytes, _ = measure(lambda: [make_record(rng, i) for i in range(args.records)])
+
+    start = time.perf_counter()
+    for record in dicts:
+        ProductRecord.from_dict(record)
+    from_dict_time = time.perf_counter() - start
+    del dicts
+
+    # Each compact record is built straight from a freshly parsed dict, so
+    # only what the compact list keeps alive is counted
+    rng = random.Random(args.seed)
+    compact, compact_bytes, _ = measure(
+        lambda: [ProductRecord.from_dict(make_record(rng, i)) for i in range(args.records)]
+    )
+
+    start = time.perf_counter()
+    for record in compact:
+        record.to_dict()
+    to_dict_time = time.perf_counter() - start
+
+    n = args.records
+    print(f"Records:              {n}")
+    print(f"dict representation:  {dict_bytes / 2**20:8.1f} MiB  ({dict_bytes / n:6.0f} B/record)")
+    print(f"ProductRecord:        {compact_bytes / 2**20:8.1f} MiB  ({compact_bytes / n:6.0f} B/record)")
+    print(f"Saving:               {100 * (1 - compact_bytes / dict_bytes):8.1f} %")
+    print(f"from_dict conversion: {from_dict_time / n * 1e6:8.2f} us/record")
+    print(f"to_dict conversion:   {to_dict_time / n * 1e6:8.2f} us/record")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Throughput of sharded bulk jobs as worker processes are added
+
+Starts the local stand-in (benchmarks/standin.py), then for each worker
+count submits a job to a fresh SQLite shard queue, runs that many
+`python -m amazon_scraper.shards worker` processes until the queue drains
+and reports ASINs/sec and scaling efficiency against one worker. The merged
+result stream is checked to hold every ASIN in input order.
+
+Scaling is only linear while workers are bound by upstream latency rather
+than by local CPU, so on a small machine keep --concurrency modest and the
+stand-in latency realistic, or run workers on separate nodes.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_sharding.py --workers 1 2 4 --asins 400 --latency 0.3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from amazon_scraper.shards import ShardQueue  # noqa: E402
+
+
+def run_job(upstream_url, workers, asins, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'queue.db')
+        queue = ShardQueue(path)
+        job_id = queue.submit(asins, shard_size=args.shard_size)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+        command = [sys.executable, '-m', 'amazon_scraper.shards', 'worker', path,
+                   '-c', str(args.concurrency), '--base-url', upstream_url]
+        started = time.perf_counter()
+        processes = [subprocess.Popen(command + ['--id', f'bench-{i}'], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                     for i in range(workers)]
+        for process in processes:
+            process.wait()
+        wall = time.perf_counter() - started
+
+        merged = [entry['asin'] for entry in queue.iter_results(job_id)]
+        if merged != asins:
+            raise SystemExit(f'{workers} workers: merged results do not match the input ({len(merged)} entries)')
+        return wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker process counts to run')
+    parser.add_argument('--asins', type=int, default=400, help='ASINs per job')
+    parser.add_argument('--shard-size', type=int, default=20, help='ASINs per shard')
+    parser.add_argument('--concurrency', type=int, default=2, help='Scraper concurrency inside each worker')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.3)
+    args = parser.parse_args()
+
+    upstream = StandInServer(faults=faults_from_args(args)).start()
+    asins = [f'B0SHARD{i:05d}' for i in range(args.asins)]
+    print(f'Stand-in Amazon server on {upstream.url}')
+    print(f"{'workers':>7} {'wall s':>8} {'ASINs/s':>8} {'efficiency':>10}")
+    single = None
+    for workers in args.workers:
+        wall = run_job(upstream.url, workers, asins, args)
+        rate = len(asins) / wall
+        single = single or rate / workers
+        print(f'{workers:7d} {wall:8.2f} {rate:8.1f} {rate / (single * workers) * 100:9.0f}%')
+
+
+if __name__ == '__main__':
+    main()
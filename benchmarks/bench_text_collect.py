@@ -0,0 +1,146 @@
+"""
+Micro-benchmark: single-pass text collection vs per-element get_text()
+
+Compares the original attribute-table and bullet extraction (find_all('tr'),
+row.find('th'/'td') and get_text(strip=True) per cell, get_text twice per
+bullet) with amazon_scraper.parse.collect_text, which walks each region
+once. Reports best-of-N time and the number of tree nodes each approach
+visits, for the large-attribute-table corpus page and synthetic tables of
+growing size with nested cell markup.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_text_collect.py
+    python benchmarks/bench_text_collect.py --rows 100 1000 5000 --repeat 9
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from bs4.element import Tag  # noqa: E402
+
+from amazon_scraper.parse import collect_text, parse_html  # noqa: E402
+
+CORPUS_PAGE = os.path.join(HERE, 'corpus', 'v1', 'large-attribute-table.html.gz')
+
+
+def legacy_attributes(container):
+    attributes = {}
+    for table in container.find_all('table'):
+        for row in table.find_all('tr'):
+            key = row.find('th')
+            value = row.find('td')
+            if key and value:
+                attributes[key.get_text(strip=True)] = value.get_text(strip=True)
+    return attributes
+
+
+def legacy_bullets(container):
+    return [li.get_text(strip=True) for li in container.find_all('li') if li.get_text(strip=True)]
+
+
+def collected_attributes(container):
+    attributes = {}
+    key = value = None
+    for name, text in collect_text(container, ('th', 'td'), markers=('tr',)):
+        if name == 'tr':
+            if key is not None and value is not None:
+                attributes[key] = value
+            key = value = None
+        elif name == 'th' and key is None:
+            key = text
+        elif name == 'td' and value is None:
+            value = text
+    if key is not None and value is not None:
+        attributes[key] = value
+    return attributes
+
+
+def collected_bullets(container):
+    return [text for _, text in collect_text(container, ('li',)) if text]
+
+
+def synthetic_page(rows: int) -> str:
+    cells = ''.join(
+        f'<tr><th class="a-color-secondary a-size-base prodDetSectionEntry"> Attribute {i} </th>'
+        f'<td class="a-size-base prodDetAttrValue"> <span>Value</span> <b>{i}</b> <span> cm </span>'
+        f'<!-- note --></td></tr>'
+        for i in range(rows)
+    )
+    bullets = ''.join(f'<li><span class="a-list-item"> Bullet <i>{i}</i> text </span></li>' for i in range(rows // 10))
+    return (f'<html><body><div id="prodDetails"><table>{cells}</table></div>'
+            f'<div id="feature-bullets"><ul>{bullets}</ul></div></body></html>')
+
+
+class NodeCounter:
+    """Counts nodes yielded by Tag.descendants, which find_all() and get_text() both walk"""
+
+    def __init__(self):
+        self.visits = 0
+        self._original = Tag.descendants
+
+    def __enter__(self):
+        original = self._original.fget
+        counter = self
+
+        def counting(tag):
+            for node in original(tag):
+                counter.visits += 1
+                yield node
+
+        Tag.descendants = property(counting)
+        return self
+
+    def __exit__(self, *exc):
+        Tag.descendants = self._original
+
+
+def best_ms(func, container, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(container)
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)
+
+
+def compare(label, soup, repeat):
+    for region, legacy, collected in (
+        ('prodDetails', legacy_attributes, collected_attributes),
+        ('feature-bullets', legacy_bullets, collected_bullets),
+    ):
+        container = soup.find('div', {'id': region})
+        if container is None:
+            continue
+        if legacy(container) != collected(container):
+            raise SystemExit(f'{label} {region}: outputs differ')
+        with NodeCounter() as legacy_nodes:
+            legacy(container)
+        with NodeCounter() as collected_nodes:
+            collected(container)
+        legacy_ms = best_ms(legacy, container, repeat)
+        collected_ms = best_ms(collected, container, repeat)
+        print(f'{label:<24} {region:<16} {legacy_ms:9.2f} {collected_ms:9.2f} {legacy_ms / collected_ms:7.2f}x '
+              f'{legacy_nodes.visits:10d} {collected_nodes.visits:10d}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 5000], help='Synthetic table sizes')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed runs per case (the fastest is reported)')
+    args = parser.parse_args()
+
+    print(f"{'case':<24} {'region':<16} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'old nodes':>10} {'new nodes':>10}")
+    with gzip.open(CORPUS_PAGE, 'rb') as f:
+        compare('large-attribute-table', parse_html(f.read()), args.repeat)
+    for rows in args.rows:
+        compare(f'synthetic {rows} rows', parse_html(synthetic_page(rows)), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Variation family benchmark: a family's children scraped one by one vs as a family
+
+Scrapes every child of the corpus 'variations' page (a parent listing with
+24 children; the stand-in serves each child its family's page) from the
+stand-in server, with the children listed in the input in a shuffled order
+plus --duplicates repeats, twice per --fields projection: as plain ASINs,
+and with Scraper(variations=True). Reports records, requests sent, wall
+time, decoded bytes and parse + extract time per record, and for the
+family mode which fields it ended up fetching per child.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/bench_variations.py
+    python benchmarks/bench_variations.py --fields price --fields attributes,bullet_points --bandwidth 500000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+from bench_extract import load_corpus
+from standin import FaultConfig, StandInServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import PRODUCT_FIELDS, Scraper, select_fields  # noqa: E402
+from amazon_scraper.embedded import extract_variation_family  # noqa: E402
+
+
+def run(server, asins, fields, variations, args):
+    """:return: (results, wall seconds, requests, family stats)"""
+    scraper = Scraper(base_url=server.url, concurrency=args.concurrency, fields=fields, variations=variations,
+                      trace=True)
+    server.reset_stats()
+    started = time.perf_counter()
+    results = list(scraper.iter_results(asins))
+    wall = time.perf_counter() - started
+    scraper.session.close()
+    return results, wall, sum(server.stats().values()), scraper.family_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fields', action='append',
+                        help="Projection(s) to run, e.g. price or title,price; 'all' for every field "
+                             "(default: all and attributes,bullet_points)")
+    parser.add_argument('--listed', type=int, default=12, help='Children of the family listed in the input')
+    parser.add_argument('--duplicates', type=int, default=4, help='Listed children repeated further down the input')
+    parser.add_argument('--concurrency', type=int, default=4, help='Scraper concurrency')
+    parser.add_argument('--bandwidth', type=int, default=2_000_000, help='Stand-in throughput cap in bytes/sec')
+    parser.add_argument('--latency', type=float, default=0.02, help='Stand-in latency in seconds')
+    args = parser.parse_args()
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    manifest, pages = load_corpus()
+    page = next(page for page in manifest['pages'] if page['name'] == 'variations')
+    family = extract_variation_family(pages['variations'], page['content_type'])
+    children = list(family.children)
+    rng = random.Random(0)
+    listed = rng.sample(children, min(args.listed, len(children)))
+    asins = listed + rng.sample(listed, min(args.duplicates, len(listed)))
+    projections = [PRODUCT_FIELDS if value == 'all' else select_fields(value)
+                   for value in args.fields or ('all', 'attributes,bullet_points')]
+
+    server = StandInServer(faults=FaultConfig(latency=args.latency, bandwidth=args.bandwidth)).start()
+    print(f"Stand-in on {server.url}: family {family.parent_asin} with {len(children)} children, "
+          f"{len(asins)} input ASINs ({len(listed)} distinct), {args.bandwidth / 1024:.0f} KiB/s per response")
+    print(f"{'fields':<36} {'mode':<10} {'records':>8} {'requests':>9} {'wall s':>7} {'KiB/rec':>8} "
+          f"{'parse ms/rec':>13}  fetched per child")
+    for projection in projections:
+        for label, variations in (('plain', False), ('family', True)):
+            results, wall, requests, family_stats = run(server, asins, projection, variations, args)
+            records = [result for result in results if result.ok]
+            count = max(1, len(records))
+            parse_ms = sum(result.trace.parse_ms + result.trace.extract_ms for result in results if result.trace)
+            fetched = '-'
+            if family_stats:
+                fetched = ','.join(next(iter(family_stats.values()))['fetched_fields']) or 'nothing'
+            print(f"{','.join(projection):<36} {label:<10} {len(records):8d} {requests:9d} {wall:7.2f} "
+                  f"{sum(result.bytes_received for result in results) / count / 1024:8.0f} "
+                  f"{parse_ms / count:13.2f}  {fetched}")
+    print("family mode also returns the family's unlisted children; plain scrapes every input line, repeats included")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+"""
+Generate the benchmark corpus of saved product pages
+
+Pages are synthesized to mirror the structure of amazon.in product pages:
+inline script/style bulk, a large navigation menu, the #productTitle /
+.a-price / #feature-bullets / #prodDetails regions the scraper reads, twister
+(variation) and buying-option JSON blobs, review and carousel sections.
+Variants cover different sizes, the detail-bullets layout, missing regions
+and the robot-check interstitial. listing_page() renders search results
+pages in the same style; the stand-in server builds those on request from
+the corpus records rather than saving them.
+
+Output is deterministic for a given version: pages are written gzipped to
+corpus/<version>/ with a manifest.json recording each page's ASIN, HTTP
+Content-Type and the record the current extractor produces for it.
+Regenerate (and bump CORPUS_VERSION) only when the corpus itself changes:
+
+    python benchmarks/corpus/generate.py
+"""
+import gzip
+import json
+import os
+import random
+import sys
+from html import escape
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..'))
+
+CORPUS_VERSION = 'v1'
+
+WORDS = (
+    'steel safe digital electronic locker home office motorized locking mechanism light grey '
+    'premium durable compact portable wireless bluetooth stainless kitchen storage organizer '
+    'cotton pack of 2 cushion cover ergonomic adjustable rechargeable waterproof lightweight '
+    'heavy duty multipurpose anti slip quick dry eco friendly large capacity everyday travel'
+).split()
+
+ATTRIBUTE_POOL = [
+    ('Material Type', ['Alloy Steel', 'Stainless Steel', 'Plastic', 'Cotton', 'Aluminium']),
+    ('Colour', ['Grey', 'Black', 'Light Grey', 'Blue', 'Red', 'White']),
+    ('Mounting Type', ['Wall Mount', 'Floor Mount', 'Tabletop']),
+    ('Water Resistance Level', ['Not Water Resistant', 'Water Resistant', 'Waterproof']),
+    ('Lock Type', ['Electronic, Key', 'Key', 'Combination']),
+    ('Control Type', ['Touchpad Control', 'Button Control', 'App Control']),
+    ('Brand Name', ['Godrej Security Solutions', 'Amazon Basics', 'Solimo', 'Prestige']),
+    ('Model Number', None),
+    ('Item Weight', ['9000 Grams', '1.5 Kilograms', '750 g', '2 Pounds']),
+    ('Item Dimensions D x W x H', ['35D x 25W x 25H Centimeters', '10 x 5 x 3 cm', '12 x 8 x 2 inches']),
+    ('Capacity', ['15 litres', '1 litres', '500 Millilitres']),
+    ('Included Components', ['1 Safe, 4 Grouting/Anchoring fasteners, 1 Mechanical override Key, 1 User Manual',
+                             '1 Unit, 1 Manual', '2 Covers']),
+    ('Manufacturer', ['Godrej & Boyce Mfg. Co. Ltd.', 'Amazon Retail India', 'TTK Prestige Ltd']),
+    ('Country of Origin', ['India', 'China', 'Vietnam']),
+    ('Special Feature', ['Motorized Locking', 'Rechargeable', 'Portable', 'Lightweight']),
+    ('Number of Items', ['1', '2', '4']),
+    ('Warranty Description', ['2 Years Manufacturer Warranty', '1 Year Warranty']),
+]
+
+
+def words(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def script_bulk(rng, count):
+    """Inline scripts similar in volume to Amazon's page bootstrap code"""
+    blocks = []
+    for i in range(count):
+        body = ';'.join(
+            f"P.when('A','ready').execute(function(A){{var n{i}_{j}=A.$('#nav-{rng.randint(0, 999)}');"
+            f"n{i}_{j}.data('x','{words(rng, 3, 8)}');}})"
+            for j in range(rng.randint(5, 15))
+        )
+        blocks.append(f'<script type="text/javascript">\n{body}\n</script>')
+    return '\n'.join(blocks)
+
+
+def style_bulk(rng, count):
+    rules = '\n'.join(
+        f".a-c{rng.randint(0, 99999)}{{margin:{rng.randint(0, 20)}px;color:#{rng.randint(0, 0xffffff):06x}}}"
+        for _ in range(count)
+    )
+    return f'<style type="text/css">\n{rules}\n</style>'
+
+
+def nav_menu(rng, links):
+    items = '\n'.join(
+        f'<li><a href="/s?k={rng.randint(0, 10**6)}" class="hmenu-item"><div>{escape(words(rng, 1, 4))}</div></a></li>'
+        for _ in range(links)
+    )
+    return f'<div id="nav-main"><ul class="hmenu hmenu-visible">\n{items}\n</ul></div>'
+
+
+def price_block(price):
+    whole, _, fraction = f"{price:,.2f}".partition('.')
+    return (
+        '<div id="corePrice_feature_div" class="celwidget">\n'
+        '  <span class="a-price aok-align-center reinventPricePriceToPayMargin priceToPay">\n'
+        f'    <span class="a-offscreen">₹{whole}.{fraction}</span>\n'
+        '    <span aria-hidden="true"><span class="a-price-symbol">₹</span>'
+        f'<span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span>'
+        f'<span class="a-price-fraction">{fraction}</span></span>\n'
+        '  </span>\n</div>'
+    )
+
+
+def feature_bullets(bullets):
+    items = '\n'.join(
+        f'  <li class="a-spacing-mini"><span class="a-list-item">\n      {escape(text)}\n    </span></li>'
+        for text in bullets
+    )
+    # Amazon keeps a hidden, empty expander item in the list
+    return (
+        '<div id="feature-bullets" class="a-section a-spacing-medium a-spacing-top-small">\n'
+        '<ul class="a-unordered-list a-vertical a-spacing-mini">\n'
+        f'{items}\n  <li class="aok-hidden"><span class="a-list-item"> </span></li>\n</ul>\n</div>'
+    )
+
+
+def prod_details(rng, asin, attributes, rating, rating_count, ranks):
+    rows = '\n'.join(
+        f'<tr><th class="a-color-secondary a-size-base prodDetSectionEntry"> {escape(key)} </th>'
+        f'<td class="a-size-base prodDetAttrValue"> ‎{escape(value)} </td></tr>'
+        for key, value in attributes
+    )
+    reviews = (
+        '<tr><th class="a-color-secondary a-size-base prodDetSectionEntry"> Customer Reviews </th><td>\n'
+        '<div id="averageCustomerReviews" data-asin="{asin}"><span class="a-declarative">'
+        f'<span id="acrPopover" title="{rating} out of 5 stars"><span class="a-size-base a-color-base">{rating}</span>'
+        f'<i class="a-icon a-icon-star a-star-4"><span class="a-icon-alt">{rating} out of 5 stars</span></i></span>'
+        f'</span><span id="acrCustomerReviewText" class="a-size-base">{rating_count:,} ratings</span>\n'
+        '<script type="text/javascript">P.when(\'A\', \'ready\').execute(function(A) { A.declarative(\'acrLink-click-metrics\'); });</script>'
+        f'<br> {rating} out of 5 stars </div></td></tr>'
+    ).replace('{asin}', asin)
+    rank_items = ''
+    for i, (rank, category) in enumerate(ranks):
+        see_top = f'(<a href="/gp/bestsellers/">See Top 100 in {escape(category)}</a>)' if i == 0 else ''
+        rank_items += f'<span>#{rank:,} in {escape(category)} {see_top}</span><br>'
+
+    bsr = (
+        '<tr><th class="a-color-secondary a-size-base prodDetSectionEntry"> Best Sellers Rank </th>'
+        f'<td><span>{rank_items}</span></td></tr>'
+    )
+    return (
+        '<div id="prodDetails" class="a-section">\n'
+        '<div class="a-column a-span6"><table id="productDetails_techSpec_section_1" '
+        f'class="a-keyvalue prodDetTable" role="presentation">\n{rows}\n</table></div>\n'
+        '<div class="a-column a-span6 a-span-last"><table id="productDetails_detailBullets_sections1" '
+        'class="a-keyvalue prodDetTable" role="presentation">\n'
+        f'<tr><th class="a-color-secondary a-size-base prodDetSectionEntry"> ASIN </th><td class="a-size-base prodDetAttrValue"> {asin} </td></tr>\n'
+        f'{reviews}\n{bsr}\n</table></div>\n</div>'
+    )
+
+
+def detail_bullets(asin, attributes):
+    items = '\n'.join(
+        f'<li><span class="a-list-item"><span class="a-text-bold">{escape(key)} ‏ : ‎</span>'
+        f'<span>{escape(value)}</span></span></li>'
+        for key, value in attributes + [('ASIN', asin)]
+    )
+    return f'<div id="detailBullets_feature_div"><ul class="a-unordered-list a-nostyle a-vertical">\n{items}\n</ul></div>'
+
+
+def twister(asin, children, dimension, price):
+    display = {child: [value] for child, value in children}
+    variation_values = {dimension: [value for _, value in children]}
+    data = {
+        'currentAsin': asin,
+        'parentAsin': 'P' + asin[1:],
+        'dimensions': [dimension],
+        'dimensionsDisplay': [dimension.replace('_name', '').title()],
+        'dimensionValuesDisplayData': display,
+        'variationValues': variation_values,
+        'asinVariationValues': {child: {dimension: str(i)} for i, (child, _) in enumerate(children)},
+    }
+    buying = [{
+        'displayPrice': f"₹{price:,.2f}",
+        'priceAmount': price,
+        'currencySymbol': '₹',
+        'integerValue': f"{int(price):,}",
+        'decimalSeparator': '.',
+        'fractionalValue': f"{round(price % 1 * 100):02d}",
+        'offerListingId': f"OL{asin}",
+        'buyingOptionType': 'NEW',
+    }]
+    return (
+        '<script type="text/javascript">\n'
+        "P.register('twister-js-init-dpx-data', function() {\n"
+        f"    var dataToReturn = {json.dumps(data, ensure_ascii=False)};\n"
+        '    return dataToReturn;\n});\n</script>\n'
+        '<div class="a-section aok-hidden twister-plus-buying-options-price-data">'
+        f"{escape(json.dumps(buying, ensure_ascii=False), quote=False)}</div>"
+    )
+
+
+def reviews(rng, count):
+    return '\n'.join(
+        f'<div id="R{rng.randint(10**9, 10**10)}" data-hook="review" class="a-section review aok-relative">'
+        f'<div class="a-profile-content"><span class="a-profile-name">{escape(words(rng, 1, 2))}</span></div>'
+        f'<i data-hook="review-star-rating" class="a-icon a-icon-star a-star-{rng.randint(1, 5)}">'
+        f'<span class="a-icon-alt">{rng.randint(1, 5)}.0 out of 5 stars</span></i>'
+        f'<span data-hook="review-title"><span>{escape(words(rng, 3, 8))}</span></span>'
+        f'<div data-hook="review-collapsed"><span>{escape(words(rng, 40, 120))}</span></div></div>'
+        for _ in range(count)
+    )
+
+
+def carousel(rng, cards):
+    items = '\n'.join(
+        f'<li class="a-carousel-card"><div class="p13n-sc-uncoverable-faceout">'
+        f'<a href="/dp/B0{rng.randint(10**7, 10**8 - 1)}"><img alt="{escape(words(rng, 4, 10))}" src="/i/{i}.jpg">'
+        f'<div class="p13n-sc-truncate">{escape(words(rng, 6, 14))}</div></a>'
+        f'<span class="a-price"><span class="a-price-symbol">₹</span>'
+        f'<span class="a-price-whole">{rng.randint(100, 9999):,}</span></span></div></li>'
+        for i in range(cards)
+    )
+    return f'<div class="a-carousel-viewport"><ol class="a-carousel">\n{items}\n</ol></div>'
+
+
+def product_page(rng, asin, *, scale=1, attribute_rows=None, layout='prodDetails',
+                 include_price=True, include_bullets=True, variations=0, meta_charset=True):
+    title = f"{words(rng, 6, 14).title()} ({rng.choice(['Light Grey', 'Black', 'Blue'])})"
+    price = round(rng.uniform(199, 49999), 2) if include_price else None
+    bullets = [f"{words(rng, 2, 4).title()} - {words(rng, 15, 40)}" for _ in range(rng.randint(4, 7))]
+
+    pool = list(ATTRIBUTE_POOL)
+    rng.shuffle(pool)
+    attributes = []
+    target_rows = attribute_rows or rng.randint(10, len(pool))
+    for index in range(target_rows):
+        key, values = pool[index % len(pool)]
+        if index >= len(pool):
+            key = f"{key} {index // len(pool) + 1}"
+        value = rng.choice(values) if values else f"{words(rng, 1, 2).title()} {rng.randint(100, 999)}"
+        attributes.append((key, value))
+
+    dimension = 'color_name'
+    children = [(asin if i == 0 else f"B0V{rng.randint(10**6, 10**7 - 1)}", f"{rng.choice(WORDS).title()} {i}")
+                for i in range(variations)]
+
+    head = [
+        '<!doctype html><html lang="en-in" class="a-no-js" data-19ax5a9jf="dingo"><head>',
+        '<meta charset="utf-8">' if meta_charset else '',
+        f'<title>{escape(title)} : Amazon.in: Home Improvement</title>',
+        style_bulk(rng, 80 * scale),
+        script_bulk(rng, 30 * scale),
+        '</head><body>',
+    ]
+    center = [
+        nav_menu(rng, 150 * scale),
+        '<div id="dp" class="home-improvement en_IN"><div id="dp-container" class="a-container">',
+        '<div id="centerCol" class="centerColAlign">',
+        '<div id="titleSection" class="a-section a-spacing-none"><h1 id="title" class="a-size-large a-spacing-none">',
+        f'<span id="productTitle" class="a-size-large product-title-word-break">        {escape(title)}       </span>',
+        '</h1></div>',
+        price_block(price) if include_price else '<div id="availability"><span>Currently unavailable.</span></div>',
+        twister(asin, children, dimension, price or 0.0) if variations else '',
+        feature_bullets(bullets) if include_bullets else '',
+        '</div>',
+        script_bulk(rng, 10 * scale),
+        carousel(rng, 20 * scale),
+    ]
+    if layout == 'prodDetails':
+        rating = round(rng.uniform(3.0, 4.9), 1)
+        ranks = [(rng.randint(100, 50000), 'Home Improvement'), (rng.randint(1, 99), 'Hotel Safes')]
+        center.append(prod_details(rng, asin, attributes, rating, rng.randint(10, 20000), ranks))
+    else:
+        center.append(detail_bullets(asin, attributes))
+    center += [
+        carousel(rng, 20 * scale),
+        f'<div id="cm-cr-dp-review-list">{reviews(rng, 8 * scale)}</div>',
+        script_bulk(rng, 20 * scale),
+        '</div></div></body></html>',
+    ]
+    return '\n'.join(head + center)
+
+
+def search_card(asin, index, title, whole, rating, rating_count, sponsored):
+    """One s-search-result card; whole is the price without symbol or fraction, None when unavailable"""
+    if whole is None:
+        price = '<div class="a-row a-size-base a-color-secondary"><span>Currently unavailable.</span></div>'
+    else:
+        price = (
+            f'<a class="a-link-normal s-no-hover s-underline-text a-text-normal" href="/dp/{asin}/ref=sr_1_{index}">'
+            f'<span class="a-price" data-a-size="xl" data-a-color="base"><span class="a-offscreen">₹{whole}.00</span>'
+            '<span aria-hidden="true"><span class="a-price-symbol">₹</span>'
+            f'<span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span>'
+            '<span class="a-price-fraction">00</span></span></span>'
+            '<span class="a-letter-space"></span>'
+            f'<span class="a-price a-text-price" data-a-size="b" data-a-strike="true" data-a-color="secondary">'
+            f'<span class="a-offscreen">M.R.P.: ₹{whole}9.00</span><span aria-hidden="true">₹{whole}9</span></span></a>'
+        )
+    label = '<span class="puis-label-popover-default"><span class="a-color-secondary">Sponsored</span></span>'
+    return (
+        f'<div data-asin="{asin}" data-index="{index}" data-uuid="{asin}-{index}" data-component-type="s-search-result" '
+        f'class="sg-col-4-of-24 sg-col-4-of-12 s-result-item s-asin sg-col-4-of-16 sg-col s-widget-spacing-small '
+        f'sg-col-4-of-20{" AdHolder" if sponsored else ""}"><div class="sg-col-inner"><div class="s-widget-container">'
+        '<div class="puis-card-container s-card-container"><div class="a-section a-spacing-base">'
+        f'<span data-component-type="s-product-image"><a class="a-link-normal s-no-outline" href="/dp/{asin}/ref=sr_1_{index}">'
+        f'<div class="a-section aok-relative s-image-square-aspect"><img class="s-image" src="/i/{asin}._AC_UL320_.jpg" '
+        f'srcset="/i/{asin}._AC_UL320_.jpg 1x, /i/{asin}._AC_UL480_.jpg 1.5x, /i/{asin}._AC_UL640_.jpg 2x" '
+        f'alt="{escape(title)}"></div></a></span>'
+        f'<div class="a-section a-spacing-small puis-padding-left-small puis-padding-right-small">{label if sponsored else ""}'
+        '<div data-cy="title-recipe" class="a-section a-spacing-none a-spacing-top-small s-title-instructions-style">'
+        '<h2 class="a-size-mini a-spacing-none a-color-base s-line-clamp-4">'
+        f'<a class="a-link-normal s-underline-text s-link-style a-text-normal" href="/dp/{asin}/ref=sr_1_{index}">'
+        f'<span class="a-size-base-plus a-color-base a-text-normal">{escape(title)}</span></a></h2></div>'
+        '<div data-cy="reviews-block" class="a-section a-spacing-none a-spacing-top-micro"><div class="a-row a-size-small">'
+        f'<span aria-label="{rating} out of 5 stars"><i class="a-icon a-icon-star-small a-star-small-4-5 aok-align-bottom">'
+        f'<span class="a-icon-alt">{rating} out of 5 stars</span></i></span>'
+        f'<span aria-label="{rating_count:,} ratings"><a class="a-link-normal s-underline-text" '
+        f'href="/dp/{asin}#customerReviews"><span class="a-size-base s-underline-text">{rating_count:,}</span></a></span>'
+        f'</div></div><div data-cy="price-recipe" class="a-section a-spacing-none a-spacing-top-small">{price}</div>'
+        '<div data-cy="delivery-recipe" class="a-section a-spacing-none a-spacing-top-micro"><div class="a-row a-size-base '
+        'a-color-secondary s-align-children-center"><span aria-label="FREE delivery Sat, 12 Oct">FREE delivery '
+        '<span class="a-color-base a-text-bold">Sat, 12 Oct</span></span></div></div>'
+        '</div></div></div></div></div></div>'
+    )
+
+
+def listing_page(rng, query, page, pages, cards, scale=2):
+    """
+    A search results page: the layout's script/style bulk and navigation,
+    the cards and the pagination strip
+
+    :param cards: (asin, title, price whole or None, rating, rating_count, sponsored) per card
+    """
+    strip = []
+    if page > 1:
+        strip.append(f'<a href="/s?k={escape(query)}&amp;page={page - 1}&amp;ref=sr_pg_{page}" '
+                     'class="s-pagination-item s-pagination-previous s-pagination-button">Previous</a>')
+    strip += [f'<a href="/s?k={escape(query)}&amp;page={number}&amp;ref=sr_pg_{page}" class="s-pagination-item '
+              f's-pagination-button">{number}</a>' if number != page else
+              f'<span class="s-pagination-item s-pagination-selected">{number}</span>' for number in range(1, pages + 1)]
+    if page < pages:
+        strip.append(f'<a href="/s?k={escape(query)}&amp;page={page + 1}&amp;ref=sr_pg_{page}" class="s-pagination-item '
+                     's-pagination-next s-pagination-button s-pagination-separator">Next</a>')
+    else:
+        strip.append('<span class="s-pagination-item s-pagination-next s-pagination-disabled">Next</span>')
+    results = '\n'.join(search_card(asin, index, *rest) for index, (asin, *rest) in enumerate(cards, 1))
+    return '\n'.join([
+        '<!doctype html><html lang="en-in" class="a-no-js"><head><meta charset="utf-8">',
+        f'<title>Amazon.in : {escape(query)}</title>',
+        style_bulk(rng, 80 * scale),
+        script_bulk(rng, 30 * scale),
+        '</head><body>',
+        nav_menu(rng, 150 * scale),
+        '<div id="search"><div class="s-desktop-width-max s-desktop-content s-opposite-dir sg-row">',
+        f'<div class="s-main-slot s-result-list s-search-results sg-row">\n{results}\n</div>',
+        f'<div role="navigation" class="a-section a-spacing-none s-pagination-container">'
+        f'<span class="s-pagination-strip">{"".join(strip)}</span></div>',
+        script_bulk(rng, 20 * scale),
+        '</div></div></body></html>',
+    ])
+
+
+def robot_check_page():
+    return (
+        '<!doctype html><html class="a-no-js" lang="en-us"><head><meta charset="utf-8">'
+        '<title dir="ltr">Amazon.in</title></head><body><div class="a-container a-padding-double-large">'
+        '<div class="a-row a-spacing-double-large"><h4>Enter the characters you see below</h4>'
+        "<p class=\"a-last\">Sorry, we just need to make sure you're not a robot. For best results, please make sure "
+        'your browser is accepting cookies.</p>'
+        '<form method="get" action="/errors/validateCaptcha" name="">'
+        '<input type=hidden name="amzn" value="x7yQ2w=="/><img src="https://images-na.ssl-images-amazon.com/captcha/abc/Captcha_xyz.jpg">'
+        '<input autocomplete="off" placeholder="Type characters" name="field-keywords" type="text">'
+        '<button type="submit" class="a-button-text">Continue shopping</button></form></div></div></body></html>'
+    )
+
+
+# (name, asin, description, page builder kwargs or 'robot-check')
+PAGES = [
+    ('standard-small', 'B0CORP0001', 'Standard layout, light page', dict(scale=1)),
+    ('standard-medium', 'B0CORP0002', 'Standard layout, typical page weight', dict(scale=4)),
+    ('standard-large', 'B0CORP0003', 'Standard layout, heavy page', dict(scale=12)),
+    ('large-attribute-table', 'B0CORP0004', '150-row #prodDetails table', dict(scale=4, attribute_rows=150)),
+    ('variations', 'B0CORP0005', 'Variation parent data with 24 children', dict(scale=4, variations=24)),
+    ('detail-bullets-layout', 'B0CORP0006', 'Attributes in #detailBullets instead of #prodDetails',
+     dict(scale=4, layout='detailBullets')),
+    ('missing-regions', 'B0CORP0007', 'Unavailable product: no price, no bullets',
+     dict(scale=2, include_price=False, include_bullets=False)),
+    ('no-meta-charset', 'B0CORP0008', 'Charset only in the Content-Type header', dict(scale=4, meta_charset=False)),
+    ('robot-check', 'B0CORP0009', 'Robot check / captcha interstitial', 'robot-check'),
+]
+
+
+def main():
+    from amazon_scraper.parse import extract_product_fields, parse_html
+    from amazon_scraper.normalize import build_product_record
+
+    out_dir = os.path.join(HERE, CORPUS_VERSION)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {'version': CORPUS_VERSION, 'pages': []}
+    for index, (name, asin, description, options) in enumerate(PAGES):
+        rng = random.Random(f"{CORPUS_VERSION}-{index}")
+        html = robot_check_page() if options == 'robot-check' else product_page(rng, asin, **options)
+        content = html.encode('utf-8')
+        filename = f"{name}.html.gz"
+        with gzip.GzipFile(os.path.join(out_dir, filename), 'wb', mtime=0) as f:
+            f.write(content)
+        expected = build_product_record(asin, extract_product_fields(parse_html(content)))
+        manifest['pages'].append({
+            'name': name,
+            'asin': asin,
+            'file': filename,
+            'description': description,
+            'kind': 'robot-check' if options == 'robot-check' else 'product',
+            'content_type': 'text/html;charset=UTF-8',
+            'bytes': len(content),
+            'expected': expected,
+        })
+        print(f"{name:<24} {len(content) / 1024:8.1f} KB")
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
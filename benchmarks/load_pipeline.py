@@ -0,0 +1,103 @@
+"""
+End-to-end load test of the scrape pipeline against the local stand-in
+
+Starts benchmarks/standin.py in-process (or uses one already running, given
+with --upstream), scrapes a stream of ASINs through amazon_scraper.Scraper
+and reports throughput, per-ASIN latency percentiles, result statuses and
+how they line up with the faults the stand-in injected.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/load_pipeline.py --asins 1000 --concurrency 16 --latency 0.05
+    python benchmarks/load_pipeline.py --error-rate 0.05 --captcha-rate 0.02 --burst-every 5 --burst-length 0.5
+    python benchmarks/load_pipeline.py --upstream http://127.0.0.1:8081
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+import requests
+
+from loadtest import percentile
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from amazon_scraper import Scraper  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--asins', type=int, default=500, help='Number of ASINs to scrape')
+    parser.add_argument('--concurrency', type=int, default=16, help='Scraper concurrency')
+    parser.add_argument('--normalize', action='store_true', help='Also normalize attributes')
+    parser.add_argument('--upstream', help='Base URL of a running stand-in; default starts one in-process')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    # Injected faults are expected; per-ASIN error logs would swamp the report
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    if args.upstream:
+        upstream_url = args.upstream.rstrip('/')
+        server = None
+        stats_before = requests.get(f'{upstream_url}/__stats').json()
+    else:
+        server = StandInServer(faults=faults_from_args(args)).start()
+        upstream_url = server.url
+        stats_before = {}
+    print(f'Stand-in Amazon server on {upstream_url}')
+
+    asins = [f'B0LOAD{i:05d}' for i in range(args.asins)]
+    scraper = Scraper(base_url=upstream_url, concurrency=args.concurrency, normalize=args.normalize)
+
+    statuses = Counter()
+    latencies = []
+    untitled = 0
+    bytes_received = 0
+    wire_bytes = 0
+    started = time.perf_counter()
+    for result in scraper.iter_results(asins):
+        statuses[result.status] += 1
+        latencies.append(result.elapsed)
+        bytes_received += result.bytes_received
+        wire_bytes += result.wire_bytes
+        if result.ok and result.record.get('title') in (None, '', 'Title not found'):
+            untitled += 1
+    wall = time.perf_counter() - started
+
+    if server is not None:
+        stats_after = server.stats()
+    else:
+        stats_after = requests.get(f'{upstream_url}/__stats').json()
+    served = Counter(stats_after)
+    served.subtract(stats_before)
+
+    print(f'ASINs:         {args.asins}')
+    print(f'Concurrency:   {args.concurrency}')
+    print(f'Wall time:     {wall:.2f}s')
+    print(f'ASINs/sec:     {args.asins / wall:.1f}')
+    print(f'Received:      {wire_bytes / 1e6:.1f} MB on the wire, {bytes_received / 1e6:.1f} MB decoded')
+    for pct in (50, 90, 99):
+        print(f'Latency p{pct}:   {percentile(latencies, pct) * 1000:.1f} ms')
+    print(f'Latency max:   {max(latencies) * 1000:.1f} ms')
+
+    print('\nStand-in responses:')
+    for kind, count in sorted(served.items()):
+        print(f'  {kind:<12} {count}')
+    print('Scraper results:')
+    for status, count in sorted(statuses.items()):
+        print(f'  {status:<12} {count}')
+
+    injected_errors = served['error'] + served['burst_503']
+    reported_errors = sum(count for status, count in statuses.items() if status not in ('ok', 'blocked'))
+    print('\nError handling:')
+    print(f'  injected HTTP errors {injected_errors}, reported as failures {reported_errors}')
+    print(f'  robot-check pages served {served["captcha"]}, reported as blocked {statuses["blocked"]}, '
+          f'ok results without a title {untitled}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Load test for the /scrape/manual endpoint
+
+Starts the local stand-in for amazon.in (benchmarks/standin.py) serving
+the page corpus, serves the Flask app against it (in-process, or an already running server
+given with --target), then fires concurrent /scrape/manual requests and
+reports throughput and latency percentiles.
+
+Usage (from the repository root, inside the scraper virtual environment):
+
+    python benchmarks/loadtest.py --requests 500 --concurrency 32
+    python benchmarks/loadtest.py --error-rate 0.05 --burst-every 10 --burst-length 1
+    python benchmarks/loadtest.py --target http://127.0.0.1:8000 --upstream-port 8081
+
+When using --target, start the server with SCRAPER_AMAZON_BASE_URL pointing
+at the stand-in, e.g. SCRAPER_AMAZON_BASE_URL=http://127.0.0.1:8081.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+from standin import StandInServer, add_fault_arguments, faults_from_args
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+def start_server(server) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a sample list
+
+    :param samples: Latency samples
+    :param pct: Percentile in the range 0-100
+    :return: Sample at the requested percentile
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200, help='Total /scrape/manual requests to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+    parser.add_argument('--asins-per-request', type=int, default=3, help='ASINs in each request body')
+    parser.add_argument('--upstream-port', type=int, default=0, help='Stand-in port (0 picks a free one)')
+    parser.add_argument('--target', help='Base URL of an already running app; default serves it in-process')
+    add_fault_arguments(parser)
+    parser.set_defaults(latency=0.05)
+    args = parser.parse_args()
+    # Injected faults are expected; per-ASIN error logs would swamp the report
+    logging.getLogger('amazon_scraper').setLevel(logging.CRITICAL)
+
+    upstream = StandInServer(port=args.upstream_port, faults=faults_from_args(args)).start()
+    upstream_url = upstream.url
+    print(f'Stand-in Amazon server on {upstream_url}')
+
+    target = args.target
+    if not target:
+        from werkzeug.serving import make_server
+        from app import create_app
+
+        flask_app = create_app({'AMAZON_BASE_URL': upstream_url})
+        app_server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        start_server(app_server)
+        target = f'http://127.0.0.1:{app_server.server_port}'
+        print(f'In-process app on {target}')
+
+    body = {'asins': [f'B0LOADTEST{i}' for i in range(args.asins_per_request)]}
+    local = threading.local()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(f'{target}/scrape/manual', json=body)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one_request, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed for elapsed, _ in outcomes]
+    failures = sum(1 for _, ok in outcomes if not ok)
+    print(f'Requests:      {args.requests} ({failures} failed)')
+    print(f'Concurrency:   {args.concurrency}')
+    print(f'Wall time:     {wall:.2f}s')
+    print(f'Requests/sec:  {args.requests / wall:.1f}')
+    print(f'Latency p50:   {percentile(latencies, 50) * 1000:.1f} ms')
+    print(f'Latency p99:   {percentile(latencies, 99) * 1000:.1f} ms')
+    print(f'Upstream:      {upstream.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,436 @@
+"""
+Local stand-in for amazon.in that serves the benchmark page corpus
+
+GET /dp/<asin> answers with a page from benchmarks/corpus/v1: corpus ASINs
+get their own page, the variation children a corpus page's twister data
+names get that page (so a family's siblings share everything but their
+ASIN), any other ASIN a product page picked deterministically from its ASIN.
+GET /s?k=<query>[&page=N] answers with a search results page rendered by
+corpus/generate.py: LISTING_PAGES pages of LISTING_CARDS cards per query,
+each card showing the title and price of the page the stand-in serves for
+its ASIN, two of them sponsored repeats of another page's results. Pages are sent gzip-encoded when the client accepts it.
+Faults can be injected to exercise the scraper's error handling:
+
+    latency / jitter     delay before the response starts (seconds)
+    bandwidth            per-response throughput cap (bytes/sec)
+    error rate / status  fraction of requests answered with an HTTP error
+    503 bursts           answer 503 for the last M seconds of every N
+    captcha rate         fraction of requests answered with the robot-check page
+    handshake            stall before a new connection's first response (seconds)
+    stall rate / stall   fraction of responses held back an extra N seconds (slow tail)
+
+The server also answers absolute-form requests (GET http://host/dp/<asin>),
+so it can be used as an HTTP proxy: several stand-ins with different fault
+settings model egress proxies of differing health (see bench_proxies.py).
+
+GET /__stats returns a JSON count of responses by kind (ok, captcha, error,
+burst_503, not_found, plus how many were stalled) so drivers can compare what was injected with what
+the scraper reported. StandInBehaviour holds all of this apart from the
+HTTP/1.1 server, so standin_h2.py serves the same pages and faults over
+HTTP/2.
+
+Run standalone (from the repository root):
+
+    python benchmarks/standin.py --port 8081 --latency 0.05 --error-rate 0.02 --captcha-rate 0.01
+
+or start it from a load driver with StandInServer(...).start().
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from corpus.generate import listing_page
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(HERE, 'corpus', 'v1')
+
+_DP_PATH = re.compile(r'^/dp/([A-Za-z0-9]+)/?(?:\?.*)?$')
+_LISTING_PATH = re.compile(r'^/s\?(.*)$')
+_WRITE_CHUNK = 16 * 1024
+
+# Search results served per query: pages, and cards per page (two sponsored)
+LISTING_PAGES = 7
+LISTING_CARDS = 24
+_TWISTER_DATA = re.compile(rb"'twister-js-init-dpx-data'.*?dataToReturn\s*=\s*", re.S)
+
+
+@dataclass
+class FaultConfig:
+    """Fault injection settings for the stand-in server"""
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: int = 0
+    error_rate: float = 0.0
+    error_status: int = 500
+    captcha_rate: float = 0.0
+    burst_every: float = 0.0
+    burst_length: float = 0.0
+    handshake: float = 0.0
+    stall_rate: float = 0.0
+    stall: float = 0.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class CorpusPage:
+    name: str
+    kind: str
+    content_type: str
+    gzipped: bytes
+    raw: bytes
+    # The record the extractor produces for the page
+    record: Dict = field(default_factory=dict)
+
+
+def load_pages(corpus_dir: str = CORPUS_DIR) -> Dict[str, CorpusPage]:
+    """
+    :param corpus_dir: Directory holding manifest.json and the gzipped pages
+    :return: Corpus pages keyed by ASIN
+    """
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    pages = {}
+    for entry in manifest['pages']:
+        with open(os.path.join(corpus_dir, entry['file']), 'rb') as f:
+            gzipped = f.read()
+        pages[entry['asin']] = CorpusPage(
+            name=entry['name'],
+            kind=entry['kind'],
+            content_type=entry['content_type'],
+            gzipped=gzipped,
+            raw=gzip.decompress(gzipped),
+            record=entry.get('expected', {}),
+        )
+    return pages
+
+
+def sibling_pages(pages: Dict[str, CorpusPage]) -> Dict[str, CorpusPage]:
+    """
+    :param pages: Corpus pages from load_pages()
+    :return: Variation children named in the pages' twister data, mapped to the page naming them
+    """
+    siblings = {}
+    for page in pages.values():
+        match = _TWISTER_DATA.search(page.raw)
+        if match is not None:
+            data, _ = json.JSONDecoder().raw_decode(page.raw[match.end():].decode('utf-8', 'replace'))
+            for child in data.get('asinVariationValues', {}):
+                siblings.setdefault(child, page)
+    return siblings
+
+
+class StandInResponse(NamedTuple):
+    status: int
+    content_type: str
+    body: bytes
+    headers: Dict[str, str]
+    # Seconds to wait before sending, from the latency/jitter faults
+    delay: float
+
+
+class StandInBehaviour:
+    """
+    Corpus, fault settings and response counts of a stand-in server,
+    independent of the HTTP version it is served over
+    """
+
+    def init_behaviour(self, faults: Optional[FaultConfig], corpus_dir: str):
+        self.faults = faults or FaultConfig()
+        self.pages = load_pages(corpus_dir)
+        self.product_pages = [page for _, page in sorted(self.pages.items()) if page.kind == 'product']
+        self.siblings = sibling_pages(self.pages)
+        self.captcha_page = next(page for page in self.pages.values() if page.kind == 'robot-check')
+        self.started = time.monotonic()
+        self.connections = 0
+        self._random = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._listings: Dict[Tuple[str, int], CorpusPage] = {}
+
+    def respond(self, path: str, accept_encoding: str) -> StandInResponse:
+        """
+        :param path: Request path in origin form (/dp/<asin>)
+        :param accept_encoding: The request's Accept-Encoding header
+        :return: What to send back, and after how long
+        """
+        if path == '/__stats':
+            return StandInResponse(200, 'application/json', json.dumps(self.stats()).encode('utf-8'), {}, 0.0)
+        match = _DP_PATH.match(path)
+        listing = _LISTING_PATH.match(path)
+        if match is None and listing is None:
+            self.count('not_found')
+            return StandInResponse(404, 'text/plain', b'Not Found', {}, 0.0)
+
+        if match is not None:
+            kind, page = self.choose_response(match.group(1))
+        else:
+            query = parse_qs(listing.group(1))
+            search = query.get('k', [''])[0]
+            try:
+                number = int(query.get('page', ['1'])[0])
+            except ValueError:
+                number = 1
+            kind, page = self.choose_response(search)
+            if kind == 'ok':
+                if not search or not 1 <= number <= LISTING_PAGES:
+                    self.count('not_found')
+                    return StandInResponse(404, 'text/plain', b'Not Found', {}, 0.0)
+                page = self.listing_page(search, number)
+        delay = self.response_delay()
+        if kind in ('error', 'burst_503'):
+            status = 503 if kind == 'burst_503' else self.faults.error_status
+            return StandInResponse(status, 'text/html', b'<html><body>Service Unavailable</body></html>',
+                                   {'Retry-After': '1'} if status == 503 else {}, delay)
+        if 'gzip' in accept_encoding:
+            return StandInResponse(200, page.content_type, page.gzipped, {'Content-Encoding': 'gzip'}, delay)
+        return StandInResponse(200, page.content_type, page.raw, {}, delay)
+
+    def page_for(self, asin: str) -> CorpusPage:
+        page = self.pages.get(asin) or self.siblings.get(asin)
+        if page is not None:
+            return page
+        return self.product_pages[zlib.crc32(asin.encode('utf-8')) % len(self.product_pages)]
+
+    def listing_asins(self, query: str, number: int) -> List[str]:
+        """:return: The organic results on page number of a query"""
+        return [f"B0S{zlib.crc32(f'{query}/{number}/{index}'.encode('utf-8')) % 10 ** 7:07d}"
+                for index in range(LISTING_CARDS - 2)]
+
+    def listing_page(self, query: str, number: int) -> CorpusPage:
+        """:return: Results page number of a query, rendered once and kept"""
+        key = (query, number)
+        page = self._listings.get(key)
+        if page is not None:
+            return page
+        rng = random.Random(f"listing-{query}-{number}")
+        sponsored = self.listing_asins(query, number % LISTING_PAGES + 1)[:2]
+        cards = []
+        for index, asin in enumerate(self.listing_asins(query, number)):
+            if index in (1, 9):
+                cards.append(self.listing_card(rng, sponsored.pop(), True))
+            cards.append(self.listing_card(rng, asin, False))
+        raw = listing_page(rng, query, number, LISTING_PAGES, cards).encode('utf-8')
+        page = CorpusPage(name=f'listing-{number}', kind='listing', content_type='text/html;charset=UTF-8',
+                          gzipped=gzip.compress(raw, mtime=0), raw=raw)
+        with self._lock:
+            return self._listings.setdefault(key, page)
+
+    def listing_card(self, rng: random.Random, asin: str, sponsored: bool) -> Tuple:
+        record = self.page_for(asin).record
+        # A price block's whole part ends in the decimal point; a page without
+        # one (unavailable) shows no price on its card
+        price = record.get('price') or ''
+        whole = price[1:-1] if price.endswith('.') else None
+        return (asin, record.get('title', ''), whole, round(rng.uniform(3.0, 4.9), 1), rng.randint(5, 20000),
+                sponsored)
+
+    def in_burst(self) -> bool:
+        faults = self.faults
+        if faults.burst_every <= 0 or faults.burst_length <= 0:
+            return False
+        # Bursts close each period, so a run starts with a healthy upstream
+        phase = (time.monotonic() - self.started) % faults.burst_every
+        return phase >= faults.burst_every - faults.burst_length
+
+    def choose_response(self, asin: str) -> Tuple[str, Optional[CorpusPage]]:
+        """
+        :param asin: Requested ASIN
+        :return: (kind, page) where kind is 'ok', 'captcha', 'error' or 'burst_503'
+        """
+        if self.in_burst():
+            kind, page = 'burst_503', None
+        else:
+            with self._lock:
+                roll = self._random.random()
+            if roll < self.faults.error_rate:
+                kind, page = 'error', None
+            elif roll < self.faults.error_rate + self.faults.captcha_rate:
+                kind, page = 'captcha', self.captcha_page
+            else:
+                page = self.page_for(asin)
+                kind = 'captcha' if page.kind == 'robot-check' else 'ok'
+        self.count(kind)
+        return kind, page
+
+    def response_delay(self) -> float:
+        faults = self.faults
+        if not faults.jitter and not faults.stall_rate:
+            return faults.latency
+        with self._lock:
+            delay = max(0.0, faults.latency + self._random.uniform(-faults.jitter, faults.jitter))
+            if faults.stall_rate and self._random.random() < faults.stall_rate:
+                self._counts['stalled'] += 1
+                delay += faults.stall
+            return delay
+
+    def count(self, kind: str):
+        with self._lock:
+            self._counts[kind] += 1
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+            self.connections = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves corpus pages for /dp/<asin> and /s?k=<query>, applying the server's fault settings"""
+
+    protocol_version = 'HTTP/1.1'
+    server: 'StandInServer'
+
+    def setup(self):
+        super().setup()
+        # A new connection stalls before its first request is read, standing
+        # in for the TLS handshake a real marketplace connection pays
+        if self.server.faults.handshake:
+            time.sleep(self.server.faults.handshake)
+
+    def do_GET(self):
+        path = self.path
+        if not path.startswith('/'):
+            # Absolute-form target: the client is using this server as a proxy
+            parts = urlsplit(path)
+            path = parts.path + (f'?{parts.query}' if parts.query else '')
+        response = self.server.respond(path, self.headers.get('Accept-Encoding', ''))
+        if response.delay:
+            time.sleep(response.delay)
+        self._send(response.status, response.content_type, response.body, response.headers)
+
+    def _send(self, status: int, content_type: str, body: bytes, extra_headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        bandwidth = self.server.faults.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), _WRITE_CHUNK):
+            chunk = body[offset:offset + _WRITE_CHUNK]
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(StandInBehaviour, ThreadingHTTPServer):
+    """
+    Threaded HTTP/1.1 stand-in server; shares corpus, fault settings and
+    response counts between handler threads
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, faults: Optional[FaultConfig] = None, host: str = '127.0.0.1',
+                 corpus_dir: str = CORPUS_DIR):
+        """
+        :param port: Port to listen on (0 picks a free one)
+        :param faults: Fault injection settings; none by default
+        :param host: Interface to bind
+        :param corpus_dir: Corpus to serve
+        """
+        super().__init__((host, port), StandInHandler)
+        self.init_behaviour(faults, corpus_dir)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StandInServer':
+        """Serve from a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def process_request(self, request, client_address):
+        self.connection_opened()
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is routine under load
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """Add the stand-in fault injection options to an argument parser"""
+    group = parser.add_argument_group('stand-in server faults')
+    group.add_argument('--latency', type=float, default=0.0, help='Delay before each response in seconds')
+    group.add_argument('--jitter', type=float, default=0.0, help='Random +/- spread added to --latency')
+    group.add_argument('--bandwidth', type=int, default=0, help='Per-response throughput cap in bytes/sec')
+    group.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    group.add_argument('--error-status', type=int, default=500, help='HTTP status for injected errors')
+    group.add_argument('--captcha-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with the robot-check page')
+    group.add_argument('--burst-every', type=float, default=0.0, help='Seconds between 503 bursts')
+    group.add_argument('--burst-length', type=float, default=0.0, help='Length of each 503 burst in seconds')
+    group.add_argument('--handshake', type=float, default=0.0,
+                       help='Seconds each new connection stalls before serving, like a TLS handshake (HTTP/1.1 only)')
+    group.add_argument('--stall-rate', type=float, default=0.0,
+                       help='Fraction of responses held back an extra --stall seconds (a slow tail)')
+    group.add_argument('--stall', type=float, default=1.0, help='Extra delay of stalled responses in seconds')
+    group.add_argument('--seed', type=int, help='Seed for reproducible fault injection')
+
+
+def faults_from_args(args: argparse.Namespace) -> FaultConfig:
+    return FaultConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        captcha_rate=args.captcha_rate,
+        burst_every=args.burst_every,
+        burst_length=args.burst_length,
+        handshake=args.handshake,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for amazon.in serving the benchmark corpus')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8081, help='Port to listen on')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer(port=args.port, faults=faults_from_args(args), host=args.host)
+    print(f'Stand-in Amazon server on {server.url} with {asdict(server.faults)}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+HTTP/2 variant of the local stand-in Amazon server
+
+Serves the same corpus pages, fault injection and /__stats counts as
+standin.py (through StandInBehaviour), but over cleartext HTTP/2 with prior
+knowledge (h2c), which is what the HTTP/2 transport speaks on http:// URLs.
+Every stream is answered concurrently on one asyncio loop, and the server
+advertises --max-streams as its SETTINGS_MAX_CONCURRENT_STREAMS. The
+--bandwidth fault is not applied: HTTP/2 flow control paces the body.
+
+Needs the h2 package (installed with pip install "httpx[http2]").
+
+Run standalone (from the repository root):
+
+    python benchmarks/standin_h2.py --port 8082 --latency 0.05
+
+or start it from a benchmark with H2StandInServer(...).start().
+"""
+import argparse
+import asyncio
+import threading
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import ConnectionTerminated, RequestReceived, StreamReset, WindowUpdated
+from h2.exceptions import ProtocolError, StreamClosedError
+from h2.settings import SettingCodes
+
+from standin import CORPUS_DIR, FaultConfig, StandInBehaviour, add_fault_arguments, faults_from_args
+
+
+class H2StandInProtocol(asyncio.Protocol):
+    """One HTTP/2 connection: answers each request stream as its own task"""
+
+    def __init__(self, server: 'H2StandInServer'):
+        self.server = server
+        self.conn = H2Connection(config=H2Configuration(client_side=False, header_encoding='utf-8'))
+        self.transport = None
+        # Streams waiting for the peer to open their flow-control window
+        self.window_waiters: Dict[int, asyncio.Event] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connection_opened()
+        self.conn.initiate_connection()
+        self.conn.update_settings({SettingCodes.MAX_CONCURRENT_STREAMS: self.server.max_streams})
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        self.transport = None
+        for event in self.window_waiters.values():
+            event.set()
+
+    def data_received(self, data: bytes):
+        try:
+            events = self.conn.receive_data(data)
+        except ProtocolError:
+            self.flush()
+            self.transport.close()
+            return
+        for event in events:
+            if isinstance(event, RequestReceived):
+                asyncio.get_running_loop().create_task(self.respond(event.stream_id, dict(event.headers)))
+            elif isinstance(event, WindowUpdated):
+                self.window_opened(event.stream_id)
+            elif isinstance(event, StreamReset):
+                self.window_opened(event.stream_id)
+            elif isinstance(event, ConnectionTerminated):
+                self.transport.close()
+        self.flush()
+
+    def flush(self):
+        if self.transport is not None:
+            self.transport.write(self.conn.data_to_send())
+
+    def window_opened(self, stream_id: int):
+        # Stream 0 is the connection window, shared by every stream
+        waiters = self.window_waiters.values() if stream_id == 0 else [self.window_waiters.get(stream_id)]
+        for event in waiters:
+            if event is not None:
+                event.set()
+
+    async def respond(self, stream_id: int, headers: Dict[str, str]):
+        response = self.server.respond(headers.get(':path', '/'), headers.get('accept-encoding', ''))
+        if response.delay:
+            await asyncio.sleep(response.delay)
+        response_headers = [
+            (':status', str(response.status)),
+            ('content-type', response.content_type),
+            ('content-length', str(len(response.body))),
+        ] + [(name.lower(), value) for name, value in response.headers.items()]
+        try:
+            self.conn.send_headers(stream_id, response_headers)
+            self.flush()
+            await self.send_body(stream_id, response.body)
+        except (StreamClosedError, ProtocolError):
+            # The client reset the stream or went away
+            pass
+
+    async def send_body(self, stream_id: int, body: bytes):
+        offset = 0
+        while self.transport is not None:
+            window = self.conn.local_flow_control_window(stream_id)
+            if window < 1 and offset < len(body):
+                event = self.window_waiters[stream_id] = asyncio.Event()
+                await event.wait()
+                del self.window_waiters[stream_id]
+                continue
+            size = min(window, len(body) - offset, self.conn.max_outbound_frame_size)
+            end = offset + size >= len(body)
+            self.conn.send_data(stream_id, body[offset:offset + size], end_stream=end)
+            self.flush()
+            offset += size
+            if end:
+                return
+
+
+class H2StandInServer(StandInBehaviour):
+    """Stand-in server speaking h2c on an asyncio loop in a daemon thread"""
+
+    def __init__(self, port: int = 0, faults: Optional[FaultConfig] = None, host: str = '127.0.0.1',
+                 corpus_dir: str = CORPUS_DIR, max_streams: int = 128):
+        """
+        :param port: Port to listen on (0 picks a free one)
+        :param faults: Fault injection settings; none by default
+        :param host: Interface to bind
+        :param corpus_dir: Corpus to serve
+        :param max_streams: Concurrent streams allowed per connection
+        """
+        self.init_behaviour(faults, corpus_dir)
+        self.host = host
+        self.port = port
+        self.max_streams = max_streams
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def _listen(self):
+        self._server = self._loop.run_until_complete(
+            self._loop.create_server(lambda: H2StandInProtocol(self), self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def start(self) -> 'H2StandInServer':
+        """Listen, serve from a daemon thread and return self"""
+        self._listen()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self._listen()
+        self._loop.run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP/2 (h2c) stand-in for amazon.in serving the benchmark corpus')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8082, help='Port to listen on')
+    parser.add_argument('--max-streams', type=int, default=128, help='Concurrent streams allowed per connection')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = H2StandInServer(port=args.port, faults=faults_from_args(args), host=args.host,
+                             max_streams=args.max_streams)
+    print(f'HTTP/2 stand-in Amazon server on {server.url} with {asdict(server.faults)}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
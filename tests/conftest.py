@@ -0,0 +1,40 @@
+"""
+Shared fixtures for the unit tests
+
+Run from the repository root, inside the scraper virtual environment:
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest  # noqa: E402
+
+
+class FakeClock:
+    """Stand-in for the time module: monotonic() and perf_counter() only move when advanced"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from amazon_scraper import breaker
+from amazon_scraper.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_failure
+from amazon_scraper.deadline import Deadline
+from amazon_scraper.proxies import NoHealthyProxyError
+
+
+@pytest.fixture
+def circuit(clock, monkeypatch):
+    monkeypatch.setattr(breaker, 'time', clock)
+    return CircuitBreaker('www.amazon.in', window=4, min_calls=4, failure_rate=0.5, cooldown=10.0,
+                          max_cooldown=30.0, probes=1, close_after=2)
+
+
+def fetch(circuit, failed):
+    probe = circuit.allow()
+    circuit.report(probe, failed)
+    return probe
+
+
+def trip(circuit):
+    for failed in (False, True, False, True):
+        fetch(circuit, failed)
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize('error, failed', [
+    (requests.exceptions.ReadTimeout(), True),
+    (requests.exceptions.ConnectionError(), True),
+    (http_error(503), True),
+    (http_error(500), True),
+    (http_error(403), True),
+    (http_error(404), False),
+    (CircuitOpenError(), None),
+    (NoHealthyProxyError(), None),
+])
+def test_is_failure(error, failed):
+    assert is_failure(error) is failed
+
+
+def test_needs_min_calls(circuit):
+    for _ in range(3):
+        fetch(circuit, True)
+    assert circuit.state == CLOSED
+
+
+def test_opens_at_the_failure_rate(circuit):
+    trip(circuit)
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit.allow()
+    assert circuit.stats()['rejected'] == 1 and circuit.stats()['open_s'] == 10.0
+
+
+def test_half_open_probes_then_closes(circuit, clock):
+    trip(circuit)
+    clock.advance(10.0)
+    probe = circuit.allow()
+    assert probe and circuit.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        circuit.allow()
+    circuit.report(probe, False)
+    assert circuit.state == HALF_OPEN
+    fetch(circuit, False)
+    assert circuit.state == CLOSED
+    assert not circuit.allow()
+    assert circuit.stats()['recent_calls'] == 0
+
+
+def test_failed_probe_doubles_the_cooldown(circuit, clock):
+    trip(circuit)
+    for open_for in (20.0, 30.0, 30.0):
+        clock.advance(circuit._open_until - clock.now)
+        fetch(circuit, True)
+        assert circuit.state == OPEN and circuit.stats()['open_s'] == open_for
+    clock.advance(30.0)
+    fetch(circuit, False)
+    fetch(circuit, False)
+    assert circuit.state == CLOSED
+    # Closing resets the cooldown
+    trip(circuit)
+    assert circuit.stats()['open_s'] == 10.0
+
+
+def test_neutral_outcomes_are_ignored(circuit, clock):
+    for _ in range(10):
+        fetch(circuit, None)
+    assert circuit.state == CLOSED and circuit.stats()['recent_calls'] == 0
+    trip(circuit)
+    clock.advance(10.0)
+    # A probe that says nothing frees its slot without deciding anything
+    fetch(circuit, None)
+    assert circuit.state == HALF_OPEN
+    assert circuit.allow()
+
+
+def test_late_reports_do_not_reopen(circuit, clock):
+    sent = [circuit.allow() for _ in range(3)]
+    trip(circuit)
+    clock.advance(10.0)
+    probe = circuit.allow()
+    for early in sent:
+        circuit.report(early, True)
+    assert circuit.state == HALF_OPEN
+    circuit.report(probe, False)
+
+
+def test_report_block_replaces_a_success(circuit, clock):
+    for _ in range(2):
+        fetch(circuit, False)
+    fetch(circuit, True)
+    fetch(circuit, False)
+    circuit.report_block()
+    assert circuit.state == OPEN
+    clock.advance(10.0)
+    fetch(circuit, False)
+    circuit.report_block()
+    assert circuit.state == OPEN
+
+
+def test_parked_fetch_goes_through_when_it_recovers():
+    circuit = CircuitBreaker('www.amazon.in', window=2, min_calls=2, cooldown=0.2, max_wait=5.0)
+    fetch(circuit, True)
+    fetch(circuit, True)
+    assert circuit.state == OPEN
+    started = time.monotonic()
+    assert circuit.allow()
+    assert 0.1 < time.monotonic() - started < 2.0
+
+
+def test_parked_fetch_gives_up_at_the_deadline():
+    circuit = CircuitBreaker('www.amazon.in', window=2, min_calls=2, cooldown=60.0, max_wait=60.0)
+    fetch(circuit, True)
+    fetch(circuit, True)
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        circuit.allow(Deadline.after(0.2))
+    assert 0.1 < time.monotonic() - started < 2.0
+
+
+def test_waiting_fetch_wakes_when_the_probe_reports():
+    circuit = CircuitBreaker('www.amazon.in', window=2, min_calls=2, cooldown=0.0, close_after=1, max_wait=5.0)
+    fetch(circuit, True)
+    fetch(circuit, True)
+    probe = circuit.allow()
+    woke = []
+    waiter = threading.Thread(target=lambda: woke.append(circuit.allow()))
+    waiter.start()
+    time.sleep(0.1)
+    assert not woke
+    circuit.report(probe, False)
+    waiter.join(2.0)
+    assert woke == [False] and circuit.state == CLOSED
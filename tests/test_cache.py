@@ -0,0 +1,55 @@
+import os
+import threading
+
+from amazon_scraper.cache import PageCache
+
+URL = 'https://www.amazon.in/dp/B0TEST0001'
+
+
+def test_round_trip_and_discard(tmp_path):
+    cache = PageCache(str(tmp_path))
+    assert cache.get(URL) is None
+    cache.put(URL, b'<html>page</html>')
+    assert cache.get(URL) == b'<html>page</html>'
+    cache.discard(URL)
+    cache.discard(URL)
+    assert cache.get(URL) is None
+
+
+def test_results_pages_differ_by_query(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.put('https://www.amazon.in/s?k=safe', b'1')
+    cache.put('https://www.amazon.in/s?k=safe&page=2', b'2')
+    assert cache.get('https://www.amazon.in/s?k=safe') == b'1'
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60)
+    cache.put(URL, b'page')
+    path = cache.path_for(URL)
+    os.utime(path, (0, 0))
+    assert cache.get(URL) is None
+    assert PageCache(str(tmp_path), ttl=None).get(URL) == b'page'
+
+
+def test_concurrent_puts_of_one_url(tmp_path):
+    cache = PageCache(str(tmp_path))
+    start = threading.Barrier(8)
+    errors = []
+
+    def put(index):
+        start.wait()
+        try:
+            for _ in range(50):
+                cache.put(URL, b'page %d' % index)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cache.get(URL).startswith(b'page ')
+    assert os.listdir(os.path.dirname(cache.path_for(URL))) == [os.path.basename(cache.path_for(URL))]
@@ -0,0 +1,101 @@
+import json
+from html import escape
+
+from amazon_scraper.embedded import extract_embedded_fields, extract_variation_family, find_json_blobs
+
+OFFERS = [
+    {'currencySymbol': '₹', 'integerValue': '1,499', 'decimalSeparator': '.', 'buyingOptionType': 'USED'},
+    {'currencySymbol': '₹', 'integerValue': '1,299', 'decimalSeparator': '.', 'buyingOptionType': 'NEW'},
+]
+TWISTER = {
+    'currentAsin': 'B0CHILD002',
+    'parentAsin': 'B0PARENT01',
+    'dimensions': ['color_name', 'size_name'],
+    'variationValues': {'color_name': ['Black', 'Grey'], 'size_name': ['Small', 'Large']},
+    'asinVariationValues': {
+        'B0CHILD001': {'color_name': '0', 'size_name': '0'},
+        'B0CHILD002': {'color_name': '1', 'size_name': '0'},
+        'B0CHILD003': {'color_name': '1', 'size_name': '1'},
+    },
+}
+
+
+def page(*parts):
+    return ('<html><head><meta charset="utf-8"></head><body>' + ''.join(parts) + '</body></html>').encode('utf-8')
+
+
+def twister(data):
+    return ("<script>P.register('twister-js-init-dpx-data', function() {\n"
+            f"    var dataToReturn = {json.dumps(data)};\n    return dataToReturn;\n}});</script>")
+
+
+def buying_options(offers):
+    return f'<div class="twister-plus-buying-options-price-data">{escape(json.dumps(offers), quote=False)}</div>'
+
+
+def ld_json(value):
+    return f'<script type="application/ld+json">{json.dumps(value)}</script>'
+
+
+def a_state(key, value):
+    return f'<script type="a-state" data-a-state=\'{{"key":"{key}"}}\'>{json.dumps(value)}</script>'
+
+
+def test_finds_each_kind_in_order():
+    content = page(ld_json({'@type': 'Product', 'name': 'Safe'}), a_state('desktop-price', OFFERS[1]),
+                   buying_options(OFFERS), twister(TWISTER))
+    blobs = find_json_blobs(content)
+    assert [blob.kind for blob in blobs] == ['twister', 'buying_options', 'a-state', 'ld+json']
+    assert blobs[2].key == 'desktop-price'
+    assert [blob.kind for blob in find_json_blobs(content, kinds=('ld+json',))] == ['ld+json']
+
+
+def test_skips_malformed_and_truncated_blobs():
+    content = page('<script type="application/ld+json">{"name": </script>', buying_options(OFFERS))
+    assert [blob.kind for blob in find_json_blobs(content)] == ['buying_options']
+    truncated = page(ld_json({'@type': 'Product', 'name': 'Safe'}))
+    cut = truncated[:truncated.index(b'</script')]
+    assert find_json_blobs(cut) == []
+
+
+def test_price_prefers_the_new_offer():
+    assert extract_embedded_fields(page(buying_options(OFFERS))) == {'price': '₹1,299.'}
+    assert extract_embedded_fields(page(a_state('price', {'offers': OFFERS[:1]}))) == {'price': '₹1,499.'}
+
+
+def test_title_from_product_graph():
+    value = {'@graph': [{'@type': 'BreadcrumbList'}, {'@type': ['Product'], 'name': ' Safe &amp; Lock '}]}
+    assert extract_embedded_fields(page(ld_json(value)), fields=('title',)) == {'title': 'Safe & Lock'}
+
+
+def test_only_requested_fields_the_json_has():
+    content = page(buying_options(OFFERS))
+    assert extract_embedded_fields(content) == {'price': '₹1,299.'}
+    assert extract_embedded_fields(content, fields=('attributes',)) == {}
+    assert extract_embedded_fields(content, fields=('title',)) == {}
+
+
+def test_family_from_value_indexes():
+    family = extract_variation_family(page(twister(TWISTER)))
+    assert family.parent_asin == 'B0PARENT01' and family.current_asin == 'B0CHILD002'
+    assert family.dimensions == ['color_name', 'size_name']
+    assert family.children == {
+        'B0CHILD001': {'color_name': 'Black', 'size_name': 'Small'},
+        'B0CHILD002': {'color_name': 'Grey', 'size_name': 'Small'},
+        'B0CHILD003': {'color_name': 'Grey', 'size_name': 'Large'},
+    }
+
+
+def test_family_from_display_data():
+    data = {**TWISTER, 'dimensionValuesDisplayData': {'B0CHILD001': ['Black', 'Small'],
+                                                      'B0CHILD002': ['Grey', 'Small']}}
+    family = extract_variation_family(page(twister(data)))
+    assert family.children == {'B0CHILD001': {'color_name': 'Black', 'size_name': 'Small'},
+                               'B0CHILD002': {'color_name': 'Grey', 'size_name': 'Small'}}
+
+
+def test_no_family_without_siblings():
+    data = {**TWISTER, 'asinVariationValues': {'B0CHILD002': {'color_name': '1', 'size_name': '0'}}}
+    assert extract_variation_family(page(twister(data))) is None
+    assert extract_variation_family(page(twister({**TWISTER, 'parentAsin': ''}))) is None
+    assert extract_variation_family(page(buying_options(OFFERS))) is None
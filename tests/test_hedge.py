@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from standin import FaultConfig, StandInServer  # noqa: E402
+
+from amazon_scraper import build_session, fetch_page  # noqa: E402
+from amazon_scraper.hedge import FetchCancelled, Hedger  # noqa: E402
+from amazon_scraper.scheduler import FetchScheduler  # noqa: E402
+
+
+def hedger(**kwargs):
+    # Every fetch is due a hedge after 20 ms
+    hedger = Hedger(budget=1.0, min_samples=1, min_delay=0.02, **kwargs)
+    hedger.observe(0.0)
+    return hedger
+
+
+def stalled(cancel):
+    if cancel.wait(5):
+        raise FetchCancelled("cancelled")
+    return 'primary'
+
+
+def test_unhedged_fetch_runs_on_the_calling_thread():
+    threads = []
+    hedger(max_hedges=1).run(lambda cancel: threads.append(threading.current_thread()))
+    assert threads == [threading.current_thread()]
+
+
+def test_hedge_wins_and_cancels_the_original():
+    threads = []
+
+    def hedge(cancel):
+        threads.append(threading.current_thread())
+        return 'hedge'
+
+    runner = hedger()
+    start = time.perf_counter()
+    assert runner.run(stalled, hedge_attempt=hedge) == 'hedge'
+    assert time.perf_counter() - start < 1
+    assert threads[0].name.startswith('hedge')
+    assert runner.stats()['won'] == 1
+
+
+def test_hedge_answers_for_a_failed_original():
+    def broken(cancel):
+        time.sleep(0.05)
+        raise ConnectionError("reset")
+
+    runner = hedger()
+    assert runner.run(broken, hedge_attempt=lambda cancel: 'hedge') == 'hedge'
+    with pytest.raises(ConnectionError):
+        runner.run(broken, hedge_attempt=broken)
+    assert runner.stats()['failed'] == 1
+
+
+def test_denied_without_a_slot_refunds_the_budget():
+    runner = hedger()
+    reserved = []
+
+    def reserve():
+        reserved.append(True)
+        return None
+
+    def primary(cancel):
+        time.sleep(0.1)
+        return 'primary'
+
+    assert runner.run(primary, reserve=reserve) == 'primary'
+    assert reserved and runner.stats()['denied'] == 1
+    assert runner._credit == 1.0 and runner._running == 0
+
+
+def test_hedges_in_flight_are_bounded():
+    runner = hedger(max_hedges=1)
+    release = threading.Event()
+
+    def hedge(cancel):
+        release.wait(5)
+        raise FetchCancelled("cancelled")
+
+    def primary(cancel):
+        time.sleep(0.2)
+        return 'primary'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runner.run(primary, hedge_attempt=hedge)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    stats = runner.stats()
+    assert results == ['primary', 'primary']
+    assert stats['lost'] == 1 and stats['denied'] == 1
+
+
+def test_stalled_request_is_aborted_before_its_headers():
+    server = StandInServer(faults=FaultConfig(stall_rate=1.0, stall=5.0)).start()
+    session = build_session()
+    try:
+        url = f'{server.url}/dp/B0CORP0001'
+        runner = hedger()
+        start = time.perf_counter()
+        result = runner.run(lambda cancel: fetch_page(url, session=session, cancel=cancel),
+                            hedge_attempt=lambda cancel: 'hedge')
+        assert result == 'hedge' and time.perf_counter() - start < 2
+    finally:
+        session.close()
+        server.shutdown()
+
+
+def test_scheduler_try_acquire_never_waits():
+    scheduler = FetchScheduler(slots=2, shares={'bulk': 0.5})
+    assert scheduler.try_acquire('bulk')
+    # Over the bulk cap, then out of slots
+    assert not scheduler.try_acquire('bulk')
+    assert scheduler.try_acquire('interactive')
+    assert not scheduler.try_acquire('interactive')
+    scheduler.release('bulk')
+    scheduler.release('interactive')
+    assert scheduler.stats()['bulk'] == {'active': 0, 'waiting': 0, 'limit': 1}
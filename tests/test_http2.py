@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('h2')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import requests  # noqa: E402
+from standin import FaultConfig, StandInServer  # noqa: E402
+from standin_h2 import H2StandInServer  # noqa: E402
+
+from amazon_scraper import Scraper, build_session  # noqa: E402
+
+ASINS = [f'B0CORP{index:04d}' for index in range(1, 9)]
+
+
+@pytest.fixture(scope='module')
+def servers():
+    return StandInServer().start(), H2StandInServer().start()
+
+
+@pytest.fixture
+def session():
+    session = build_session(http2=True)
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize('fields', [None, 'price'])
+def test_records_match_http1(servers, fields):
+    http1, http2 = servers
+    expected = Scraper(base_url=http1.url, concurrency=4, fields=fields).process(ASINS)
+    assert Scraper(base_url=http2.url, concurrency=4, fields=fields, http2=True).process(ASINS) == expected
+
+
+def test_unstreamed_get(servers, session):
+    http1, http2 = servers
+    response = session.get(f'{http2.url}/dp/{ASINS[0]}', timeout=(5, 30))
+    assert response.status_code == 200 and response.http_version == 'HTTP/2'
+    assert response.content == requests.get(f'{http1.url}/dp/{ASINS[0]}', timeout=(5, 30)).content
+
+
+def test_body_read_and_early_close(servers, session):
+    _, http2 = servers
+    response = session.get(f'{http2.url}/dp/{ASINS[1]}', stream=True, timeout=(5, 30))
+    assert len(response.raw.read()) > 0
+    assert response.raw.read() == b''
+    response = session.get(f'{http2.url}/dp/{ASINS[2]}', stream=True, timeout=(5, 30))
+    next(response.iter_content(1024))
+    response.close()
+    # The stream's slot was given back
+    assert session.get(f'{http2.url}/dp/{ASINS[3]}', timeout=(5, 30)).status_code == 200
+
+
+def test_errors_map_to_requests_exceptions(session):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get('http://127.0.0.1:1/dp/B0NOWHERE1', timeout=(2, 2))
+
+
+def test_read_timeout_and_deadline():
+    slow = H2StandInServer(faults=FaultConfig(latency=3.0)).start()
+    assert Scraper(base_url=slow.url, http2=True, timeout=(2, 0.5)).process(['B0SLOW0001'])[0]['status'] == 'timeout'
+    statuses = [entry['status'] for entry in Scraper(base_url=slow.url, http2=True, deadline=1.0).process(
+        ['B0SLOW0001', 'B0SLOW0002'])]
+    assert statuses == ['deadline_exceeded', 'deadline_exceeded']
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+
+from amazon_scraper.jobs import JobStore
+from amazon_scraper.profiler import SamplingProfiler
+from app.app import create_app
+
+
+def test_memory_store_keeps_the_newest_jobs():
+    store = JobStore(max_jobs=2)
+    jobs = [store.create() for _ in range(3)]
+    for job in jobs:
+        store.save(job)
+    assert store.get(jobs[0].id) is None
+    assert store.get(jobs[2].id) is jobs[2]
+
+
+def test_directory_store_is_shared(tmp_path):
+    writer, reader = JobStore(directory=str(tmp_path)), JobStore(directory=str(tmp_path))
+    job = writer.create(asin_count=3)
+    job.trace_summary = {'count': 3}
+    job.artifacts['profile'] = 'main;fetch 4\n'
+    writer.save(job)
+    loaded = reader.get(job.id)
+    assert loaded == job
+    assert reader.get('0' * 12) is None
+    assert reader.get('../jobs') is None
+
+
+def test_directory_store_prunes_oldest(tmp_path):
+    store = JobStore(max_jobs=2, directory=str(tmp_path))
+    jobs = [store.create() for _ in range(3)]
+    for index, job in enumerate(jobs[:2]):
+        store.save(job)
+        # mtimes far enough apart to order the files
+        os.utime(tmp_path / f'{job.id}.json', (index, index))
+    store.save(jobs[2])
+    assert store.get(jobs[0].id) is None
+    assert store.get(jobs[1].id) is not None
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_concurrent_saves_of_one_job(tmp_path):
+    store = JobStore(directory=str(tmp_path))
+    job = store.create(asin_count=1)
+    start = threading.Barrier(8)
+    errors = []
+
+    def save():
+        start.wait()
+        try:
+            for _ in range(50):
+                store.save(job)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.get(job.id) == job
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two app instances sharing a job folder, as two gunicorn workers do"""
+    config = {'JOB_FOLDER': str(tmp_path / 'jobs'), 'UPLOAD_FOLDER': str(tmp_path / 'uploads'), 'TESTING': True}
+    return create_app(config), create_app(config)
+
+
+def test_trace_is_served_by_another_worker(workers):
+    first, second = workers
+    store = first.extensions['scrape_jobs']
+    job = store.create(asin_count=2)
+    job.trace_summary = {'count': 2, 'stages': {}}
+    store.save(job)
+    response = second.test_client().get(f'/jobs/{job.id}/trace')
+    assert response.status_code == 200
+    assert response.get_json() == {'job_id': job.id, 'asins': 2, 'count': 2, 'stages': {}}
+    assert second.test_client().get('/jobs/ffffffffffff/trace').status_code == 404
+
+
+def test_profile_is_served_by_another_worker(workers):
+    first, second = workers
+    profiler = SamplingProfiler(interval=0.001)
+    with profiler:
+        sum(index * index for index in range(200_000))
+    store = first.extensions['scrape_jobs']
+    job = store.create(asin_count=1)
+    job.artifacts['profile'] = profiler.folded()
+    job.artifacts['profile_report'] = profiler.report()
+    store.save(job)
+
+    client = second.test_client()
+    folded = client.get(f'/jobs/{job.id}/profile')
+    assert folded.status_code == 200
+    assert folded.get_data(as_text=True) == profiler.folded()
+    report = client.get(f'/jobs/{job.id}/profile/report')
+    assert report.status_code == 200
+    assert report.get_json() == {'job_id': job.id, **profiler.report()}
+    assert client.get('/jobs/ffffffffffff/profile').status_code == 404
+    assert client.get('/jobs/ffffffffffff/profile/report').status_code == 404
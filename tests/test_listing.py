@@ -0,0 +1,126 @@
+import pytest
+
+from amazon_scraper.fetch import FetchedPage
+from amazon_scraper.listing import listing_covers, listing_url, parse_listing
+from amazon_scraper.pipeline import Scraper
+
+BASE_URL = 'https://www.amazon.in'
+
+
+def card(asin, title='Digital Safe', price='1,299', mrp='1,999', stars='4.3 out of 5 stars', ratings='2,907',
+         sponsored=False):
+    classes = 's-result-item AdHolder' if sponsored else 's-result-item'
+    parts = [f'<div data-component-type="s-search-result" data-asin="{asin}" class="{classes}">']
+    if title is not None:
+        parts.append(f'<h2><a href="/dp/{asin}"><span>{title}</span></a></h2>')
+    if mrp is not None:
+        parts.append('<span class="a-price a-text-price" data-a-strike="true">'
+                     f'<span class="a-price-symbol">₹</span><span class="a-price-whole">{mrp}</span></span>')
+    if price is not None:
+        parts.append('<span class="a-price"><span class="a-price-symbol">₹</span>'
+                     f'<span class="a-price-whole">{price}<span class="a-price-decimal">.</span></span></span>')
+    if stars is not None:
+        parts.append(f'<i class="a-icon a-icon-star"><span class="a-icon-alt">{stars}</span></i>'
+                     f'<span aria-label="{ratings} ratings"><span>{ratings}</span></span>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+
+def results_page(*cards, next_href=None):
+    pagination = f'<a class="s-pagination-item s-pagination-next" href="{next_href}">Next</a>' if next_href else ''
+    return ('<html><head><meta charset="utf-8"></head><body>'
+            '<div data-component-type="s-search-result" data-asin="" class="banner">Shop deals</div>'
+            + ''.join(cards) + pagination + '</body></html>').encode('utf-8')
+
+
+def test_reads_each_card():
+    page = parse_listing(results_page(card('B0TEST0001'), card('B0TEST0002', sponsored=True, stars=None)))
+    assert page.cards == [
+        {'asin': 'B0TEST0001', 'title': 'Digital Safe', 'price': '₹1,299.',
+         'reviews': '4.3 out of 5 stars2,907 ratings', 'sponsored': False},
+        {'asin': 'B0TEST0002', 'title': 'Digital Safe', 'price': '₹1,299.', 'reviews': '', 'sponsored': True},
+    ]
+    assert page.next_url is None and not page.robot_check
+
+
+def test_missing_title_and_price():
+    fields = parse_listing(results_page(card('B0TEST0001', title=None, price=None, mrp=None))).cards[0]
+    assert fields['title'] == 'Title not found' and fields['price'] == '₹Price not found'
+    # A struck-through M.R.P. alone is not a price
+    fields = parse_listing(results_page(card('B0TEST0001', price=None))).cards[0]
+    assert fields['price'] == '₹Price not found'
+
+
+def test_next_link_is_resolved():
+    content = results_page(card('B0TEST0001'), next_href='/s?k=digital+safe&amp;page=3')
+    page = parse_listing(content, 'text/html; charset=utf-8', f'{BASE_URL}/s?k=digital+safe&page=2')
+    assert page.next_url == f'{BASE_URL}/s?k=digital+safe&page=3'
+
+
+def test_robot_check():
+    content = (b'<html><body><form method="get" action="/errors/validateCaptcha">'
+               b'<input name="amzn"></form></body></html>')
+    page = parse_listing(content)
+    assert page.robot_check and page.cards == []
+
+
+@pytest.mark.parametrize('listing, page, url', [
+    ('digital safe', 1, f'{BASE_URL}/s?k=digital+safe'),
+    ('digital safe', 2, f'{BASE_URL}/s?k=digital+safe&page=2'),
+    ('/s?rh=n:1380072031&page=4', 1, f'{BASE_URL}/s?rh=n%3A1380072031'),
+    ('https://www.amazon.com/s?k=safe&page=2', 3, f'{BASE_URL}/s?k=safe&page=3'),
+])
+def test_listing_url(listing, page, url):
+    assert listing_url(listing, page, BASE_URL) == url
+
+
+def test_listing_covers():
+    assert listing_covers(('title', 'price'))
+    assert listing_covers(('price',))
+    assert not listing_covers(('price', 'attributes'))
+    assert not listing_covers(None)
+
+
+class FakeListings:
+    """Serves results pages for Scraper.fetch_url(), two per query"""
+
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, scraper, url, deadline=None, fields=None, asin=''):
+        self.urls.append(url)
+        query = url.split('k=')[1].split('&')[0]
+        number = 2 if 'page=2' in url else 1
+        asins = [f'B0{query.upper()}{number}{index}' for index in range(3)]
+        # Page two repeats a sponsored product from page one
+        cards = [card(asin) for asin in asins] + ([card(f'B0{query.upper()}10', sponsored=True)] if number == 2 else [])
+        next_href = f'/s?k={query}&page=2' if number == 1 else None
+        return FetchedPage(asin='', url=url, status_code=200, content=results_page(*cards, next_href=next_href))
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    fake = FakeListings()
+    monkeypatch.setattr(Scraper, 'fetch_url', lambda self, url, *args, **kwargs: fake(self, url, *args, **kwargs))
+    return fake
+
+
+def test_listing_run_follows_pages_once_per_asin(listings):
+    scraper = Scraper(base_url=BASE_URL, concurrency=2, fields='title,price', normalize=True)
+    results = list(scraper.iter_listing_results(['safe', 'lock']))
+    asins = [result.asin for result in results]
+    assert len(asins) == len(set(asins)) == 12
+    assert all(result.ok and set(result.record) == {'asin', 'title', 'price', 'normalized'} for result in results)
+    assert results[0].record['normalized']['rating'] == 4.3
+    assert scraper.listing_stats == {'listings': 2, 'pages': 4, 'requests': 4, 'products': 12, 'duplicates': 2}
+
+
+def test_listing_run_stops_at_max_pages(listings):
+    scraper = Scraper(base_url=BASE_URL, fields='price')
+    results = list(scraper.iter_listing_results(['safe'], max_pages=1))
+    assert len(results) == 3 and listings.urls == [f'{BASE_URL}/s?k=safe']
+
+
+def test_listing_mode_needs_listing_fields():
+    with pytest.raises(ValueError):
+        Scraper(base_url=BASE_URL, fields='title,attributes').iter_listing_results(['safe'])
@@ -0,0 +1,41 @@
+import threading
+
+from amazon_scraper.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def run_threads(target, count):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_dead_thread_shards_are_folded_without_rendering():
+    counter = Counter('test_total', 'Test count', ['status'])
+    child = counter.labels(status='ok')
+    run_threads(child.inc, 200)
+    # Each new thread folds the finished ones away, /metrics or not
+    assert len(child._values._shards) <= 1
+    child.inc()
+    assert child.value() == 201
+
+
+def test_histogram_and_gauge_survive_folding():
+    histogram = Histogram('test_seconds', 'Test durations', buckets=(0.1, 1.0))
+    gauge = Gauge('test_in_flight', 'Test gauge')
+    run_threads(lambda: histogram.observe(0.5), 50)
+    run_threads(gauge.inc, 5)
+    gauge.dec(2)
+    assert len(histogram._unlabelled()._values._shards) <= 1
+    counts, total, count = histogram._unlabelled().snapshot()
+    assert counts == [0, 50, 0] and total == 25.0 and count == 50
+    assert gauge._unlabelled().value() == 3
+
+
+def test_render():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter('test_total', 'Test count', ['status']))
+    counter.labels(status='a "b"').inc(2)
+    lines = registry.render().splitlines()
+    assert '# TYPE test_total counter' in lines
+    assert 'test_total{status="a \\"b\\""} 2' in lines
@@ -0,0 +1,58 @@
+import pytest
+
+from amazon_scraper.normalize import NORMALIZED_FIELDS, build_product_record, normalize_attributes, normalize_records
+
+
+def test_typed_fields_from_raw_text():
+    normalized = normalize_attributes({
+        'Customer Reviews': '4.34.3 out of 5 stars2,907 ratings4.3 out of 5 stars',
+        'Best Sellers Rank': '#719 in Home Improvement (See Top 100 in Home Improvement)#3 inHotel Safes',
+        'Item Weight': '9 Kilograms',
+        'Product Dimensions': '35D x 25W x 25H Centimeters',
+    })
+    assert list(normalized) == list(NORMALIZED_FIELDS)
+    assert normalized == {
+        'rating': 4.3,
+        'rating_count': 2907,
+        'best_sellers_rank': [{'rank': 719, 'category': 'Home Improvement'}, {'rank': 3, 'category': 'Hotel Safes'}],
+        'weight_g': 9000.0,
+        'dimensions_cm': [35.0, 25.0, 25.0],
+    }
+
+
+@pytest.mark.parametrize('key, value, field, parsed', [
+    ('Item Weight', '1.5 Pounds', 'weight_g', 680.389),
+    ('Net Quantity', '250 Grams', 'weight_g', None),
+    ('Weight', '250 gms', 'weight_g', 250.0),
+    ('Package Weight', '12 oz', 'weight_g', 340.194),
+    ('Item Dimensions LxWxH', '10 x 5 Inches', 'dimensions_cm', [25.4, 12.7]),
+    ('Product Dimensions', '300 x 200 x 100 mm', 'dimensions_cm', [30.0, 20.0, 10.0]),
+    ('Customer Reviews', '5.0 out of 5 stars1 rating', 'rating_count', 1),
+    ('Customer Reviews', 'Be the first to review', 'rating', None),
+])
+def test_units_and_variants(key, value, field, parsed):
+    assert normalize_attributes({key: value})[field] == parsed
+
+
+def test_preferred_key_wins():
+    normalized = normalize_attributes({'Package Weight': '2 Kilograms', 'Item Weight': '1 Kilograms'})
+    assert normalized['weight_g'] == 1000.0
+
+
+def test_empty_and_missing():
+    assert normalize_attributes({}) == dict.fromkeys(NORMALIZED_FIELDS)
+    assert normalize_attributes({'Item Weight': ''})['weight_g'] is None
+
+
+def test_cached_values_are_not_shared_lists():
+    first = normalize_attributes({'Product Dimensions': '10 x 5 x 2 cm'})
+    first['dimensions_cm'].append(99.0)
+    assert normalize_attributes({'Product Dimensions': '10 x 5 x 2 cm'})['dimensions_cm'] == [10.0, 5.0, 2.0]
+
+
+def test_records_without_attributes_pass_through():
+    records = normalize_records([build_product_record('A', {'attributes': {'Item Weight': '5 g'}}),
+                                 {'asin': 'B', 'error': 'Unable to fetch product page'},
+                                 build_product_record('C', {'price': '₹5'}, projection=('price',))])
+    assert records[0]['normalized']['weight_g'] == 5.0
+    assert 'normalized' not in records[1] and 'normalized' not in records[2]
@@ -0,0 +1,73 @@
+import pytest
+
+from amazon_scraper.parse import RegionScanner, extract_product_fields, is_robot_check, parse_html, select_fields
+
+PAGE = ('<html><head><meta charset="utf-8"></head><body>'
+        '<div id="ppd"><span id="productTitle"> Digital Safe </span>'
+        '<div class="a-section"><span class="a-price-symbol">₹</span><span class="a-price-whole">1,299.</span></div>'
+        '<div id="feature-bullets"><ul><li><span>Keypad lock</span></li><li><span>Wall mount</span></li></ul></div>'
+        '</div>'
+        '<div id="prodDetails"><table>'
+        '<tr><th>Material</th><td>Steel</td></tr>'
+        '<tr><th>Item Weight</th><td><div>9000 Grams</div></td></tr>'
+        '</table><div id="nested"><div>More</div></div></div>'
+        '<div id="footer">' + 'x' * 2000 + '</div></body></html>').encode('utf-8')
+
+FULL = {
+    'title': 'Digital Safe',
+    'price': '₹1,299.',
+    'attributes': {'Material': 'Steel', 'Item Weight': '9000 Grams'},
+    'bullet_points': ['Keypad lock', 'Wall mount'],
+}
+
+
+@pytest.mark.parametrize('fields, selected', [
+    (None, None),
+    ('price', ('price',)),
+    ('bullet_points, title', ('title', 'bullet_points')),
+    (['attributes', 'price', 'price', ''], ('price', 'attributes')),
+])
+def test_select_fields(fields, selected):
+    assert select_fields(fields) == selected
+
+
+@pytest.mark.parametrize('fields', ['colour', 'title,colour', '', ' , '])
+def test_select_fields_rejects(fields):
+    with pytest.raises(ValueError):
+        select_fields(fields)
+
+
+@pytest.mark.parametrize('fields', [None, ('title',), ('price',), ('attributes',), ('bullet_points',),
+                                    ('title', 'price'), ('price', 'attributes', 'bullet_points')])
+def test_projection_extracts_the_same_values(fields):
+    extracted = extract_product_fields(parse_html(PAGE, fields=fields), fields)
+    assert extracted == {field: value for field, value in FULL.items() if fields is None or field in fields}
+
+
+def test_strained_tree_keeps_the_robot_check():
+    content = b'<html><body><form action="/errors/validateCaptcha"></form></body></html>'
+    assert is_robot_check(parse_html(content, fields=('price',)))
+
+
+def feed_all(scanner, content, size):
+    for start in range(0, len(content), size):
+        if scanner.feed(content[start:start + size]):
+            return start + size
+    return None
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, len(PAGE)])
+def test_scanner_stops_after_the_last_region(size):
+    # The region ends with the </div closing #prodDetails, nested divs included
+    end = PAGE.index(b'<div id="footer">') - len(b'>')
+    stopped = feed_all(RegionScanner(('attributes', 'title')), PAGE, size)
+    assert stopped is not None and end <= stopped <= max(end + size, len(PAGE))
+    content = PAGE[:stopped]
+    assert extract_product_fields(parse_html(content, fields=('title', 'attributes')), ('title', 'attributes')) == {
+        'title': FULL['title'], 'attributes': FULL['attributes']}
+
+
+def test_scanner_reads_on_when_a_region_is_missing():
+    scanner = RegionScanner(('title', 'bullet_points'))
+    page = PAGE.replace(b'id="feature-bullets"', b'id="other"')
+    assert feed_all(scanner, page, 64) is None and not scanner.complete
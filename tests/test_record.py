@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from amazon_scraper.normalize import build_product_record, normalize_attributes
+from amazon_scraper.pipeline import ScrapeResult, Scraper
+from amazon_scraper.record import KEY_LAYOUT_CACHE_SIZE, ProductRecord, _shared_layout
+from amazon_scraper.trace import ScrapeTrace
+
+ATTRIBUTES = {
+    'Material': 'Steel',
+    'Item Weight': '9000 Grams',
+    'Customer Reviews': '4.3 out of 5 stars2,907 ratings',
+}
+RAW = {
+    'title': 'Digital Safe',
+    'price': '₹1,299.',
+    'attributes': ATTRIBUTES,
+    'bullet_points': ['Keypad lock', 'Wall mount'],
+}
+
+
+def full_record(asin='B0TEST0001'):
+    return build_product_record(asin, RAW)
+
+
+@pytest.mark.parametrize('record', [
+    full_record(),
+    build_product_record('B0TEST0002', RAW, projection=('price',)),
+    build_product_record('B0TEST0003', RAW, projection=('title', 'bullet_points')),
+    {**full_record(), 'normalized': normalize_attributes(ATTRIBUTES)},
+    {**build_product_record('B0TEST0004', RAW, projection=('price',)),
+     'variation': {'parent_asin': 'B0PARENT01', 'dimensions': {'color_name': 'Black'}}},
+    {**full_record(), 'trace': ScrapeTrace(total_ms=12.5).to_dict()},
+    build_product_record('B0TEST0005', {}),
+])
+def test_round_trip_is_lossless(record):
+    compact = ProductRecord.from_dict(record)
+    restored = compact.to_dict()
+    assert restored == record
+    assert list(restored) == list(record)
+    assert json.dumps(restored) == json.dumps(record)
+
+
+def test_projected_record_keeps_only_its_fields():
+    compact = ProductRecord.from_dict({'asin': 'A', 'price': 'x', 'normalized': {'rating': 4.3}})
+    assert compact.fields == ('asin', 'price')
+    assert compact.to_dict() == {'asin': 'A', 'price': 'x', 'normalized': {'rating': 4.3}}
+
+
+def test_layouts_are_shared():
+    first, second = ProductRecord.from_dict(full_record('A')), ProductRecord.from_dict(full_record('B'))
+    assert first._attribute_keys is second._attribute_keys
+    assert first.fields is second.fields
+    assert first.get_attribute('Item Weight') == '9000 Grams'
+    assert first.get_attribute('Colour') is None
+
+
+def test_equality_covers_fields_and_extras():
+    record = full_record()
+    assert ProductRecord.from_dict(record) == ProductRecord.from_dict(dict(record))
+    assert ProductRecord.from_dict(record) != ProductRecord.from_dict({**record, 'normalized': {}})
+    projected = {key: value for key, value in record.items() if key != 'bullet_points'}
+    assert ProductRecord.from_dict(record) != ProductRecord.from_dict({**projected, 'bullet_points': []})
+
+
+def test_compact_process_matches_dicts(monkeypatch):
+    results = [
+        ScrapeResult(asin='B0TEST0001', record={**full_record(), 'normalized': normalize_attributes(ATTRIBUTES)},
+                     trace=ScrapeTrace(total_ms=3.0)),
+        ScrapeResult(asin='B0TEST0002', error='404 Client Error', status='http_4xx'),
+    ]
+    monkeypatch.setattr(Scraper, 'iter_results', lambda self, asins: iter(results))
+    scraper = Scraper(base_url='http://127.0.0.1:9')
+    plain = scraper.process(['B0TEST0001', 'B0TEST0002'])
+    compact = scraper.process(['B0TEST0001', 'B0TEST0002'], compact=True)
+    assert isinstance(compact[0], ProductRecord)
+    assert compact[0].to_dict() == plain[0]
+    assert 'trace' in plain[0] and 'normalized' in plain[0]
+    assert compact[1] == plain[1]
+
+
+def test_key_layout_cache_is_bounded():
+    for index in range(KEY_LAYOUT_CACHE_SIZE + 50):
+        ProductRecord.from_dict(build_product_record('A', {'attributes': {f'Key {index}': 'x'}}))
+    assert _shared_layout.cache_info().currsize <= KEY_LAYOUT_CACHE_SIZE
+    # Layouts in use are still shared
+    first, second = ProductRecord.from_dict(full_record('A')), ProductRecord.from_dict(full_record('B'))
+    assert first._attribute_keys is second._attribute_keys
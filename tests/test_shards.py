@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+
+from amazon_scraper import shards
+from amazon_scraper.shards import ShardQueue, ShardWorker
+
+ASINS = [f'B0TEST{index:04d}' for index in range(10)]
+
+
+@pytest.fixture
+def queue(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(shards, 'time', clock)
+    return ShardQueue(str(tmp_path / 'jobs.db'), lease_seconds=60.0, max_attempts=2)
+
+
+def journal_mode(path):
+    with sqlite3.connect(path) as db:
+        return db.execute('PRAGMA journal_mode').fetchone()[0]
+
+
+class FakeScraper:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def process(self, asins):
+        if self.fail_on in asins:
+            raise KeyboardInterrupt
+        return [{'asin': asin, 'title': asin.lower()} for asin in asins]
+
+
+def test_leases_each_shard_once(queue):
+    job_id = queue.submit(ASINS, shard_size=4)
+    leases = [queue.lease('w1'), queue.lease('w2'), queue.lease('w1')]
+    assert [lease.asins for lease in leases] == [ASINS[0:4], ASINS[4:8], ASINS[8:]]
+    assert queue.lease('w3') is None
+    assert queue.status(job_id)['shards']['leased'] == 3
+
+
+def test_expired_lease_is_reassigned(queue, clock):
+    queue.submit(ASINS, shard_size=10)
+    first = queue.lease('w1')
+    clock.advance(30)
+    assert queue.heartbeat(first)
+    clock.advance(61)
+    second = queue.lease('w2')
+    assert second.shard_no == first.shard_no and second.worker == 'w2'
+    # The first worker's lease is gone: its results are discarded
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first, [{'asin': asin} for asin in ASINS])
+    assert queue.complete(second, [{'asin': asin, 'ok': True} for asin in ASINS])
+    assert all(entry['ok'] for entry in queue.iter_results(second.job_id))
+
+
+def test_shard_fails_after_max_attempts(queue, clock):
+    job_id = queue.submit(ASINS[:3], shard_size=3)
+    queue.lease('w1')
+    clock.advance(61)
+    queue.lease('w2')
+    clock.advance(61)
+    assert queue.lease('w3') is None
+    status = queue.status(job_id)
+    assert status['shards']['failed'] == 1 and status['finished']
+    entries = list(queue.iter_results(job_id))
+    assert [entry['asin'] for entry in entries] == ASINS[:3]
+    assert all(entry['status'] == 'error' for entry in entries)
+
+
+def test_results_merge_in_input_order(queue):
+    job_id = queue.submit(ASINS, shard_size=3)
+    leases = [queue.lease('w') for _ in range(4)]
+    for lease in reversed(leases[1:]):
+        queue.complete(lease, [{'asin': asin} for asin in lease.asins])
+    # The first shard is unfinished, so nothing can be streamed yet
+    assert list(queue.iter_results(job_id)) == []
+    queue.complete(leases[0], [{'asin': asin} for asin in leases[0].asins])
+    assert [entry['asin'] for entry in queue.iter_results(job_id)] == ASINS
+
+
+def test_worker_processes_and_releases(queue):
+    job_id = queue.submit(ASINS, shard_size=5)
+    worker = ShardWorker(queue, FakeScraper(fail_on=ASINS[7]), worker_id='w1')
+    assert worker.run_once()
+    with pytest.raises(KeyboardInterrupt):
+        worker.run_once()
+    status = queue.status(job_id)
+    assert status['shards']['done'] == 1 and status['shards']['pending'] == 1
+    ShardWorker(queue, FakeScraper(), worker_id='w2').run()
+    assert [entry['title'] for entry in queue.iter_results(job_id)] == [asin.lower() for asin in ASINS]
+
+
+def test_local_file_uses_wal(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, 'on_network_filesystem', lambda path: False)
+    path = str(tmp_path / 'jobs.db')
+    assert ShardQueue(path).journal_mode == 'wal'
+    assert journal_mode(path) == 'wal'
+
+
+def test_network_file_uses_rollback_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, 'on_network_filesystem', lambda path: True)
+    path = str(tmp_path / 'jobs.db')
+    queue = ShardQueue(path)
+    assert queue.journal_mode == 'delete'
+    assert journal_mode(path) == 'delete'
+    queue.submit(ASINS, shard_size=5)
+    assert queue.lease('w1') is not None
+
+
+def test_switching_a_wal_file_held_open_fails(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    held = ShardQueue(path, journal_mode='wal')
+    held.submit(ASINS)
+    reader = sqlite3.connect(path)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM shards').fetchone()
+    with pytest.raises(RuntimeError):
+        ShardQueue(path, journal_mode='delete')
+    reader.close()
+
+
+def test_unknown_journal_mode(tmp_path):
+    with pytest.raises(ValueError):
+        ShardQueue(str(tmp_path / 'jobs.db'), journal_mode='memory')
+
+
+def test_network_mount_detection(tmp_path, monkeypatch):
+    mounts = tmp_path / 'mounts'
+    mounts.write_text(
+        'rootfs / ext4 rw 0 0\n'
+        'server:/export /mnt/shared\\040queue nfs4 rw 0 0\n'
+        'tmpfs /mnt/shared\\040queue/local tmpfs rw 0 0\n'
+    )
+    monkeypatch.setattr(shards, '_MOUNTS', str(mounts))
+    monkeypatch.setattr(shards.os.path, 'realpath', lambda path: path)
+    assert shards.on_network_filesystem('/mnt/shared queue/jobs.db')
+    assert not shards.on_network_filesystem('/mnt/shared queue/local/jobs.db')
+    assert not shards.on_network_filesystem('/var/jobs.db')
+    assert shards.on_network_filesystem('\\\\server\\share\\jobs.db')
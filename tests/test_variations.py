@@ -0,0 +1,230 @@
+import threading
+
+import pytest
+
+from amazon_scraper.embedded import VariationFamily
+from amazon_scraper.normalize import build_product_record
+from amazon_scraper.parse import PRODUCT_FIELDS
+from amazon_scraper.pipeline import ScrapeResult, Scraper
+
+PARENT = 'B0PARENT01'
+CHILDREN = ['B0CHILD001', 'B0CHILD002', 'B0CHILD003', 'B0CHILD004']
+FAMILY = VariationFamily(
+    parent_asin=PARENT,
+    current_asin='',
+    dimensions=['color_name'],
+    children={asin: {'color_name': colour} for asin, colour in zip(CHILDREN, ['Black', 'Grey', 'Red', 'Blue'])},
+)
+
+
+def catalogue(asin):
+    return {
+        'title': 'Digital Safe',
+        'price': f'₹{1000 + CHILDREN.index(asin) if asin in CHILDREN else 500},',
+        'attributes': {'Material': 'Steel'},
+        'bullet_points': ['Keypad lock'],
+    }
+
+
+class FakeMarketplace:
+    """Answers Scraper.scrape() from a catalogue, recording what was fetched"""
+
+    def __init__(self, pages=catalogue, failing=(), family=FAMILY):
+        self.pages = pages
+        self.family = family
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, scraper, asin, queue_wait=0.0, deadline=None, fields=None):
+        with self._lock:
+            self.calls.append((asin, fields))
+        if asin in self.failing:
+            return ScrapeResult(asin=asin, error='503 Server Error', status='http_5xx')
+        projection = fields or scraper.fields
+        record = build_product_record(asin, self.pages(asin), projection)
+        # Only a page read whole shows its twister data
+        family = self.family if asin in self.family.children and fields is None else None
+        return ScrapeResult(asin=asin, record=record, bytes_received=1, family=family)
+
+    def fetched(self, asin):
+        return [fields for called, fields in self.calls if called == asin]
+
+
+@pytest.fixture
+def marketplace(monkeypatch):
+    fake = FakeMarketplace()
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    return fake
+
+
+def scraper(concurrency=1, **kwargs):
+    return Scraper(base_url='http://127.0.0.1:9', concurrency=concurrency, variations=True, **kwargs)
+
+
+def by_asin(results):
+    return {result.asin: result for result in results}
+
+
+def test_children_fetch_only_what_differs(marketplace):
+    run = scraper()
+    results = by_asin(run.iter_results([CHILDREN[0]]))
+    assert sorted(results) == CHILDREN
+    # Seed and probe read whole, the rest only for the price
+    assert marketplace.fetched(CHILDREN[0]) == [None]
+    assert sum(marketplace.fetched(asin) == [None] for asin in CHILDREN[1:]) == 1
+    assert sum(marketplace.fetched(asin) == [('price',)] for asin in CHILDREN[1:]) == 2
+    for index, asin in enumerate(CHILDREN):
+        record = results[asin].record
+        assert record['price'] == f'₹{1000 + index},'
+        assert record['title'] == 'Digital Safe' and record['attributes'] == {'Material': 'Steel'}
+        assert record['variation'] == {'parent_asin': PARENT, 'dimensions': FAMILY.children[asin]}
+        assert list(record)[:5] == ['asin', 'title', 'price', 'attributes', 'bullet_points']
+    stats = run.family_stats[PARENT]
+    assert stats['records'] == 4 and stats['requests'] == 4 and stats['fetched_fields'] == ['price']
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_each_asin_scraped_once(marketplace, concurrency):
+    run = scraper(concurrency=concurrency)
+    results = list(run.iter_results([CHILDREN[0], CHILDREN[2], CHILDREN[0], CHILDREN[2], 'B0SINGLE01']))
+    assert sorted(result.asin for result in results) == sorted(CHILDREN + ['B0SINGLE01'])
+    assert all(len(marketplace.fetched(asin)) == 1 for asin in CHILDREN)
+    assert 'variation' not in by_asin(results)['B0SINGLE01'].record
+
+
+def test_repeats_after_the_family_is_known_are_counted(marketplace):
+    run = scraper()
+    list(run.iter_results([CHILDREN[0], 'B0SINGLE01', CHILDREN[0], CHILDREN[3]]))
+    assert run.family_stats[PARENT]['deduplicated'] == 2
+
+
+def test_without_expansion_only_listed_children(marketplace):
+    run = scraper(expand_variations=False)
+    results = by_asin(run.iter_results([CHILDREN[1], CHILDREN[3]]))
+    assert sorted(results) == [CHILDREN[1], CHILDREN[3]]
+    assert marketplace.fetched(CHILDREN[0]) == []
+
+
+def test_differing_fields_are_fetched_per_child(monkeypatch):
+    def pages(asin):
+        return {**catalogue(asin), 'attributes': {'Material': 'Steel', 'Colour': asin}}
+    fake = FakeMarketplace(pages=pages)
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    run = scraper()
+    results = by_asin(run.iter_results([CHILDREN[0]]))
+    assert run.family_stats[PARENT]['fetched_fields'] == ['price', 'attributes']
+    for asin in CHILDREN:
+        assert results[asin].record['attributes']['Colour'] == asin
+
+
+def test_projection_is_respected(marketplace):
+    run = scraper(fields='price')
+    results = by_asin(run.iter_results([CHILDREN[0]]))
+    assert all(set(result.record) == {'asin', 'price', 'variation'} for result in results.values())
+
+
+def test_nothing_to_fetch_builds_children_without_requests(monkeypatch):
+    fake = FakeMarketplace()
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    run = scraper(fields='title')
+    results = by_asin(run.iter_results([CHILDREN[0]]))
+    # Price is not wanted, and the title is the same for seed and probe
+    assert len(fake.calls) == 2 and sorted(results) == CHILDREN
+    assert run.family_stats[PARENT]['requests'] == 2
+    assert all(result.record['title'] == 'Digital Safe' for result in results.values())
+
+
+def test_failed_probe_fetches_the_rest_in_full(monkeypatch):
+    fake = FakeMarketplace(failing=CHILDREN[1:2])
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    run = scraper()
+    results = by_asin(run.iter_results([CHILDREN[0]]))
+    # The first sibling is the probe
+    assert fake.fetched(CHILDREN[1]) == [None] and results[CHILDREN[1]].status == 'http_5xx'
+    assert run.family_stats[PARENT]['fetched_fields'] == list(PRODUCT_FIELDS)
+    for asin in CHILDREN[2:]:
+        assert fake.fetched(asin) == [tuple(PRODUCT_FIELDS)] and results[asin].ok
+
+
+def test_process_repeats_and_appends(marketplace):
+    entries = scraper().process([CHILDREN[2], 'B0SINGLE01', CHILDREN[2]])
+    assert [entry['asin'] for entry in entries[:3]] == [CHILDREN[2], 'B0SINGLE01', CHILDREN[2]]
+    assert entries[0] is entries[2]
+    assert sorted(entry['asin'] for entry in entries[3:]) == [CHILDREN[0], CHILDREN[1], CHILDREN[3]]
+
+
+GRID = VariationFamily(
+    parent_asin=PARENT,
+    current_asin='',
+    dimensions=['color_name', 'size_name'],
+    children={
+        'B0GRIDBS01': {'color_name': 'Black', 'size_name': 'Small'},
+        'B0GRIDBL01': {'color_name': 'Black', 'size_name': 'Large'},
+        'B0GRIDGS01': {'color_name': 'Grey', 'size_name': 'Small'},
+        'B0GRIDGL01': {'color_name': 'Grey', 'size_name': 'Large'},
+        'B0GRIDBM01': {'color_name': 'Black', 'size_name': 'Medium'},
+    },
+)
+
+
+def grid_page(asin):
+    values = GRID.children[asin]
+    # The title follows the size, the attributes the colour
+    return {
+        'title': f"Digital Safe, {values['size_name']}",
+        'price': f'₹{1000 + list(GRID.children).index(asin)},',
+        'attributes': {'Material': 'Steel', 'Colour': values['color_name']},
+        'bullet_points': ['Keypad lock'],
+    }
+
+
+def grid_marketplace(monkeypatch, failing=()):
+    fake = FakeMarketplace(pages=grid_page, failing=failing, family=GRID)
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    return fake
+
+
+def test_every_dimension_is_probed(monkeypatch):
+    fake = grid_marketplace(monkeypatch)
+    run = scraper()
+    results = by_asin(run.iter_results(['B0GRIDBS01']))
+    assert sorted(results) == sorted(GRID.children)
+    # One probe for the size, one for the colour
+    full = [asin for asin, fields in fake.calls if fields is None]
+    assert full[0] == 'B0GRIDBS01' and sorted(full[1:]) == ['B0GRIDBL01', 'B0GRIDGS01']
+    assert fake.fetched('B0GRIDGL01') == [('title', 'price', 'attributes')]
+    # Black/Medium may go as soon as the size is probed, before the colour
+    assert fake.fetched('B0GRIDBM01') in ([('title', 'price')], [('title', 'price', 'attributes')])
+    for asin, result in results.items():
+        page = grid_page(asin)
+        assert [result.record[key] for key in ('title', 'price', 'attributes')] == [
+            page['title'], page['price'], page['attributes']]
+    assert run.family_stats[PARENT]['fetched_fields'] == ['title', 'price', 'attributes']
+
+
+def test_failed_probe_fetches_only_its_dimension_in_full(monkeypatch):
+    fake = grid_marketplace(monkeypatch, failing=['B0GRIDGS01'])
+    results = by_asin(scraper().iter_results(['B0GRIDBS01']))
+    assert results['B0GRIDGS01'].status == 'http_5xx'
+    # Grey/Large differs in the colour nobody probed; Black/Medium only in the size
+    assert fake.fetched('B0GRIDGL01') == [tuple(PRODUCT_FIELDS)]
+    assert fake.fetched('B0GRIDBM01') == [('title', 'price')]
+    assert results['B0GRIDGL01'].record['attributes']['Colour'] == 'Grey'
+    assert results['B0GRIDBM01'].record['title'] == 'Digital Safe, Medium'
+
+
+def test_listed_sibling_serves_as_probe(monkeypatch):
+    fake = grid_marketplace(monkeypatch)
+    results = by_asin(scraper(concurrency=4).iter_results(['B0GRIDBS01', 'B0GRIDGL01']))
+    assert all(results[asin].record['attributes'] == grid_page(asin)['attributes'] for asin in GRID.children)
+    assert all(len(fake.fetched(asin)) == 1 for asin in GRID.children)
+
+
+def test_family_without_dimensions_is_probed_once(monkeypatch):
+    family = VariationFamily(parent_asin=PARENT, current_asin='', children={asin: {} for asin in CHILDREN})
+    fake = FakeMarketplace(family=family)
+    monkeypatch.setattr(Scraper, 'scrape', lambda self, asin, **kwargs: fake(self, asin, **kwargs))
+    results = by_asin(scraper().iter_results([CHILDREN[0]]))
+    assert sorted(results) == CHILDREN
+    assert [fields for _, fields in fake.calls].count(None) == 2